@@ -0,0 +1,76 @@
+"""
+Throughput of the streaming chunker on a large synthetic transcription,
+compared with LangChain's RecursiveCharacterTextSplitter when it is installed
+(the outputs are also checked for equality).
+
+    python -m benchmarks.chunker_throughput --megabytes 20
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from utils.chunking import iter_chunk_spans
+
+WORDS = ["patient", "blood", "pressure", "mg", "daily", "glucose", "report", "normal", "range", "hemoglobin",
+         "prescribed", "tablet", "after", "meals", "follow-up", "cholesterol", "ldl", "hdl", "12.5", "120/80"]
+
+
+def synthetic_document(megabytes: float, seed: int) -> str:
+    rng = random.Random(seed)
+    parts, size, target = [], 0, int(megabytes * 1024 * 1024)
+    while size < target:
+        lines = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 20))) for _ in range(rng.randint(1, 8))]
+        paragraph = "\n".join(lines)
+        parts.append(paragraph)
+        size += len(paragraph) + 2
+    return "\n\n".join(parts)
+
+
+def _measure(label: str, run, megabytes: float):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = run()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:>28}: {elapsed:6.2f} s  {megabytes / elapsed:7.1f} MB/s  peak alloc {peak / 1024 / 1024:7.1f} MB")
+    return result
+
+
+def run(megabytes: float, chunk_size: int, chunk_overlap: int, seed: int):
+    text = synthetic_document(megabytes, seed)
+    print(f"document: {len(text) / 1024 / 1024:.1f} MB, chunk_size={chunk_size}, chunk_overlap={chunk_overlap}")
+
+    def count_streaming():
+        count = 0
+        for _ in iter_chunk_spans(text, chunk_size, chunk_overlap):
+            count += 1
+        return count
+
+    count = _measure("iter_chunk_spans (streamed)", count_streaming, megabytes)
+    spans = _measure("iter_chunk_spans (list)", lambda: list(iter_chunk_spans(text, chunk_size, chunk_overlap)), megabytes)
+    print(f"{'chunks':>28}: {count}")
+
+    try:
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+    except ImportError:
+        print("langchain not installed, skipping comparison")
+        return
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=len, separators=["\n\n", "\n", " ", ""]
+    )
+    chunks = _measure("RecursiveCharacterTextSplitter", lambda: splitter.split_text(text), megabytes)
+    identical = chunks == [text[start:end] for start, end in spans]
+    print(f"{'identical output':>28}: {identical}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megabytes", type=float, default=10)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+    run(args.megabytes, args.chunk_size, args.chunk_overlap, args.seed)
@@ -0,0 +1,66 @@
+"""
+Payload size and preprocessing latency for /analyze-image, comparing the
+image as uploaded with what prepare_image sends to the model. Uses a
+synthetic phone-camera photo of a text document (EXIF rotated, 12 MP).
+
+    python -m benchmarks.image_preprocessing --runs 5
+"""
+import argparse
+import base64
+import io
+import random
+import statistics
+import time
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from utils.image_preprocessing import EXIF_ORIENTATION, prepare_image
+
+WORDS = ["Hemoglobin", "13.5", "g/dL", "Glucose", "95", "mg/dL", "LDL", "110", "Patient", "Report", "normal", "range"]
+
+
+def synthetic_photo(width: int, height: int, seed: int) -> bytes:
+    rng = random.Random(seed)
+    image = Image.new("RGB", (width, height), (236, 232, 224))
+    draw = ImageDraw.Draw(image)
+    for y in range(80, height - 80, 60):
+        line = " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 14)))
+        draw.text((100, y), line, fill=(30, 30, 30))
+    # Sensor noise makes the photo compress like a real one
+    noise = Image.effect_noise((width, height), 24).convert("RGB")
+    image = Image.blend(image, noise, 0.15).filter(ImageFilter.GaussianBlur(0.6))
+    exif = Image.Exif()
+    exif[EXIF_ORIENTATION] = 6
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=95, exif=exif)
+    return output.getvalue()
+
+
+def run(width: int, height: int, runs: int, max_side: int, quality: int):
+    photo = synthetic_photo(width, height, seed=7)
+    photo_base64 = base64.b64encode(photo).decode("utf-8")
+
+    timings, prepared = [], None
+    for _ in range(runs):
+        started = time.perf_counter()
+        prepared = prepare_image(base64.b64decode(photo_base64), photo_base64, max_side=max_side, quality=quality)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    print(f"original : {width}x{height} JPEG, {len(photo) / 1024:8.1f} KB, base64 payload {len(photo_base64) / 1024:8.1f} KB")
+    print(
+        f"prepared : {prepared.width}x{prepared.height} JPEG q{quality}, {prepared.prepared_bytes / 1024:8.1f} KB, "
+        f"base64 payload {len(prepared.base64_data) / 1024:8.1f} KB "
+        f"({len(prepared.base64_data) / len(photo_base64):.1%} of original)"
+    )
+    print(f"prepare  : median {statistics.median(timings):.1f} ms, max {max(timings):.1f} ms over {runs} runs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=4032)
+    parser.add_argument("--height", type=int, default=3024)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-side", type=int, default=2048)
+    parser.add_argument("--quality", type=int, default=85)
+    args = parser.parse_args()
+    run(args.width, args.height, args.runs, args.max_side, args.quality)
@@ -0,0 +1,71 @@
+"""
+Peak Python memory per request for the two ways of sending an image to
+/analyze-image: base64 inside a JSON body, and a binary upload spooled to a
+SpooledTemporaryFile. Measured with tracemalloc from the received body to the
+prepared image, using the synthetic photo from benchmarks.image_preprocessing.
+Pillow's pixel buffers are allocated in C and are the same for both paths, so
+they are not included.
+
+    python -m benchmarks.image_upload_memory --width 4032 --height 3024
+"""
+import argparse
+import base64
+import io
+import json
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.image_preprocessing import synthetic_photo
+from utils.image_preprocessing import prepare_image
+
+CHUNK_SIZE = 64 * 1024
+
+
+def json_path(body: bytes):
+    """What /analyze-image does: parse the JSON body, decode the base64, prepare"""
+    request = json.loads(body)
+    file_bytes = base64.b64decode(request["file"])
+    return prepare_image(file_bytes, original_base64=request["file"])
+
+
+def upload_path(body: bytes, spool_bytes: int):
+    """What /analyze-image/raw does: stream chunks into a spool, prepare from the spool"""
+    stream = io.BytesIO(body)
+    with tempfile.SpooledTemporaryFile(max_size=spool_bytes) as spool:
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            spool.write(chunk)
+        return prepare_image(spool)
+
+
+def _measure(label: str, run, body_bytes: int):
+    tracemalloc.start()
+    started = time.perf_counter()
+    prepared = run()
+    elapsed = (time.perf_counter() - started) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{label:>14}: body {body_bytes / 1024 / 1024:6.2f} MB  peak alloc {peak / 1024 / 1024:6.2f} MB  "
+        f"{elapsed:6.0f} ms  -> {prepared.width}x{prepared.height}"
+    )
+
+
+def run(width: int, height: int, spool_bytes: int):
+    photo = synthetic_photo(width, height, seed=7)
+    json_body = json.dumps({"file": base64.b64encode(photo).decode("utf-8"), "file_id": "f", "user_id": "u"}).encode()
+    # Bodies are built before measuring: they stand in for what arrives on the socket
+    _measure("json/base64", lambda: json_path(json_body), len(json_body))
+    _measure("binary spool", lambda: upload_path(photo, spool_bytes), len(photo))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=4032)
+    parser.add_argument("--height", type=int, default=3024)
+    parser.add_argument("--spool-bytes", type=int, default=1024 * 1024)
+    args = parser.parse_args()
+    run(args.width, args.height, args.spool_bytes)
@@ -0,0 +1,68 @@
+"""
+Cold import time of the application module, measured in fresh interpreters
+with API keys and database settings removed from the environment, so it also
+checks that importing never needs network configuration.
+
+    python -m benchmarks.import_time --runs 5 --top 15
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ENV_KEYS = (
+    "SUPABASE_URL", "SUPABASE_KEY", "SUPABASE_ADMIN", "COHERE_API_KEY",
+    "OPENAI_API_KEY", "GOOGLE_API_KEY", "TAVILY_API_KEY",
+)
+TIMER = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+def _clean_env():
+    # Empty rather than unset: load_dotenv never overrides existing variables,
+    # so a local .env cannot put the keys back
+    return dict(os.environ, **{key: "" for key in ENV_KEYS})
+
+
+def measure(module: str, runs: int):
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", TIMER.format(module=module)],
+            capture_output=True, text=True, env=_clean_env(),
+        )
+        if result.returncode != 0:
+            print(result.stderr)
+            raise SystemExit(f"Importing {module} failed without network configuration")
+        samples.append(float(result.stdout.strip().splitlines()[-1]))
+    return samples
+
+
+def slowest_imports(module: str, top: int):
+    """Cumulative import time per module from -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=_clean_env(),
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = (field.strip() for field in line[len("import time:"):].split("|"))
+        rows.append((int(cumulative_us), name))
+    return sorted(rows, reverse=True)[:top]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    samples = measure(args.module, args.runs)
+    print(f"import {args.module}: median={statistics.median(samples) * 1000:.0f} ms  "
+          f"min={min(samples) * 1000:.0f} ms  max={max(samples) * 1000:.0f} ms  ({args.runs} runs)")
+    print("\nSlowest imports (cumulative):")
+    for cumulative_us, name in slowest_imports(args.module, args.top):
+        print(f"{cumulative_us / 1000:9.1f} ms  {name}")
@@ -0,0 +1,68 @@
+"""
+Recall@k and latency of quantized candidate search + full precision rescoring
+against exact cosine search, on a synthetic corpus shaped like
+embed-english-v3.0 output (1024 dims, unit norm). Chunks are grouped into
+documents and documents into topics, so a query's true neighbours are the
+chunks of one document rather than near-ties across a whole cluster.
+
+    python -m benchmarks.quantized_search --docs 50000 --queries 200
+"""
+import argparse
+import time
+
+import numpy as np
+
+from utils.quantization import quantize_binary, quantize_int8, top_candidates, rescore
+
+
+def synthetic_corpus(chunks: int, dims: int, rng: np.random.Generator, chunks_per_doc: int = 8) -> np.ndarray:
+    documents = max(1, chunks // chunks_per_doc)
+    topics = max(4, documents // 50)
+    topic_centers = rng.standard_normal((topics, dims)).astype(np.float32)
+    doc_centers = topic_centers[rng.integers(0, topics, documents)] + 0.8 * rng.standard_normal((documents, dims)).astype(np.float32)
+    vectors = doc_centers[rng.integers(0, documents, chunks)] + 0.5 * rng.standard_normal((chunks, dims)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def run(docs: int, queries: int, dims: int, k: int, oversample: int, seed: int):
+    rng = np.random.default_rng(seed)
+    corpus = synthetic_corpus(docs, dims, rng)
+    query_vectors = corpus[rng.integers(0, docs, queries)] + (0.5 / np.sqrt(dims)) * rng.standard_normal((queries, dims)).astype(np.float32)
+
+    binary_codes = np.stack([quantize_binary(v) for v in corpus])
+    int8_pairs = [quantize_int8(v) for v in corpus]
+    int8_codes = np.stack([codes for codes, _ in int8_pairs])
+    int8_scales = np.array([scale for _, scale in int8_pairs], dtype=np.float32)
+
+    print(f"corpus: {docs} x {dims}  k={k}  oversample={oversample}")
+    print(f"bytes/vector: float32={dims * 4}  json~={dims * 20}  int8={int8_codes.shape[1]}  binary={binary_codes.shape[1]}")
+
+    exact_top = []
+    start = time.perf_counter()
+    for query in query_vectors:
+        exact_top.append(set(np.argsort(-rescore(query, corpus))[:k]))
+    exact_ms = (time.perf_counter() - start) * 1000 / queries
+    print(f"{'exact':>8}: recall@{k}=1.000  latency={exact_ms:.2f} ms/query")
+
+    for mode, codes, scales in (("binary", binary_codes, None), ("int8", int8_codes, int8_scales)):
+        hits = 0
+        start = time.perf_counter()
+        for query, truth in zip(query_vectors, exact_top):
+            candidates = top_candidates(query, codes, k * oversample, mode, scales)
+            similarities = rescore(query, corpus[candidates])
+            found = candidates[np.argsort(-similarities)[:k]]
+            hits += len(truth.intersection(found.tolist()))
+        latency_ms = (time.perf_counter() - start) * 1000 / queries
+        print(f"{mode:>8}: recall@{k}={hits / (k * queries):.3f}  latency={latency_ms:.2f} ms/query")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--dims", type=int, default=1024)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--oversample", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    run(args.docs, args.queries, args.dims, args.k, args.oversample, args.seed)
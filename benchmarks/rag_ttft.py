@@ -0,0 +1,76 @@
+"""
+Time-to-first-token for the streaming RAG endpoints, compared with the time
+the blocking (stream=false) request takes to return the whole answer.
+Run against a live server:
+
+    python -m benchmarks.rag_ttft --url http://localhost:8001 --user-id <uuid> --runs 5
+"""
+import argparse
+import statistics
+import time
+
+import requests
+
+SOURCES_END = "[/SOURCES]"
+
+
+def timed_stream(url: str, payload: dict):
+    """Returns (seconds to sources event, seconds to first token, total seconds)"""
+    start = time.perf_counter()
+    sources_at = first_token_at = None
+    buffer = ""
+    with requests.post(url, json=dict(payload, stream=True), stream=True, timeout=120) as response:
+        response.raise_for_status()
+        for piece in response.iter_content(chunk_size=None, decode_unicode=True):
+            if not piece:
+                continue
+            buffer += piece
+            if sources_at is None and SOURCES_END in buffer:
+                sources_at = time.perf_counter() - start
+                buffer = buffer.split(SOURCES_END, 1)[1]
+            if sources_at is not None and first_token_at is None and buffer.strip():
+                first_token_at = time.perf_counter() - start
+    total = time.perf_counter() - start
+    return sources_at, first_token_at, total
+
+
+def timed_blocking(url: str, payload: dict) -> float:
+    start = time.perf_counter()
+    response = requests.post(url, json=dict(payload, stream=False), timeout=120)
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+def _summary(label: str, samples):
+    samples = [s for s in samples if s is not None]
+    if not samples:
+        print(f"{label:>22}: n/a")
+        return
+    print(f"{label:>22}: median={statistics.median(samples) * 1000:8.1f} ms  min={min(samples) * 1000:8.1f} ms")
+
+
+def run(base_url: str, endpoint: str, payload: dict, runs: int):
+    url = f"{base_url.rstrip('/')}{endpoint}"
+    streamed = [timed_stream(url, payload) for _ in range(runs)]
+    blocking = [timed_blocking(url, payload) for _ in range(runs)]
+
+    print(f"{endpoint} ({runs} runs, llm={payload['llm_choice']})")
+    _summary("sources event", [s[0] for s in streamed])
+    _summary("first token (TTFT)", [s[1] for s in streamed])
+    _summary("stream complete", [s[2] for s in streamed])
+    _summary("blocking response", blocking)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8001")
+    parser.add_argument("--user-id", help="Enables the /rag-query-v2 run")
+    parser.add_argument("--query", default="List all my current medications and their dosages.")
+    parser.add_argument("--llm-choice", default="openai", choices=["openai", "gemini"])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    payload = {"query": args.query, "llm_choice": args.llm_choice}
+    run(args.url, "/rag-query", payload, args.runs)
+    if args.user_id:
+        run(args.url, "/rag-query-v2", dict(payload, user_id=args.user_id), args.runs)
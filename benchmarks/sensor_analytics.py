@@ -0,0 +1,53 @@
+"""
+Time to compute the report's sensor analytics over a synthetic series:
+a reading every few seconds for months, with a daily heart rate cycle,
+noise, gaps and a few injected tachycardia episodes.
+
+    python -m benchmarks.sensor_analytics --days 90 --interval 5
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from utils.sensor_analytics import compute_sensor_analytics
+
+
+def synthetic_series(days: int, interval: float, seed: int):
+    rng = np.random.default_rng(seed)
+    timestamps = 1_700_000_000 + np.arange(0, days * 86_400, interval, dtype=np.float64)
+    hours = (timestamps % 86_400) / 3600
+    heart_rate = 68 + 10 * np.sin((hours - 9) / 24 * 2 * np.pi) + rng.normal(0, 4, timestamps.size)
+    for start in rng.integers(0, timestamps.size - 2000, 6):
+        heart_rate[start:start + int(1800 / interval)] += 45
+    temperature = 36.6 + 0.3 * np.sin((hours - 15) / 24 * 2 * np.pi) + rng.normal(0, 0.1, timestamps.size)
+    humidity = 45 + rng.normal(0, 5, timestamps.size)
+    # Dropped readings
+    for values in (heart_rate, temperature, humidity):
+        values[rng.random(timestamps.size) < 0.02] = np.nan
+    return {"timestamps": timestamps, "heart_rate": heart_rate, "temperature": temperature, "humidity": humidity}
+
+
+def run(days: int, interval: float, runs: int):
+    series = synthetic_series(days, interval, seed=7)
+    timings, analytics = [], None
+    for _ in range(runs):
+        started = time.perf_counter()
+        analytics = compute_sensor_analytics(series)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    print(f"series    : {series['timestamps'].size:,} readings over {days} days (every {interval:g} s)")
+    print(f"analytics : median {statistics.median(timings):.1f} ms, max {max(timings):.1f} ms over {runs} runs")
+    print(f"resting HR: {analytics['resting_heart_rate']}")
+    anomalies = analytics["heart_rate_anomalies"]
+    print(f"anomalies : {anomalies['total_windows']} windows, longest {anomalies['longest_windows'][:1]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between readings")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    run(args.days, args.interval, args.runs)
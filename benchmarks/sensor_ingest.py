@@ -0,0 +1,61 @@
+"""
+CPU cost of bulk sensor ingest: parsing NDJSON, column-wise validation and
+encoding the COPY payload, batch by batch as the endpoint does. The COPY
+itself is not included; this is the per-worker ceiling before the database.
+
+    python -m benchmarks.sensor_ingest --readings 200000 --batch-rows 5000
+"""
+import argparse
+import json
+import random
+import time
+
+from utils.sensor_ingest import encode_copy_rows, frame_from_ndjson, validate_readings
+
+USER_ID = "3fa85f64-5717-4562-b3fc-2c963f66afa6"
+
+
+def synthetic_lines(readings: int, seed: int):
+    rng = random.Random(seed)
+    start = 1_790_000_000
+    lines = []
+    for i in range(readings):
+        reading = {"created_at": start + i * 5, "beat_avg": round(rng.gauss(72, 8), 1), "temperature_c": round(rng.gauss(36.6, 0.2), 2)}
+        if i % 3 == 0:
+            reading["humidity"] = round(rng.uniform(30, 60), 1)
+        if i % 1000 == 0:
+            reading["beat_avg"] = 999
+        lines.append(json.dumps(reading).encode("utf-8"))
+    return lines
+
+
+def run(readings: int, batch_rows: int):
+    lines = synthetic_lines(readings, seed=7)
+    stages = {"parse": 0.0, "validate": 0.0, "encode": 0.0}
+    accepted = rejected = 0
+    for offset in range(0, len(lines), batch_rows):
+        started = time.perf_counter()
+        frame, _ = frame_from_ndjson(lines[offset:offset + batch_rows])
+        parsed = time.perf_counter()
+        valid, batch_rejected, _ = validate_readings(frame)
+        validated = time.perf_counter()
+        encode_copy_rows(USER_ID, valid)
+        stages["parse"] += parsed - started
+        stages["validate"] += validated - parsed
+        stages["encode"] += time.perf_counter() - validated
+        accepted += len(valid)
+        rejected += batch_rejected
+
+    total = sum(stages.values())
+    print(f"readings  : {readings:,} in batches of {batch_rows:,} ({accepted:,} accepted, {rejected:,} rejected)")
+    for stage, seconds in stages.items():
+        print(f"{stage:10}: {seconds * 1000:8.1f} ms")
+    print(f"total     : {total * 1000:8.1f} ms, {readings / total:,.0f} readings/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readings", type=int, default=200_000)
+    parser.add_argument("--batch-rows", type=int, default=5000)
+    args = parser.parse_args()
+    run(args.readings, args.batch_rows)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -22,3 +23,78 @@ COHERE_API_KEY = os.getenv("COHERE_API_KEY")
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 SUPABASE_ADMIN = os.getenv("SUPABASE_ADMIN")
+
+# RAG context packing
+RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "3000"))
+RAG_MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", "0.7"))
+RAG_DUPLICATE_THRESHOLD = float(os.getenv("RAG_DUPLICATE_THRESHOLD", "0.85"))
+
+# Embedding search: "rpc" (query_embeddings_v3), or "binary"/"int8" candidate
+# search over quantized codes with full precision rescoring
+EMBEDDING_SEARCH_MODE = os.getenv("EMBEDDING_SEARCH_MODE", "rpc")
+QUANTIZED_OVERSAMPLE = int(os.getenv("QUANTIZED_OVERSAMPLE", "4"))
+
+# Durable job queue and PDF workers
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "jobs.sqlite3")
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "900"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "10"))
+JOB_RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "600"))
+# "embedded" runs the worker pool inside the web process, "external" expects `python worker.py`
+PDF_WORKER_MODE = os.getenv("PDF_WORKER_MODE", "embedded")
+PDF_WORKER_CONCURRENCY = int(os.getenv("PDF_WORKER_CONCURRENCY", "2"))
+PDF_JOB_MAX_ATTEMPTS = int(os.getenv("PDF_JOB_MAX_ATTEMPTS", "3"))
+PDF_WORK_DIR = os.getenv("PDF_WORK_DIR", os.path.join(tempfile.gettempdir(), "vitalsense-pdf"))
+# Downloads are streamed to disk; larger files are rejected rather than retried
+PDF_MAX_DOWNLOAD_BYTES = int(os.getenv("PDF_MAX_DOWNLOAD_BYTES", str(50 * 1024 * 1024)))
+PDF_DOWNLOAD_TIMEOUT = float(os.getenv("PDF_DOWNLOAD_TIMEOUT", "120"))
+# Pages whose embedded text layer has fewer readable characters than this are sent to OCR
+PDF_TEXT_LAYER_MIN_CHARS = int(os.getenv("PDF_TEXT_LAYER_MIN_CHARS", "40"))
+# Scanned pages are transcribed in ranges of this many pages, several ranges at a time
+PDF_OCR_PAGES_PER_RANGE = int(os.getenv("PDF_OCR_PAGES_PER_RANGE", "5"))
+PDF_OCR_CONCURRENCY = int(os.getenv("PDF_OCR_CONCURRENCY", "4"))
+PDF_OCR_RANGE_ATTEMPTS = int(os.getenv("PDF_OCR_RANGE_ATTEMPTS", "3"))
+# Images sent for OCR are downscaled so their longest side is at most this, and re-encoded as JPEG
+IMAGE_MAX_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "2048"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+# Local cache of OCR results keyed by image hash; least recently used entries are evicted past the size cap
+OCR_CACHE_PATH = os.getenv("OCR_CACHE_PATH", "ocr_cache.sqlite3")
+OCR_CACHE_MAX_BYTES = int(os.getenv("OCR_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# /analyze-images: images analyzed at once, and the most accepted per request
+IMAGE_BATCH_CONCURRENCY = int(os.getenv("IMAGE_BATCH_CONCURRENCY", "4"))
+IMAGE_BATCH_MAX_ITEMS = int(os.getenv("IMAGE_BATCH_MAX_ITEMS", "50"))
+# Binary image uploads: size limit, and how much of an upload is buffered in memory before spilling to disk
+IMAGE_UPLOAD_MAX_BYTES = int(os.getenv("IMAGE_UPLOAD_MAX_BYTES", str(20 * 1024 * 1024)))
+IMAGE_UPLOAD_SPOOL_BYTES = int(os.getenv("IMAGE_UPLOAD_SPOOL_BYTES", str(1024 * 1024)))
+
+# Health reports: sections written at once, and the output cap and timeout of each section's LLM call
+REPORT_SECTION_CONCURRENCY = int(os.getenv("REPORT_SECTION_CONCURRENCY", "3"))
+REPORT_SECTION_MAX_TOKENS = int(os.getenv("REPORT_SECTION_MAX_TOKENS", "1200"))
+REPORT_SECTION_TIMEOUT = float(os.getenv("REPORT_SECTION_TIMEOUT", "90"))
+# Sensor analytics for reports: days of raw readings analyzed, the users' UTC offset for day/night,
+# night hours, and the robust z-score past which heart rate counts as anomalous
+SENSOR_ANALYTICS_DAYS = int(os.getenv("SENSOR_ANALYTICS_DAYS", "30"))
+SENSOR_UTC_OFFSET_HOURS = float(os.getenv("SENSOR_UTC_OFFSET_HOURS", "0"))
+SENSOR_NIGHT_START_HOUR = int(os.getenv("SENSOR_NIGHT_START_HOUR", "22"))
+SENSOR_NIGHT_END_HOUR = int(os.getenv("SENSOR_NIGHT_END_HOUR", "6"))
+SENSOR_ANOMALY_Z = float(os.getenv("SENSOR_ANOMALY_Z", "3.5"))
+# Sensor readings stored without a user_id: "ignore" them, or treat them as "shared" by every user
+# (single-device deployments from before sensor_data had a user_id; see sql/012_sensor_data_owner.sql)
+SENSOR_UNATTRIBUTED_READINGS = os.getenv("SENSOR_UNATTRIBUTED_READINGS", "ignore")
+# Sensor charts: most points a downsampled series may have, and rows read from the database per batch
+SENSOR_SERIES_MAX_POINTS = int(os.getenv("SENSOR_SERIES_MAX_POINTS", "5000"))
+SENSOR_SERIES_FETCH_ROWS = int(os.getenv("SENSOR_SERIES_FETCH_ROWS", "10000"))
+# Bulk sensor ingest: readings validated and written per COPY, and the largest accepted body
+SENSOR_INGEST_BATCH_ROWS = int(os.getenv("SENSOR_INGEST_BATCH_ROWS", "5000"))
+SENSOR_INGEST_MAX_BYTES = int(os.getenv("SENSOR_INGEST_MAX_BYTES", str(64 * 1024 * 1024)))
+# Scheduled health reports: where the workers run ("embedded" in the API process or "external" in
+# worker.py), worker threads, attempts per user, how recently a user's data must have changed to count
+# as active, the LLM used, and how long a verified report may be reused by POST /health-report
+REPORT_WORKER_MODE = os.getenv("REPORT_WORKER_MODE", "external")
+REPORT_WORKER_CONCURRENCY = int(os.getenv("REPORT_WORKER_CONCURRENCY", "4"))
+REPORT_JOB_MAX_ATTEMPTS = int(os.getenv("REPORT_JOB_MAX_ATTEMPTS", "3"))
+SCHEDULED_REPORT_ACTIVE_DAYS = int(os.getenv("SCHEDULED_REPORT_ACTIVE_DAYS", "7"))
+SCHEDULED_REPORT_LLM = os.getenv("SCHEDULED_REPORT_LLM", "openai")
+REPORT_REUSE_MAX_AGE_HOURS = float(os.getenv("REPORT_REUSE_MAX_AGE_HOURS", "12"))
+# Report LLM calls allowed per minute per process, for each provider
+OPENAI_REQUESTS_PER_MINUTE = float(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "500"))
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60"))
@@ -2,10 +2,15 @@ from sqlalchemy import create_engine, text
 import pandas as pd
 from utils.custom_types import DBCredentials
 from typing import Dict, Any, Optional
+from utils.clients import get_client
 
-def get_db_structure(db_credentials: DBCredentials):
+def get_engine(db_credentials: DBCredentials):
+    """Shared engine per database, so queries reuse pooled connections instead of reconnecting"""
     db_url = f"postgresql://{db_credentials.db_user}:{db_credentials.db_password}@{db_credentials.db_host}:{db_credentials.db_port}/{db_credentials.db_name}"
-    engine = create_engine(db_url)
+    return get_client("sql_engine", db_url, lambda: create_engine(db_url, pool_size=10, max_overflow=10, pool_pre_ping=True))
+
+def get_db_structure(db_credentials: DBCredentials):
+    engine = get_engine(db_credentials)
 
     ddl_query = """
     SELECT 
@@ -49,8 +54,7 @@ def get_db_structure(db_credentials: DBCredentials):
     return "\n\n".join(ddl_statements)
 
 def execute_sql_query(query: str, db_credentials: DBCredentials, params: Optional[Dict[str, Any]] = None):
-    db_url = f"postgresql://{db_credentials.db_user}:{db_credentials.db_password}@{db_credentials.db_host}:{db_credentials.db_port}/{db_credentials.db_name}"
-    engine = create_engine(db_url)
+    engine = get_engine(db_credentials)
     with engine.connect() as connection:
         result = connection.execute(text(query), params if params else {})
         df = pd.DataFrame(result.fetchall(), columns=result.keys())
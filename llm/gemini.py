@@ -1,7 +1,5 @@
-import google.generativeai as genai
-from config import GOOGLE_API_KEY, GEMINI_MODEL
-
-genai.configure(api_key=GOOGLE_API_KEY)
+from config import GEMINI_MODEL
+from utils.clients import configure_genai
 
 def nl_to_sql_gemini(question: str, table_info: str) -> str:
     prompt = f"""
@@ -16,12 +14,12 @@ def nl_to_sql_gemini(question: str, table_info: str) -> str:
     Return only the SQL query, without any additional explanation.
     """
 
-    model = genai.GenerativeModel('gemini-1.5-flash')
+    model = configure_genai().GenerativeModel('gemini-1.5-flash')
     response = model.generate_content(prompt)
 
     return response.text.strip()
 
 def format_response_gemini(prompt: str) -> str:
-    model = genai.GenerativeModel(GEMINI_MODEL)
+    model = configure_genai().GenerativeModel(GEMINI_MODEL)
     response = model.generate_content(prompt)
     return response.text.strip()
\ No newline at end of file
@@ -1,7 +1,5 @@
-from openai import OpenAI
-from config import OPENAI_API_KEY, OPENAI_MODEL
-
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
+from config import OPENAI_MODEL
+from utils.clients import get_openai
 
 def nl_to_sql_openai(question: str, table_info: str) -> str:
     prompt = f"""
@@ -17,7 +15,7 @@ def nl_to_sql_openai(question: str, table_info: str) -> str:
     Return only the SQL query, without any additional explanation.
     """
 
-    response = openai_client.chat.completions.create(
+    response = get_openai().chat.completions.create(
         model="gpt-4o-mini",
         messages=[
             {"role": "system", "content": "You are a SQL expert. Convert natural language questions to SQL queries."},
@@ -29,7 +27,7 @@ def nl_to_sql_openai(question: str, table_info: str) -> str:
     return response.choices[0].message.content.strip()
 
 def format_response_openai(prompt: str) -> str:
-    response = openai_client.chat.completions.create(
+    response = get_openai().chat.completions.create(
         model=OPENAI_MODEL,
         messages=[
             {"role": "system", "content": "You are a data analyst providing insights on query results. Use markdown formatting in your responses."},
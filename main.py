@@ -1,9 +1,18 @@
+import time
+_import_started = time.perf_counter()
+
+import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import medical_documents_generator, query, chat, db_structure, rag_query, web_search, transcribe_pdf, transcribe_image, rag_query_v2, health_report
-from config import ORIGINS
+from routers import medical_documents_generator, query, chat, db_structure, rag_query, web_search, transcribe_pdf, transcribe_image, rag_query_v2, health_report, sensor_data
+from config import ORIGINS, PDF_WORKER_MODE, REPORT_WORKER_MODE
+
+logger = logging.getLogger(__name__)
+_imports_done = time.perf_counter()
 
 app = FastAPI()
+app.state.startup_timings = {"imports_ms": round((_imports_done - _import_started) * 1000, 1)}
+logger.info(f"Imported application modules in {app.state.startup_timings['imports_ms']} ms")
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,8 +31,40 @@ app.include_router(transcribe_pdf.router)
 app.include_router(transcribe_image.router)
 app.include_router(rag_query_v2.router)
 app.include_router(health_report.router)
+app.include_router(sensor_data.router)
 app.include_router(medical_documents_generator.router)
 
+@app.on_event("startup")
+async def start_pdf_workers():
+    # With PDF_WORKER_MODE=external the pool runs in worker.py instead
+    app.state.pdf_workers = None
+    if PDF_WORKER_MODE == "embedded":
+        app.state.pdf_workers = transcribe_pdf.create_pdf_worker_pool()
+        app.state.pdf_workers.start()
+
+@app.on_event("startup")
+async def start_report_workers():
+    # Scheduled reports run in worker.py unless REPORT_WORKER_MODE=embedded
+    app.state.report_workers = None
+    if REPORT_WORKER_MODE == "embedded":
+        app.state.report_workers = health_report.create_report_worker_pool()
+        app.state.report_workers.start()
+
+@app.on_event("startup")
+async def record_startup_time():
+    app.state.startup_timings["ready_ms"] = round((time.perf_counter() - _import_started) * 1000, 1)
+    logger.info(f"Application ready {app.state.startup_timings['ready_ms']} ms after import started")
+
+@app.on_event("shutdown")
+async def stop_pdf_workers():
+    if app.state.pdf_workers:
+        app.state.pdf_workers.stop(timeout=30)
+
+@app.on_event("shutdown")
+async def stop_report_workers():
+    if app.state.report_workers:
+        app.state.report_workers.stop(timeout=30)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
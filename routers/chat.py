@@ -5,7 +5,8 @@ import pandas as pd
 from database import get_db_structure, execute_sql_query
 from utils.formatting import format_response_with_llm
 from utils.streaming import stream_formatted_response
-from llm import open_ai, gemini, local
+from llm import local
+from utils.clients import get_openai, configure_genai
 from config import OPENAI_MODEL, GEMINI_MODEL
 
 router = APIRouter()
@@ -25,14 +26,14 @@ async def chat(request: ChatRequest):
 
         # Generate SQL query (non-streaming)
         if request.llm_choice == "openai":
-            response = open_ai.openai_client.chat.completions.create(
+            response = get_openai().chat.completions.create(
                 model=OPENAI_MODEL,
                 messages=all_messages,
                 temperature=0,
             )
             sql_query = response.choices[0].message.content.strip()
         elif request.llm_choice == "gemini":
-            model = gemini.genai.GenerativeModel(GEMINI_MODEL)
+            model = configure_genai().GenerativeModel(GEMINI_MODEL)
             response = model.generate_content([m['content'] for m in all_messages])
             sql_query = response.text.strip()
         elif request.llm_choice == "local":
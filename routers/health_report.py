@@ -1,46 +1,87 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, UUID4
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+from typing import List, Dict, Any, Optional, Callable, Awaitable, Tuple
+from datetime import datetime, timedelta, timezone
+from contextlib import contextmanager
 import asyncio
 import logging
-from supabase import create_client, Client
+import time
 
 from database import execute_sql_query, get_db_structure
 from utils.custom_types import ChatRequest, DBCredentials
+from utils.job_queue import Job, WorkerPool, get_job_queue
+from utils.rate_limit import get_rate_limiter
 from utils.database_utils import get_db_credentials
-from llm import open_ai, gemini
-from config import OPENAI_MODEL, GEMINI_MODEL, SUPABASE_URL, SUPABASE_KEY
+from utils.report_sections import (
+    REPORT_SECTIONS,
+    PENDING_SECTION_TEXT,
+    ReportSection,
+    section_hash,
+    report_fingerprint,
+    build_section_prompt,
+    stitch_report,
+    get_cached_sections,
+    cache_section
+)
+from routers.rag_query_v2 import batch_retrieve
+from utils.clients import get_supabase, get_openai, configure_genai
+from config import (
+    OPENAI_MODEL, GEMINI_MODEL, REPORT_SECTION_CONCURRENCY, REPORT_SECTION_MAX_TOKENS, REPORT_SECTION_TIMEOUT,
+    REPORT_WORKER_CONCURRENCY, REPORT_REUSE_MAX_AGE_HOURS, OPENAI_REQUESTS_PER_MINUTE, GEMINI_REQUESTS_PER_MINUTE
+)
 from utils.health_queries import (
     get_nutrition_summary,
     get_sensor_stats,
     get_food_consumption,
     get_nutrition_trends
 )
+from utils.sensor_analytics import get_sensor_analytics
 
-# Configure logging and Supabase
+# Configure logging
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
 router = APIRouter()
 
+REPORT_JOB_KIND = "health_report"
+
 class HealthReportRequest(BaseModel):
     user_id: UUID4
     llm_choice: str = "openai"
+    # Return a stored report verified within this many hours if the user's data has not changed since; 0 always generates
+    max_age_hours: float = REPORT_REUSE_MAX_AGE_HOURS
 
 class HealthReportResponse(BaseModel):
     report_id: UUID4
     message: str
+    reused: bool = False
 
 class HealthReportStatus(BaseModel):
     id: UUID4
     status: str
     report_content: Optional[str] = None
     error_message: Optional[str] = None
+    stage_timings: Optional[Dict[str, float]] = None
+    token_usage: Optional[Dict[str, Any]] = None
+    # Status of each section by key; report_content holds the finished ones while status is "generating"
+    sections: Optional[Dict[str, str]] = None
     created_at: datetime
     updated_at: datetime
 
+@contextmanager
+def record_timing(timings: Dict[str, float], stage: str):
+    """Store the milliseconds spent in the block under timings[stage]"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = round((time.perf_counter() - started) * 1000, 1)
+
+async def run_timed(timings: Dict[str, float], stage: str, func: Callable, *args) -> Any:
+    """Run a blocking call on a worker thread so it overlaps with other stages and leaves the event loop free"""
+    with record_timing(timings, stage):
+        return await asyncio.to_thread(func, *args)
+
 async def get_table_data(query: str, user_id: str, llm_choice: str) -> Dict[str, Any]:
     """Get data using the chat endpoint's query generation"""
     logger.info(f"Generating SQL for query: {query}")
@@ -64,7 +105,7 @@ async def get_table_data(query: str, user_id: str, llm_choice: str) -> Dict[str,
     try:
         if llm_choice == "openai":
             logger.debug(f"Using OpenAI to generate SQL for: {query}")
-            response = open_ai.openai_client.chat.completions.create(
+            response = get_openai().chat.completions.create(
                 model=OPENAI_MODEL,
                 messages=messages,
                 temperature=0,
@@ -72,7 +113,7 @@ async def get_table_data(query: str, user_id: str, llm_choice: str) -> Dict[str,
             sql_query = response.choices[0].message.content.strip()
         elif llm_choice == "gemini":
             logger.debug(f"Using Gemini to generate SQL for: {query}")
-            model = gemini.genai.GenerativeModel(GEMINI_MODEL)
+            model = configure_genai().GenerativeModel(GEMINI_MODEL)
             response = model.generate_content([m['content'] for m in messages])
             sql_query = response.text.strip()
         else:
@@ -97,40 +138,24 @@ async def get_table_data(query: str, user_id: str, llm_choice: str) -> Dict[str,
         logger.error(f"Query execution failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Query execution failed: {str(e)}")
 
-async def fetch_rag_data(query: str, user_id: str, llm_choice: str) -> str:
-    """Fetch data using RAG query endpoint"""
-    logger.info(f"Fetching RAG data for query: {query}")
-    
+async def get_health_data(user_id: str, db_credentials: DBCredentials, timings: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """Fetch all health-related data, running the aggregate queries in parallel on pooled connections"""
+    timings = {} if timings is None else timings
     try:
-        from routers.rag_query_v2 import RAGQueryRequest, rag_query
-        
-        request = RAGQueryRequest(
-            query=query,
-            match_count=5,
-            llm_choice=llm_choice,
-            user_id=user_id
+        nutrition_summary, sensor_stats, food_consumption, nutrition_trends, sensor_analytics = await asyncio.gather(
+            run_timed(timings, "sql_nutrition_summary_ms", get_nutrition_summary, user_id, db_credentials),
+            run_timed(timings, "sql_sensor_stats_ms", get_sensor_stats, user_id, db_credentials),
+            run_timed(timings, "sql_food_consumption_ms", get_food_consumption, user_id, db_credentials),
+            run_timed(timings, "sql_nutrition_trends_ms", get_nutrition_trends, user_id, db_credentials),
+            run_timed(timings, "sensor_analytics_ms", get_sensor_analytics, user_id, db_credentials),
         )
         
-        response = await rag_query(request)
-        logger.debug(f"RAG response received for query: {query}")
-        return response["response"]
-    except Exception as e:
-        logger.error(f"RAG query failed: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"RAG query failed: {str(e)}")
-
-async def get_health_data(user_id: str, db_credentials: DBCredentials) -> Dict[str, Any]:
-    """Fetch all health-related data"""
-    try:
-        nutrition_summary = get_nutrition_summary(user_id, db_credentials)
-        sensor_stats = get_sensor_stats(user_id, db_credentials)
-        food_consumption = get_food_consumption(user_id, db_credentials)
-        nutrition_trends = get_nutrition_trends(user_id, db_credentials)
-        
         return {
             "nutrition_summary": nutrition_summary,
             "sensor_stats": sensor_stats,
             "food_consumption": food_consumption,
-            "nutrition_trends": nutrition_trends
+            "nutrition_trends": nutrition_trends,
+            "sensor_analytics": sensor_analytics
         }
     except Exception as e:
         logger.error(f"Error fetching health data: {str(e)}")
@@ -144,175 +169,353 @@ async def update_report_status(report_id: UUID4, status: str, error_message: Opt
             "error_message": error_message,
             "updated_at": datetime.utcnow().isoformat()
         }
-        supabase.table("health_reports").update(data).eq("id", str(report_id)).execute()
+        get_supabase().table("health_reports").update(data).eq("id", str(report_id)).execute()
     except Exception as e:
         logger.error(f"Failed to update report status: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to update report status: {str(e)}")
 
-async def update_report_content(report_id: UUID4, content: str):
+async def update_report_content(
+    report_id: UUID4,
+    content: str,
+    stage_timings: Optional[Dict[str, float]] = None,
+    token_usage: Optional[Dict[str, Any]] = None,
+    data_fingerprint: Optional[str] = None,
+    sections: Optional[Dict[str, str]] = None
+):
     """Update the report content"""
     try:
+        now = datetime.utcnow().isoformat()
         data = {
             "status": "completed",
             "report_content": content,
-            "updated_at": datetime.utcnow().isoformat()
+            "updated_at": now,
+            "verified_at": now
         }
-        supabase.table("health_reports").update(data).eq("id", str(report_id)).execute()
+        if stage_timings is not None:
+            data["stage_timings"] = stage_timings
+        if token_usage is not None:
+            data["token_usage"] = token_usage
+        if data_fingerprint is not None:
+            data["data_fingerprint"] = data_fingerprint
+        if sections is not None:
+            data["sections"] = sections
+        get_supabase().table("health_reports").update(data).eq("id", str(report_id)).execute()
     except Exception as e:
         logger.error(f"Failed to update report content: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to update report content: {str(e)}")
 
-async def create_report_record(user_id: UUID4, llm_choice: str) -> UUID4:
+async def save_partial_report(report_id: UUID4, content: str, sections: Dict[str, str]):
+    """Persist the sections finished so far while the report is still generating"""
+    data = {
+        "report_content": content,
+        "sections": sections,
+        "updated_at": datetime.utcnow().isoformat()
+    }
+    await asyncio.to_thread(
+        lambda: get_supabase().table("health_reports").update(data).eq("id", str(report_id)).execute()
+    )
+
+async def create_report_record(user_id: UUID4, llm_choice: str, trigger: str = "on_demand") -> UUID4:
     """Create initial report record"""
     try:
         data = {
             "user_id": str(user_id),
             "status": "pending",
             "llm_choice": llm_choice,
+            "trigger": trigger,
             "created_at": datetime.utcnow().isoformat(),
             "updated_at": datetime.utcnow().isoformat()
         }
-        result = supabase.table("health_reports").insert(data).execute()
+        result = get_supabase().table("health_reports").insert(data).execute()
         return result.data[0]['id']
     except Exception as e:
         logger.error(f"Failed to create report record: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to create report record: {str(e)}")
 
-async def generate_report_background(report_id: UUID4, request: HealthReportRequest):
-    """Background task to generate report"""
+def get_latest_report(user_id: str, llm_choice: str) -> Optional[Dict[str, Any]]:
+    """The user's most recent completed report for this LLM, with whether their data changed after it was created"""
+    query = """
+    SELECT r.id, r.data_fingerprint, r.created_at, r.verified_at,
+           EXISTS (
+               SELECT 1 FROM daily_health_rollups d
+               WHERE d.user_id = r.user_id AND d.updated_at > r.created_at
+           ) AS data_changed
+    FROM health_reports r
+    WHERE r.user_id = :user_id AND r.llm_choice = :llm_choice AND r.status = 'completed'
+    ORDER BY r.created_at DESC
+    LIMIT 1
+    """
+    result = execute_sql_query(query, get_db_credentials(), {"user_id": user_id, "llm_choice": llm_choice})
+    return result[0] if result else None
+
+def mark_report_verified(report_id: str):
+    """Record that a completed report still matches its user's data"""
+    get_supabase().table("health_reports").update(
+        {"verified_at": datetime.utcnow().isoformat()}
+    ).eq("id", str(report_id)).execute()
+
+def generate_report_text(report_prompt: str, llm_choice: str) -> Tuple[str, Dict[str, int]]:
+    """Blocking LLM call for one report section; returns the text and its token usage"""
+    if llm_choice == "openai":
+        logger.debug("Using OpenAI for report generation")
+        get_rate_limiter("openai", OPENAI_REQUESTS_PER_MINUTE).acquire()
+        response = get_openai().chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=[{"role": "user", "content": report_prompt}],
+            temperature=0.7,
+            max_tokens=REPORT_SECTION_MAX_TOKENS,
+            timeout=REPORT_SECTION_TIMEOUT,
+        )
+        usage = response.usage
+        return response.choices[0].message.content, {
+            "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+            "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        }
+    elif llm_choice == "gemini":
+        logger.debug("Using Gemini for report generation")
+        get_rate_limiter("gemini", GEMINI_REQUESTS_PER_MINUTE).acquire()
+        model = configure_genai().GenerativeModel(GEMINI_MODEL)
+        response = model.generate_content(
+            report_prompt,
+            generation_config={"max_output_tokens": REPORT_SECTION_MAX_TOKENS},
+            request_options={"timeout": REPORT_SECTION_TIMEOUT},
+        )
+        usage = getattr(response, "usage_metadata", None)
+        return response.text, {
+            "prompt_tokens": getattr(usage, "prompt_token_count", 0) or 0,
+            "completion_tokens": getattr(usage, "candidates_token_count", 0) or 0,
+        }
+    raise HTTPException(status_code=400, detail="Invalid LLM choice")
+
+async def generate_sections(
+    user_id: str,
+    report_data: Dict[str, Any],
+    llm_choice: str,
+    timings: Dict[str, float],
+    on_progress: Optional[Callable[[Dict[str, str], Dict[str, str]], Awaitable[None]]] = None
+) -> Tuple[Dict[str, str], Dict[str, Any]]:
+    """
+    Write every report section, reusing cached sections whose inputs are
+    unchanged and generating the rest concurrently, at most
+    REPORT_SECTION_CONCURRENCY at a time. on_progress(contents, states) is
+    awaited once the cached sections are known and again as each generated
+    section finishes. Returns the section contents by key and the report's
+    token usage, including tokens saved.
+    """
+    hashes = {section.key: section_hash(section, report_data, llm_choice) for section in REPORT_SECTIONS}
+    with record_timing(timings, "section_cache_ms"):
+        cached = await asyncio.to_thread(get_cached_sections, user_id, hashes)
+
+    contents = {key: row["content"] for key, row in cached.items()}
+    states = {section.key: "cached" if section.key in cached else "pending" for section in REPORT_SECTIONS}
+    stale = [section for section in REPORT_SECTIONS if section.key not in cached]
+    logger.info(f"Report sections cached: {sorted(cached)}; regenerating: {[section.key for section in stale]}")
+    if on_progress and cached:
+        await on_progress(contents, states)
+
+    usage = {"prompt_tokens": 0, "completion_tokens": 0}
+    semaphore = asyncio.Semaphore(REPORT_SECTION_CONCURRENCY)
+
+    async def write_section(section: ReportSection):
+        async with semaphore:
+            try:
+                content, section_usage = await run_timed(
+                    timings, f"llm_{section.key}_ms",
+                    generate_report_text, build_section_prompt(section, report_data), llm_choice
+                )
+            except Exception as e:
+                logger.error(f"Generating report section {section.key} failed: {e}")
+                states[section.key] = "failed"
+                if on_progress:
+                    await on_progress(contents, states)
+                raise
+        contents[section.key] = content
+        states[section.key] = "generated"
+        usage["prompt_tokens"] += section_usage["prompt_tokens"]
+        usage["completion_tokens"] += section_usage["completion_tokens"]
+        # Cache what succeeded even if another section fails, so a retry only redoes the failures
+        try:
+            await asyncio.to_thread(cache_section, user_id, section.key, hashes[section.key], content, section_usage)
+        except Exception as e:
+            logger.warning(f"Could not cache report section {section.key}: {e}")
+        if on_progress:
+            await on_progress(contents, states)
+
+    results = await asyncio.gather(*(write_section(section) for section in stale), return_exceptions=True)
+    failures = [(section, result) for section, result in zip(stale, results) if isinstance(result, BaseException)]
+    if failures:
+        section, error = failures[0]
+        raise RuntimeError(f"Report section '{section.title}' failed: {error}") from error
+
+    token_usage = {
+        **usage,
+        "tokens_saved": sum(row["prompt_tokens"] + row["completion_tokens"] for row in cached.values()),
+        "sections_cached": sorted(cached),
+        "sections_generated": [section.key for section in stale],
+    }
+    return contents, token_usage
+
+async def gather_report_data(user_id: str, timings: Dict[str, float]) -> Dict[str, Any]:
+    """Everything the report sections are written from: RAG context from the user's documents and the SQL aggregates"""
+    # RAG retrieval and the SQL aggregates are independent: run them side by side
+    logger.info("Fetching RAG and health data...")
+    rag_queries = [
+        "List all my current medications, prescriptions, and their dosages. Include any recent changes.",
+        "Summarize my physical activity and exercise routine. Include any fitness goals, achievements, and regular activities.",
+        "What are my chronic conditions or ongoing health issues? Include any allergies or medical conditions.",
+        "List my recent medical appointments, diagnoses, and test results. Include any doctor's recommendations."
+    ]
+
+    # Raw context per sub-query; the section prompts are the only LLM calls
+    db_credentials = get_db_credentials()
+    with record_timing(timings, "gather_ms"):
+        rag_results, health_data = await asyncio.gather(
+            run_timed(timings, "rag_ms", batch_retrieve, rag_queries, user_id),
+            get_health_data(user_id, db_credentials, timings),
+        )
+    rag_data = [
+        result["context"] or "No relevant documents found."
+        for result in rag_results
+    ]
+    return {
+        "medications": rag_data[0],
+        "physical_activity": rag_data[1],
+        "conditions": rag_data[2],
+        "medical_history": rag_data[3],
+        **health_data
+    }
+
+async def write_report(
+    report_id: UUID4,
+    user_id: str,
+    llm_choice: str,
+    report_data: Dict[str, Any],
+    timings: Dict[str, float],
+    started: float
+) -> Dict[str, Any]:
+    """Generate the sections into the report record and complete it; raises if generation fails. Returns the token usage"""
+    # Each finished section is saved straight away, so the status endpoint can show a partial report.
+    # Writes are serialized and each one holds every section done so far, so a slow write never
+    # overwrites a newer one with fewer sections.
+    save_lock = asyncio.Lock()
+
+    async def save_progress(contents: Dict[str, str], states: Dict[str, str]):
+        async with save_lock:
+            try:
+                await save_partial_report(report_id, stitch_report(contents, PENDING_SECTION_TEXT), dict(states))
+            except Exception as e:
+                logger.warning(f"Could not save partial report {report_id}: {e}")
+
+    # Generate the sections using the specified LLM
+    with record_timing(timings, "llm_ms"):
+        contents, token_usage = await generate_sections(user_id, report_data, llm_choice, timings, save_progress)
+    report_content = stitch_report(contents)
+    timings["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    sections = {
+        section.key: "cached" if section.key in token_usage["sections_cached"] else "generated"
+        for section in REPORT_SECTIONS
+    }
+
+    # Update report with content
+    await update_report_content(
+        report_id, report_content, timings, token_usage, report_fingerprint(report_data, llm_choice), sections
+    )
+    logger.info(f"Report generation completed for report_id: {report_id} ({timings}, {token_usage})")
+    return token_usage
+
+async def generate_report_background(
+    report_id: UUID4,
+    request: HealthReportRequest,
+    report_data: Optional[Dict[str, Any]] = None,
+    timings: Optional[Dict[str, float]] = None,
+    started: Optional[float] = None
+):
+    """Background task to generate report; report_data is gathered here unless the caller already has it"""
+    timings = {} if timings is None else timings
+    started = time.perf_counter() if started is None else started
     try:
         # Update status to generating
         await update_report_status(report_id, 'generating')
-        
-        # Fetch RAG data
-        logger.info("Fetching RAG data...")
-        rag_queries = [
-            "List all my current medications, prescriptions, and their dosages. Include any recent changes.",
-            "Summarize my physical activity and exercise routine. Include any fitness goals, achievements, and regular activities.",
-            "What are my chronic conditions or ongoing health issues? Include any allergies or medical conditions.",
-            "List my recent medical appointments, diagnoses, and test results. Include any doctor's recommendations."
-        ]
-        
-        rag_data = await asyncio.gather(*[
-            fetch_rag_data(query, str(request.user_id), request.llm_choice)
-            for query in rag_queries
-        ])
-        
-        # Fetch table data using deterministic queries
-        logger.info("Fetching health data...")
-        db_credentials = get_db_credentials()
-        health_data = await get_health_data(str(request.user_id), db_credentials)
-        
-        # Construct the report prompt
-        report_prompt = f"""
-        Create a comprehensive health report in markdown format. Use the following data sources carefully to avoid redundancy:
-
-        Medical Information:
-        - Current Medications and Prescriptions: {rag_data[0]}
-        - Chronic Conditions and Health Issues: {rag_data[2]}
-        - Recent Medical History: {rag_data[3]}
-        
-        Sensor Data Statistics (Last 30 Days):
-        {health_data['sensor_stats']}
-
-        Nutrition and Diet:
-        - Daily Nutrition Summary: {health_data['nutrition_summary']}
-        - Food Consumption Patterns: {health_data['food_consumption']}
-        - Overall Nutrition Trends: {health_data['nutrition_trends']}
-
-        Physical Activity and Fitness:
-        {rag_data[1]}
-
-        Format the report with these sections:
-
-        1. Executive Summary
-           - Brief overview of overall health status
-           - Key metrics and important findings
-           - Any immediate concerns or improvements
-
-        2. Medical Overview
-           - Current Medications and Treatments
-           - Recent Medical History
-           - Important Health Records
-           - Ongoing Medical Conditions (if any)
-
-        3. Vital Signs Analysis
-           - Heart Rate Trends (min, max, average)
-           - Temperature Patterns
-           - Other Sensor Measurements
-           - Comparison with Normal Ranges
-
-        4. Nutrition and Diet Assessment
-           - Caloric Intake Analysis
-           - Macronutrient Distribution (proteins, carbs, fats)
-           - Most Frequent Food Choices
-           - Dietary Patterns and Trends
-           - Areas for Nutritional Improvement
-
-        5. Physical Activity and Fitness
-           - Activity Level Assessment
-           - Exercise Patterns
-           - Progress and Trends
-           - Movement and Activity Recommendations
-
-        6. Recommendations and Action Items
-           - Medical Follow-ups (if needed)
-           - Dietary Adjustments
-           - Fitness Goals
-           - Lifestyle Modifications
-           - Preventive Health Measures
-
-        Guidelines:
-        1. Make it professional but easy to understand
-        2. Use markdown formatting (headers, lists, bold for important points)
-        3. Include specific numbers and trends where relevant
-        4. Highlight any concerning patterns or notable improvements
-        5. Provide actionable recommendations based on the data
-        6. Use tables or bullet points for better readability
-        7. Add context to numbers (e.g., "heart rate of 75 bpm is within normal range")
-
-        Focus on creating a cohesive narrative that connects all health aspects while maintaining clear section separation.
-        """
-
-        # Generate the report using the specified LLM
-        try:
-            if request.llm_choice == "openai":
-                logger.debug("Using OpenAI for final report generation")
-                response = open_ai.openai_client.chat.completions.create(
-                    model=OPENAI_MODEL,
-                    messages=[{"role": "user", "content": report_prompt}],
-                    temperature=0.7,
-                )
-                report_content = response.choices[0].message.content
-            elif request.llm_choice == "gemini":
-                logger.debug("Using Gemini for final report generation")
-                model = gemini.genai.GenerativeModel(GEMINI_MODEL)
-                response = model.generate_content(report_prompt)
-                report_content = response.text
-            else:
-                raise HTTPException(status_code=400, detail="Invalid LLM choice")
-
-            # Update report with content
-            await update_report_content(report_id, report_content)
-            logger.info(f"Report generation completed for report_id: {report_id}")
-
-        except Exception as e:
-            logger.error(f"Report generation failed: {str(e)}")
-            await update_report_status(report_id, 'failed', str(e))
-            
+        if report_data is None:
+            report_data = await gather_report_data(str(request.user_id), timings)
+        await write_report(report_id, str(request.user_id), request.llm_choice, report_data, timings, started)
     except Exception as e:
         logger.error(f"Report generation failed: {str(e)}")
         await update_report_status(report_id, 'failed', str(e))
 
+async def _run_report_job(job: Job, save_checkpoint: Callable[[str, Dict[str, Any]], None]):
+    user_id, llm_choice = job.payload["user_id"], job.payload["llm_choice"]
+    state = dict(job.checkpoint)
+    if job.stage in ("skipped", "completed"):
+        # The worker stopped after finishing but before the queue recorded it
+        return
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+
+    report_data = await gather_report_data(user_id, timings)
+    fingerprint = report_fingerprint(report_data, llm_choice)
+    if "report_id" not in state:
+        latest = await asyncio.to_thread(get_latest_report, user_id, llm_choice)
+        if latest and latest["data_fingerprint"] == fingerprint:
+            # Same inputs would give the same report: confirm the stored one instead of writing another
+            await asyncio.to_thread(mark_report_verified, latest["id"])
+            save_checkpoint("skipped", {"report_id": str(latest["id"])})
+            logger.info(f"Scheduled report for user {user_id} skipped, data unchanged since report {latest['id']}")
+            return
+        state["report_id"] = str(await create_report_record(user_id, llm_choice, trigger="scheduled"))
+        save_checkpoint("created", state)
+
+    # A retry writes into the record created by the first attempt; sections that
+    # attempt finished come from the section cache rather than the LLM
+    report_id = state["report_id"]
+    await update_report_status(report_id, 'generating')
+    try:
+        await write_report(report_id, user_id, llm_choice, report_data, timings, started)
+    except Exception as e:
+        await update_report_status(report_id, 'failed', f"Attempt {job.attempts} failed: {e}")
+        raise
+    save_checkpoint("completed", state)
+
+def run_report_job(job: Job, save_checkpoint: Callable[[str, Dict[str, Any]], None]):
+    """
+    Write one user's scheduled report, stages created -> completed. Skipped
+    when the user's latest completed report was written from the same data.
+    """
+    logger.info(f"Starting scheduled report for user {job.payload['user_id']} (resuming after {job.stage or 'nothing'})")
+    asyncio.run(_run_report_job(job, save_checkpoint))
+
+def create_report_worker_pool(concurrency: int = REPORT_WORKER_CONCURRENCY) -> WorkerPool:
+    return WorkerPool(get_job_queue(), REPORT_JOB_KIND, run_report_job, concurrency)
+
 @router.post("/health-report", response_model=HealthReportResponse)
 async def create_health_report(request: HealthReportRequest) -> HealthReportResponse:
-    """Start report generation process"""
+    """
+    Start report generation process, or return a stored report (reused=true)
+    that is still current: verified within max_age_hours, usually by the
+    nightly scheduled run, and written from exactly the data the report would
+    be written from now, documents included.
+    """
     try:
+        report_data, timings, started = None, {}, time.perf_counter()
+        if request.max_age_hours > 0:
+            latest = await asyncio.to_thread(get_latest_report, str(request.user_id), request.llm_choice)
+            cutoff = datetime.now(timezone.utc) - timedelta(hours=request.max_age_hours)
+            verified_at = latest and latest["verified_at"]
+            if verified_at and verified_at.tzinfo is None:
+                verified_at = verified_at.replace(tzinfo=timezone.utc)
+            # Rollup changes rule reuse out cheaply; otherwise compare the current inputs, which also
+            # covers documents and image analyses. The gathered data is reused if generation is needed.
+            if verified_at and verified_at >= cutoff and not latest["data_changed"]:
+                report_data = await gather_report_data(str(request.user_id), timings)
+                if report_fingerprint(report_data, request.llm_choice) == latest["data_fingerprint"]:
+                    await asyncio.to_thread(mark_report_verified, latest["id"])
+                    return HealthReportResponse(report_id=latest["id"], message="Report is up to date", reused=True)
+
         # Create initial report record
         report_id = await create_report_record(request.user_id, request.llm_choice)
         
         # Start background task
-        asyncio.create_task(generate_report_background(report_id, request))
+        asyncio.create_task(generate_report_background(report_id, request, report_data, timings, started))
         
         return HealthReportResponse(
             report_id=report_id,
@@ -324,14 +527,15 @@ async def create_health_report(request: HealthReportRequest) -> HealthReportResp
 
 @router.get("/health-report/{report_id}", response_model=HealthReportStatus)
 async def get_report_status(report_id: UUID4) -> HealthReportStatus:
-    """Get the status of a report"""
+    """Get the status of a report; while it is generating, report_content holds the sections finished so far"""
     query = """
-    SELECT id, status, report_content, error_message, created_at, updated_at
+    SELECT id, status, report_content, error_message, stage_timings, token_usage, sections, created_at, updated_at
     FROM health_reports
     WHERE id = :report_id
     """
     params = {"report_id": str(report_id)}
-    result = await execute_sql_query(query, get_db_credentials(), params)
+    # execute_sql_query is blocking; run it off the event loop
+    result = await asyncio.to_thread(execute_sql_query, query, get_db_credentials(), params)
     
     if not result:
         raise HTTPException(status_code=404, detail="Report not found")
@@ -5,16 +5,14 @@ from datetime import datetime
 import logging
 import uuid
 import traceback
-from supabase import create_client, Client
 
-from config import SUPABASE_URL, SUPABASE_ADMIN
+from utils.clients import get_supabase_admin
 from utils.medical_document_generator import generate_indian_details, generate_medical_content
 from utils.pdf_generator import generate_pdf
 
-# Configure logging and Supabase
+# Configure logging
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_ADMIN)
 
 router = APIRouter()
 
@@ -55,14 +53,14 @@ async def generate_medical_documents(request: MedicalDocumentRequest) -> Medical
                     "content-disposition": f"attachment; filename={filename}"
                 }
                 
-                storage_response = supabase.storage.from_('sample_medical_documents').upload(
+                storage_response = get_supabase_admin().storage.from_('sample_medical_documents').upload(
                     filename,
                     pdf_content,
                     file_options=file_options
                 )
                 
                 # Get the public URL
-                file_url = supabase.storage.from_('sample_medical_documents').get_public_url(filename)
+                file_url = get_supabase_admin().storage.from_('sample_medical_documents').get_public_url(filename)
                 logger.debug(f"File URL generated: {file_url}")
                 
                 # Store document metadata in Supabase
@@ -78,7 +76,7 @@ async def generate_medical_documents(request: MedicalDocumentRequest) -> Medical
                     "document_date": content['date']
                 }
                 
-                result = supabase.table("sample_medical_documents").insert(document_data).execute()
+                result = get_supabase_admin().table("sample_medical_documents").insert(document_data).execute()
                 document_ids.append(result.data[0]['id'])
                 logger.info(f"Successfully generated document {i+1}: {file_id}")
                 
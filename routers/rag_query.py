@@ -2,31 +2,26 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional, Literal
 
-from supabase import create_client, Client
-import cohere
-
 from utils.formatting import format_rag_response
-from config import SUPABASE_URL, SUPABASE_KEY, COHERE_API_KEY
+from utils.streaming import stream_rag_response, STREAMING_LLMS
+from utils.context_packing import pack_context
+from utils.clients import get_supabase, get_cohere
 
 router = APIRouter()
 
-# Initialize Supabase client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-# Initialize Cohere client
-co = cohere.Client(COHERE_API_KEY)
-
 class RAGQueryRequest(BaseModel):
     query: str
     match_count: int = 5
     llm_choice: Literal["openai", "gemini", "local"] = "openai"
+    context_token_budget: Optional[int] = None
+    stream: bool = False
 
 def generate_embedding(text: str) -> List[float]:
-    response = co.embed(texts=[text], model="embed-english-v3.0", input_type="search_document")
+    response = get_cohere().embed(texts=[text], model="embed-english-v3.0", input_type="search_document")
     return response.embeddings[0]
 
 def query_embeddings(query_embedding: List[float], match_count: int):
-    response = supabase.rpc(
+    response = get_supabase().rpc(
         'query_embeddings',
         {
             'query_embedding': query_embedding,
@@ -39,6 +34,8 @@ def query_embeddings(query_embedding: List[float], match_count: int):
 
 @router.post("/rag-query")
 async def rag_query(request: RAGQueryRequest):
+    if request.stream and request.llm_choice not in STREAMING_LLMS:
+        raise HTTPException(status_code=400, detail=f"Streaming is not supported for llm_choice '{request.llm_choice}'")
     try:
         # Generate embedding for the query
         query_embedding = generate_embedding(request.query)
@@ -46,18 +43,30 @@ async def rag_query(request: RAGQueryRequest):
         # Perform similarity search
         search_results = query_embeddings(query_embedding, request.match_count)
 
-        # Extract relevant context
-        context = "\n".join([result['text_content'] for result in search_results])
+        # Pack the matches into a deduplicated, budgeted context
+        context, packed_results, context_stats = pack_context(search_results, request.context_token_budget)
 
         print(context)
 
+        if request.stream:
+            return await stream_rag_response(request.query, context, request.llm_choice, {
+                "query": request.query,
+                "sources": [{
+                    'file_id': result.get('file_id'),
+                    'chunk_index': result.get('chunk_index'),
+                    'similarity': result.get('similarity')
+                } for result in packed_results],
+                "context_stats": context_stats
+            })
+
         # Use the format_rag_response function
         response = format_rag_response(request.query, context, request.llm_choice)
 
         return {
             "query": request.query,
             "context": context,
-            "response": response
+            "response": response,
+            "context_stats": context_stats
         }
 
     except Exception as e:
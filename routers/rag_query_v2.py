@@ -1,37 +1,40 @@
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, UUID4
-from typing import List, Optional, Literal
+from typing import List, Dict, Any, Optional, Literal
+from concurrent.futures import ThreadPoolExecutor
 
-from supabase import create_client, Client
-import cohere
+import numpy as np
 
 from utils.formatting import format_rag_response
-from config import SUPABASE_URL, SUPABASE_KEY, COHERE_API_KEY
+from utils.streaming import stream_rag_response, stream_static_response, STREAMING_LLMS
+from utils.embedding import generate_embeddings
+from utils.context_packing import pack_context
+from utils.quantization import decode_binary, decode_int8, top_candidates, rescore, parse_embedding
+from utils.clients import get_supabase, get_cohere
+from config import EMBEDDING_SEARCH_MODE, QUANTIZED_OVERSAMPLE
 
 router = APIRouter()
 security = HTTPBearer()
 
-# Initialize Supabase client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-# Initialize Cohere client
-co = cohere.Client(COHERE_API_KEY)
+CODE_PAGE_SIZE = 1000
 
 class RAGQueryRequest(BaseModel):
     query: str
     match_count: int = 5
     llm_choice: Literal["openai", "gemini", "local"] = "openai"
     user_id: UUID4
+    context_token_budget: Optional[int] = None
+    stream: bool = False
 
 def generate_embedding(text: str) -> List[float]:
-    response = co.embed(texts=[text], model="embed-english-v3.0", input_type="search_document")
+    response = get_cohere().embed(texts=[text], model="embed-english-v3.0", input_type="search_document")
     return response.embeddings[0]
 
 def query_embeddings(query_embedding: List[float], match_count: int, user_id: UUID4):
     print(f"Calling RPC with params: match_count={match_count}, user_id={user_id}")
     try:
-        response = supabase.rpc(
+        response = get_supabase().rpc(
             'query_embeddings_v3',
             {
                 'query_embedding': query_embedding,
@@ -44,34 +47,160 @@ def query_embeddings(query_embedding: List[float], match_count: int, user_id: UU
         print(f"Full error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _load_user_codes(user_id: UUID4, mode: str):
+    """Compact codes for every chunk the user owns, as (rows, code matrix, int8 scales)"""
+    # Paged until an empty page, so a max-rows cap below CODE_PAGE_SIZE cannot silently truncate the scan
+    rows, offset = [], 0
+    while True:
+        page = get_supabase().rpc("user_embedding_codes", {"p_user_id": str(user_id), "p_mode": mode}) \
+            .range(offset, offset + CODE_PAGE_SIZE - 1).execute().data
+        if not page:
+            break
+        rows.extend(page)
+        offset += len(page)
+    if not rows:
+        return [], None, None
+
+    if mode == "binary":
+        return rows, np.stack([decode_binary(row['code']) for row in rows]), None
+    codes = np.stack([decode_int8(row['code']) for row in rows])
+    scales = np.array([row['scale'] for row in rows], dtype=np.float32)
+    return rows, codes, scales
+
+def query_embeddings_quantized_batch(query_embeddings: List[List[float]], match_count: int, user_id: UUID4, mode: str):
+    """
+    Two-stage search for several queries at once: rank the user's chunks by
+    their compact codes, then rescore the top candidates with the full
+    precision embeddings. Codes and candidate vectors are fetched once for
+    all queries.
+    """
+    rows, codes, scales = _load_user_codes(user_id, mode)
+    if not rows:
+        return [[] for _ in query_embeddings]
+
+    candidate_ids = [
+        [rows[i]['id'] for i in top_candidates(query_embedding, codes, match_count * QUANTIZED_OVERSAMPLE, mode, scales)]
+        for query_embedding in query_embeddings
+    ]
+    unique_ids = list({row_id for ids in candidate_ids for row_id in ids})
+    # Code rows carry ids as text, whatever the column type
+    full_rows = {
+        str(row['id']): row for row in get_supabase().table("embeddings")
+        .select("id, file_id, chunk_index, total_chunks, text_content, embedding")
+        .in_("id", unique_ids).execute().data
+    }
+
+    results = []
+    for query_embedding, ids in zip(query_embeddings, candidate_ids):
+        candidates = [full_rows[row_id] for row_id in ids if row_id in full_rows]
+        if not candidates:
+            results.append([])
+            continue
+        similarities = rescore(query_embedding, np.stack([parse_embedding(row['embedding']) for row in candidates]))
+        ranked = sorted(zip(candidates, similarities), key=lambda pair: pair[1], reverse=True)[:match_count]
+        results.append([{
+            'file_id': row['file_id'],
+            'chunk_index': row['chunk_index'],
+            'total_chunks': row['total_chunks'],
+            'text_content': row['text_content'],
+            'similarity': float(similarity)
+        } for row, similarity in ranked])
+    return results
+
+def query_embeddings_quantized(query_embedding: List[float], match_count: int, user_id: UUID4, mode: str):
+    return query_embeddings_quantized_batch([query_embedding], match_count, user_id, mode)[0]
+
+def search_embeddings(query_embedding: List[float], match_count: int, user_id: UUID4):
+    """Similarity search using the configured EMBEDDING_SEARCH_MODE"""
+    if EMBEDDING_SEARCH_MODE in ("binary", "int8"):
+        return query_embeddings_quantized(query_embedding, match_count, user_id, EMBEDDING_SEARCH_MODE)
+    return query_embeddings(query_embedding, match_count, user_id)
+
+def search_embeddings_batch(query_embeddings: List[List[float]], match_count: int, user_id: UUID4):
+    """Similarity search for several query embeddings in one pass"""
+    if EMBEDDING_SEARCH_MODE in ("binary", "int8"):
+        return query_embeddings_quantized_batch(query_embeddings, match_count, user_id, EMBEDDING_SEARCH_MODE)
+    # The RPC takes a single embedding, so issue the calls side by side
+    with ThreadPoolExecutor(max_workers=len(query_embeddings) or 1) as executor:
+        return list(executor.map(lambda e: query_embeddings(e, match_count, user_id), query_embeddings))
+
+def batch_retrieve(queries: List[str], user_id: UUID4, match_count: int = 5, token_budget: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Retrieve raw context for several sub-queries: one embedding call for all of
+    them, one search pass, and a shared dedup so a chunk matched by several
+    sub-queries only appears under the one it matches best.
+    """
+    query_embeddings = generate_embeddings(queries)
+    search_results = search_embeddings_batch(query_embeddings, match_count, user_id)
+
+    best_owner: Dict[tuple, tuple] = {}
+    for query_index, results in enumerate(search_results):
+        for result in results:
+            key = (result['file_id'], result.get('chunk_index'))
+            if key not in best_owner or result['similarity'] > best_owner[key][1]:
+                best_owner[key] = (query_index, result['similarity'])
+
+    retrieved = []
+    for query_index, (query, results) in enumerate(zip(queries, search_results)):
+        owned = [r for r in results if best_owner[(r['file_id'], r.get('chunk_index'))][0] == query_index]
+        context, packed_results, context_stats = pack_context(owned, token_budget)
+        retrieved.append({
+            "query": query,
+            "context": context,
+            "sources": [{
+                'file_id': result['file_id'],
+                'chunk_index': result['chunk_index'],
+                'total_chunks': result['total_chunks'],
+                'similarity': result['similarity']
+            } for result in packed_results],
+            "context_stats": context_stats
+        })
+    return retrieved
+
 @router.post("/rag-query-v2")
 async def rag_query(request: RAGQueryRequest):
+    if request.stream and request.llm_choice not in STREAMING_LLMS:
+        raise HTTPException(status_code=400, detail=f"Streaming is not supported for llm_choice '{request.llm_choice}'")
     try:
         # Generate embedding for the query
         query_embedding = generate_embedding(request.query)
         print(request)
 
         # Perform similarity search with user_id from request
-        search_results = query_embeddings(query_embedding, request.match_count, request.user_id)
+        search_results = search_embeddings(query_embedding, request.match_count, request.user_id)
 
         # If no results found, return early
         if not search_results:
+            if request.stream:
+                return await stream_static_response(
+                    "No relevant documents found for your query.",
+                    {"query": request.query, "sources": []}
+                )
             return {
                 "query": request.query,
                 "context": "",
                 "response": "No relevant documents found for your query."
             }
 
-        # Extract relevant context with location information
-        context = "\n".join([result['text_content'] for result in search_results])
-        
+        # Pack the matches into a deduplicated, budgeted context
+        context, packed_results, context_stats = pack_context(search_results, request.context_token_budget)
+        print(f"Context packing: {context_stats['naive_tokens']} -> {context_stats['context_tokens']} tokens "
+              f"({context_stats['tokens_saved']} saved)")
+
         # Create context sources information
         context_sources = [{
             'file_id': result['file_id'],
             'chunk_index': result['chunk_index'],
             'total_chunks': result['total_chunks'],
             'similarity': result['similarity']
-        } for result in search_results]
+        } for result in packed_results]
+
+        if request.stream:
+            return await stream_rag_response(request.query, context, request.llm_choice, {
+                "query": request.query,
+                "sources": context_sources,
+                "context_stats": context_stats
+            })
 
         # Use the format_rag_response function
         response = format_rag_response(request.query, context, request.llm_choice)
@@ -80,7 +209,8 @@ async def rag_query(request: RAGQueryRequest):
             "query": request.query,
             "context": context,
             "response": response,
-            "sources": context_sources
+            "sources": context_sources,
+            "context_stats": context_stats
         }
 
     except Exception as e:
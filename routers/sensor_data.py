@@ -0,0 +1,168 @@
+from fastapi import APIRouter, HTTPException, Query, Request
+from pydantic import UUID4
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Literal, Optional
+import asyncio
+import json
+import logging
+import time
+
+from utils.database_utils import get_db_credentials
+from utils.downsampling import Batch, lttb, minmax
+from utils.sensor_analytics import stream_sensor_series
+from utils.sensor_ingest import frame_from_ndjson, frame_from_columns, ingest_batch
+from config import SENSOR_SERIES_MAX_POINTS, SENSOR_SERIES_FETCH_ROWS, SENSOR_INGEST_BATCH_ROWS, SENSOR_INGEST_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+DOWNSAMPLERS = {"lttb": lttb, "minmax": minmax}
+
+
+def downsample_series(
+    user_id: str, metric: str, start: datetime, end: datetime, points: int, method: str
+) -> Dict[str, Any]:
+    """Stream the readings in the window through the downsampler; blocking"""
+    raw_points = 0
+
+    def counted(batches: Iterable[Batch]) -> Iterable[Batch]:
+        nonlocal raw_points
+        for batch in batches:
+            raw_points += batch[0].size
+            yield batch
+
+    batches = stream_sensor_series(user_id, get_db_credentials(), metric, start, end, SENSOR_SERIES_FETCH_ROWS)
+    series = DOWNSAMPLERS[method](counted(batches), start.timestamp(), end.timestamp(), points)
+    return {
+        "raw_points": raw_points,
+        # [epoch milliseconds, value], the shape chart libraries take directly
+        "points": [[int(timestamp * 1000), round(value, 2)] for timestamp, value in series],
+    }
+
+
+@router.get("/sensor-data/{user_id}/series")
+async def get_sensor_series(
+    user_id: UUID4,
+    metric: Literal["heart_rate", "temperature", "humidity"] = "heart_rate",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    points: int = Query(500, ge=10, le=SENSOR_SERIES_MAX_POINTS),
+    method: Literal["lttb", "minmax"] = "lttb"
+):
+    """
+    A sensor metric between start and end (default: the last 7 days),
+    downsampled on the server to at most `points` points for charting.
+    lttb keeps the shape of the line; minmax keeps every bucket's extremes.
+    """
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(days=7)
+    # Naive times are taken as UTC, like created_at
+    start, end = (t if t.tzinfo else t.replace(tzinfo=timezone.utc) for t in (start, end))
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    try:
+        started = time.perf_counter()
+        result = await asyncio.to_thread(downsample_series, str(user_id), metric, start, end, points, method)
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(
+            f"Downsampled {result['raw_points']} {metric} readings to {len(result['points'])} points "
+            f"({method}) for user {user_id} in {elapsed_ms} ms"
+        )
+        return {
+            "user_id": str(user_id),
+            "metric": metric,
+            "method": method,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            **result
+        }
+    except Exception as e:
+        logger.error(f"Error fetching {metric} series for user {user_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/sensor-data/{user_id}/ingest")
+async def ingest_sensor_data(request: Request, user_id: UUID4, batch_id: Optional[str] = Query(None, max_length=128)):
+    """
+    Bulk-insert device readings for a user. The body is either NDJSON
+    (Content-Type: application/x-ndjson), one reading per line such as
+    {"created_at": "2024-05-01T08:00:00Z", "beat_avg": 72, "temperature_c": 36.6, "humidity": 41},
+    or one columnar JSON object of equal-length lists keyed by the same
+    fields. created_at may also be epoch seconds.
+
+    Readings are validated and written SENSOR_INGEST_BATCH_ROWS at a time, each
+    batch with one COPY in its own transaction, and the response acknowledges
+    every batch. Invalid readings are rejected individually. Pass batch_id to
+    make retries safe: batches already stored under it are reported as
+    duplicates instead of being written again.
+    """
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > SENSOR_INGEST_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Body is larger than the {SENSOR_INGEST_MAX_BYTES} byte limit")
+
+    db_credentials = get_db_credentials()
+    acks: List[Dict[str, Any]] = []
+    started = time.perf_counter()
+
+    async def store(frame, parse_errors=None):
+        first_index = sum(ack["rows"] for ack in acks)
+        acks.append(await asyncio.to_thread(
+            ingest_batch, db_credentials, str(user_id), frame, batch_id, len(acks), first_index, parse_errors
+        ))
+
+    try:
+        content_type = request.headers.get("content-type", "").split(";")[0].strip()
+        if content_type == "application/json":
+            body = await request.body()
+            if len(body) > SENSOR_INGEST_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"Body is larger than the {SENSOR_INGEST_MAX_BYTES} byte limit")
+            try:
+                frame = frame_from_columns(json.loads(body))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            for offset in range(0, len(frame), SENSOR_INGEST_BATCH_ROWS):
+                await store(frame.iloc[offset:offset + SENSOR_INGEST_BATCH_ROWS].reset_index(drop=True))
+        else:
+            # NDJSON is parsed as it streams in; each full batch is stored before more of the body is read
+            size, pending, lines = 0, b"", []
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > SENSOR_INGEST_MAX_BYTES:
+                    raise HTTPException(status_code=413, detail=f"Body is larger than the {SENSOR_INGEST_MAX_BYTES} byte limit")
+                *complete, pending = (pending + chunk).split(b"\n")
+                lines.extend(line for line in complete if line.strip())
+                while len(lines) >= SENSOR_INGEST_BATCH_ROWS:
+                    batch, lines = lines[:SENSOR_INGEST_BATCH_ROWS], lines[SENSOR_INGEST_BATCH_ROWS:]
+                    await store(*frame_from_ndjson(batch))
+            if pending.strip():
+                lines.append(pending)
+            if lines:
+                await store(*frame_from_ndjson(lines))
+    except HTTPException as e:
+        if not acks:
+            raise
+        # Earlier batches are committed; tell the client which ones
+        return {"user_id": str(user_id), "batch_id": batch_id, "error": e.detail, "batches": acks, **_ingest_totals(acks)}
+    except Exception as e:
+        logger.error(f"Sensor ingest for user {user_id} failed after {len(acks)} batches: {e}")
+        if not acks:
+            raise HTTPException(status_code=500, detail=str(e))
+        return {"user_id": str(user_id), "batch_id": batch_id, "error": str(e), "batches": acks, **_ingest_totals(acks)}
+
+    totals = _ingest_totals(acks)
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"Ingested {totals['accepted']} sensor readings ({totals['rejected']} rejected) for user {user_id} "
+        f"in {len(acks)} batches, {elapsed * 1000:.0f} ms"
+    )
+    return {"user_id": str(user_id), "batch_id": batch_id, "batches": acks, **totals}
+
+
+def _ingest_totals(acks: List[Dict[str, Any]]) -> Dict[str, int]:
+    return {
+        "accepted": sum(ack["accepted"] for ack in acks),
+        "rejected": sum(ack["rejected"] for ack in acks),
+        "duplicate_batches": sum(1 for ack in acks if ack["status"] == "duplicate"),
+    }
@@ -1,23 +1,114 @@
 import uvicorn
-from fastapi import APIRouter, HTTPException
-import google.generativeai as genai
-from supabase import create_client, Client
+from fastapi import APIRouter, HTTPException, Request
 import os
 from pydantic import BaseModel, Field
+import asyncio
 import base64
+import logging
+import tempfile
+from typing import Any, AsyncIterator, BinaryIO, Dict, List, Optional
 
-from utils.embedding import generate_embedding
-from utils.transcription import create_image_analyzer
-from utils.custom_types import ImageAnalysisRequest
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+from utils.embedding import generate_embedding, generate_embeddings
+from utils.quantization import quantized_columns
+from utils.indexing import content_hash
+from utils.transcription import get_image_analyzer
+from utils.image_preprocessing import PreparedImage, prepare_image
+from utils.ocr_cache import get_ocr_cache
+from utils.custom_types import ImageAnalysisRequest, BatchImageAnalysisRequest, BatchImageItem, ImageAnalysis
+from utils.clients import get_supabase
+from config import (
+    GOOGLE_API_KEY, IMAGE_BATCH_CONCURRENCY, IMAGE_BATCH_MAX_ITEMS, IMAGE_UPLOAD_MAX_BYTES, IMAGE_UPLOAD_SPOOL_BYTES
+)
 
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+def analysis_row(file_id: str, user_id: str, analysis_result: ImageAnalysis) -> Dict[str, Any]:
+    return {
+        "file_id": file_id,
+        "user_id": user_id,
+        "text_content": analysis_result.text_content,
+        "confidence_level": analysis_result.confidence_level,
+        "text_locations": analysis_result.text_locations,
+        "languages": analysis_result.languages,
+        "ocr_quality": analysis_result.ocr_quality
+    }
+
+
+def embedding_row(file_id: str, analysis_result: ImageAnalysis, embedding: List[float]) -> Dict[str, Any]:
+    return {
+        "file_id": file_id,
+        "embedding": embedding,
+        "text_content": analysis_result.text_content,
+        "content_hash": content_hash(analysis_result.text_content),
+        **quantized_columns(embedding)
+    }
+
+
+async def analyze_and_store(prepared: PreparedImage, file_id: str, user_id: str) -> Dict[str, Any]:
+    """Analyze a prepared image (or reuse a cached result) and store it for file_id/user_id"""
+    # A repeat of an image we have already read reuses its analysis and embedding.
+    # The cache is a SQLite file, so its calls run off the event loop
+    cache = get_ocr_cache()
+    cached = await asyncio.to_thread(cache.get, prepared.sha256)
+    if cached:
+        analysis_result, embedding = cached
+        logger.info(f"OCR cache hit for file_id {file_id} (image {prepared.sha256[:12]})")
+    else:
+        # Analyze the image with the shared analyzer
+        analysis_result = await get_image_analyzer(GOOGLE_API_KEY).analyze(prepared)
+        embedding = None
+
+    # Store the result in Supabase
+    result = get_supabase().table("image_analysis").insert(
+        analysis_row(file_id, user_id, analysis_result)
+    ).execute()
+    if embedding is None:
+        # Generate embedding
+        embedding = generate_embedding(analysis_result.text_content)
+        await asyncio.to_thread(cache.put, prepared.sha256, analysis_result, embedding)
+
+    # Store the embedding
+    embedding_result = get_supabase().table("embeddings").insert(
+        embedding_row(file_id, analysis_result, embedding)
+    ).execute()
+
+    return {
+        "message": "Image analyzed and stored successfully",
+        "analysis": analysis_result.dict(),
+        "preprocessing": prepared.stats(),
+        "cache_hit": cached is not None
+    }
+
+
+async def _prepare_upload(upload: BinaryIO) -> PreparedImage:
+    try:
+        return await asyncio.to_thread(prepare_image, upload)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _check_upload_size(size: Optional[int], limit: int = IMAGE_UPLOAD_MAX_BYTES):
+    if size is not None and size > limit:
+        raise HTTPException(status_code=413, detail=f"Image is larger than the {IMAGE_UPLOAD_MAX_BYTES} byte limit")
 
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-supabase_client: Client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
 
+# Room for the form fields and multipart boundaries around the image itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
 
 
+async def _limited_stream(request: Request, limit: int) -> AsyncIterator[bytes]:
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        _check_upload_size(size, limit)
+        yield chunk
+
 
 @router.post("/analyze-image")
 async def analyze_image_endpoint(request: ImageAnalysisRequest):
@@ -25,41 +116,193 @@ async def analyze_image_endpoint(request: ImageAnalysisRequest):
         raise HTTPException(status_code=400, detail="file, file_id and user_id are required")
 
     try:
-        # Decode the base64 file
-        file_bytes = base64.b64decode(request.file)
-
-        # Analyze the image
-        analyze_image = create_image_analyzer(os.getenv("GOOGLE_API_KEY"))
-        analysis_result = analyze_image(file_bytes)  # Pass bytes directly
-
-        # Store the result in Supabase
-        result = supabase_client.table("image_analysis").insert({
-            "file_id": request.file_id,
-            "user_id": request.user_id,
-            "text_content": analysis_result.text_content,
-            "confidence_level": analysis_result.confidence_level,
-            "text_locations": analysis_result.text_locations,
-            "languages": analysis_result.languages,
-            "ocr_quality": analysis_result.ocr_quality
-        }).execute()
-        # Generate embedding
-        embedding = generate_embedding(analysis_result.text_content)
+        # Decode the base64 file once; an upright JPEG that is small enough reuses request.file as is
+        try:
+            file_bytes = base64.b64decode(request.file)
+            # Decoding, rotating and re-encoding a photo is CPU work; keep it off the event loop
+            prepared = await asyncio.to_thread(prepare_image, file_bytes, original_base64=request.file)
+        except ValueError as e:
+            # binascii.Error (bad base64) is a ValueError too
+            raise HTTPException(status_code=400, detail=str(e))
+
+        return await analyze_and_store(prepared, request.file_id, request.user_id)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error analyzing image for file_id {request.file_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/analyze-image/upload")
+async def analyze_image_upload_endpoint(request: Request):
+    """
+    Same as /analyze-image, for a multipart/form-data upload of the raw image
+    (fields: file, file_id, user_id). The body is parsed as it streams in and
+    rejected as soon as it crosses IMAGE_UPLOAD_MAX_BYTES; the image part is
+    spooled in memory up to IMAGE_UPLOAD_SPOOL_BYTES, then on disk, and decoded
+    straight from the spool, with no base64 step.
+    """
+    limit = IMAGE_UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD_BYTES
+    declared = request.headers.get("content-length")
+    _check_upload_size(int(declared) if declared and declared.isdigit() else None, limit)
+
+    parser = MultiPartParser(request.headers, _limited_stream(request, limit), max_files=1, max_fields=10)
+    parser.spool_max_size = IMAGE_UPLOAD_SPOOL_BYTES
+    try:
+        form = await parser.parse()
+    except MultiPartException as e:
+        raise HTTPException(status_code=400, detail=e.message)
+
+    try:
+        file, file_id, user_id = form.get("file"), form.get("file_id"), form.get("user_id")
+        if not isinstance(file, UploadFile) or not isinstance(file_id, str) or not isinstance(user_id, str):
+            raise HTTPException(status_code=400, detail="file, file_id and user_id are required")
+        _check_upload_size(file.size)
+        prepared = await _prepare_upload(file.file)
+        return await analyze_and_store(prepared, file_id, user_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error analyzing uploaded image for file_id {form.get('file_id')}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        await form.close()
+
+
+@router.post("/analyze-image/raw")
+async def analyze_image_raw_endpoint(request: Request, file_id: str, user_id: str):
+    """
+    Same as /analyze-image, with the image bytes as the request body
+    (e.g. Content-Type: image/jpeg). The body is streamed into a spool that
+    stays in memory up to IMAGE_UPLOAD_SPOOL_BYTES and then moves to disk; an
+    upload over IMAGE_UPLOAD_MAX_BYTES is rejected as soon as it crosses the limit.
+    """
+    declared = request.headers.get("content-length")
+    _check_upload_size(int(declared) if declared and declared.isdigit() else None)
+
+    with tempfile.SpooledTemporaryFile(max_size=IMAGE_UPLOAD_SPOOL_BYTES) as spool:
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            _check_upload_size(size)
+            spool.write(chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Request body is empty")
 
         try:
-            print("Generating embedding")
-            # Store the embedding
-            embedding_result = supabase_client.table("embeddings").insert({
-                "file_id": request.file_id,
-                "embedding": embedding,
-                "text_content": analysis_result.text_content
-            }).execute()
+            prepared = await _prepare_upload(spool)
+            return await analyze_and_store(prepared, file_id, user_id)
+        except HTTPException:
+            raise
         except Exception as e:
-            print(e)
+            logger.error(f"Error analyzing uploaded image for file_id {file_id}: {e}")
             raise HTTPException(status_code=500, detail=str(e))
 
-        return {"message": "Image analyzed and stored successfully", "analysis": analysis_result.dict()}
 
+async def _analyze_batch_item(item: BatchImageItem, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+    """Prepare and analyze one image of a batch; failures are reported on the item instead of raised"""
+    outcome: Dict[str, Any] = {"file_id": item.file_id, "file_name": item.file_name}
+    async with semaphore:
+        try:
+            prepared: PreparedImage = await asyncio.to_thread(
+                lambda: prepare_image(base64.b64decode(item.file), original_base64=item.file)
+            )
+        except ValueError as e:
+            # binascii.Error (bad base64) is a ValueError too
+            return {**outcome, "status": "invalid", "error": str(e)}
+        except Exception as e:
+            logger.error(f"Preparing batch image for file_id {item.file_id} failed: {e}")
+            return {**outcome, "status": "failed", "error": str(e)}
+
+        cached = None
+        try:
+            cached = await asyncio.to_thread(get_ocr_cache().get, prepared.sha256)
+            if cached:
+                analysis_result, embedding = cached
+            else:
+                analysis_result = await get_image_analyzer(GOOGLE_API_KEY).analyze(prepared)
+                embedding = None
+        except Exception as e:
+            logger.error(f"Batch analysis failed for file_id {item.file_id}: {e}")
+            return {**outcome, "status": "failed", "error": str(e)}
+
+    return {
+        **outcome,
+        "status": "analyzed",
+        "cache_hit": cached is not None,
+        "image_hash": prepared.sha256,
+        "analysis": analysis_result,
+        "embedding": embedding,
+    }
+
+
+@router.post("/analyze-images")
+async def analyze_images_endpoint(request: BatchImageAnalysisRequest):
+    """
+    Analyze many images in one request: at most IMAGE_BATCH_CONCURRENCY vision
+    calls at a time, one batched embedding call for all new texts, and one bulk
+    insert per table. Every image gets its own status in the response.
+    """
+    if not request.user_id or not request.images:
+        raise HTTPException(status_code=400, detail="user_id and at least one image are required")
+    if len(request.images) > IMAGE_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {IMAGE_BATCH_MAX_ITEMS} images per request")
+
+    semaphore = asyncio.Semaphore(IMAGE_BATCH_CONCURRENCY)
+    outcomes = await asyncio.gather(*(_analyze_batch_item(item, semaphore) for item in request.images))
+    analyzed = [outcome for outcome in outcomes if outcome["status"] == "analyzed"]
+
+    try:
+        # One embedding call covers every image the cache could not answer
+        to_embed = [outcome for outcome in analyzed if outcome["embedding"] is None]
+        if to_embed:
+            embeddings = await asyncio.to_thread(
+                generate_embeddings, [outcome["analysis"].text_content for outcome in to_embed]
+            )
+            for outcome, embedding in zip(to_embed, embeddings):
+                outcome["embedding"] = embedding
+            cache = get_ocr_cache()
+            await asyncio.to_thread(
+                lambda: [cache.put(outcome["image_hash"], outcome["analysis"], outcome["embedding"]) for outcome in to_embed]
+            )
+
+        if analyzed:
+            # Both tables in one transaction: a failed batch leaves nothing behind, so a retry cannot duplicate rows
+            await asyncio.to_thread(lambda: get_supabase().rpc("store_image_analyses", {
+                "analyses": [
+                    analysis_row(outcome["file_id"], request.user_id, outcome["analysis"]) for outcome in analyzed
+                ],
+                "embedding_rows": [
+                    embedding_row(outcome["file_id"], outcome["analysis"], outcome["embedding"]) for outcome in analyzed
+                ],
+            }).execute())
+        stored_status, stored_error = "stored", None
     except Exception as e:
-        print(e)
-        raise HTTPException(status_code=500, detail=str(e))
+        logger.error(f"Storing batch of {len(analyzed)} image analyses failed: {e}")
+        stored_status, stored_error = "failed", f"Analyzed but not stored: {e}"
+
+    results = []
+    for outcome in outcomes:
+        result = {"file_id": outcome["file_id"], "file_name": outcome["file_name"], "status": outcome["status"]}
+        if outcome["status"] == "analyzed":
+            result["status"] = stored_status
+            result["cache_hit"] = outcome["cache_hit"]
+            result["analysis"] = outcome["analysis"].dict()
+            if stored_error:
+                result["error"] = stored_error
+        else:
+            result["error"] = outcome["error"]
+        results.append(result)
+
+    return {
+        "results": results,
+        "stored": sum(1 for result in results if result["status"] == "stored"),
+        "failed": sum(1 for result in results if result["status"] != "stored"),
+    }
+
 
+@router.get("/analyze-image/cache-stats")
+async def get_ocr_cache_stats():
+    """Hits, misses, hit rate and size of the OCR result cache"""
+    return get_ocr_cache().stats()
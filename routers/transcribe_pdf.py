@@ -1,16 +1,28 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+import asyncio
 import os
-import tempfile
-from supabase import create_client, Client
-import google.generativeai as genai
-import requests
-from typing import List
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Tuple, Any, Callable, Optional
 from enum import Enum
 import logging
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 
-from utils.embedding import generate_embedding
-from utils.custom_types import PDFAnalysisRequest, ImageAnalysis
+from utils.embedding import generate_embeddings
+from utils.indexing import content_hash, plan_reindex
+from utils.chunking import iter_chunk_spans
+from utils.quantization import quantized_columns
+from utils.custom_types import PDFAnalysisRequest, ImageAnalysis, PageTranscription
+from utils.pdf_text import extract_text_layer, page_ranges, write_pages
+from utils.clients import get_supabase, configure_genai
+from utils.downloads import DownloadTooLarge, download_to_file
+from utils.job_queue import Job, PermanentJobError, WorkerPool, get_job_queue, FAILED
+from utils.progress import get_progress_broker, is_terminal
+from config import (
+    PDF_WORK_DIR, PDF_WORKER_CONCURRENCY, PDF_JOB_MAX_ATTEMPTS, PDF_MAX_DOWNLOAD_BYTES, PDF_DOWNLOAD_TIMEOUT,
+    PDF_OCR_PAGES_PER_RANGE, PDF_OCR_CONCURRENCY, PDF_OCR_RANGE_ATTEMPTS
+)
 
 class TranscriptionStatus(str, Enum):
     PENDING = "pending"
@@ -18,62 +30,240 @@ class TranscriptionStatus(str, Enum):
     COMPLETED = "completed"
     FAILED = "failed"
 
-router = APIRouter()
+PDF_JOB_KIND = "pdf"
+# Checkpoints recorded by run_pdf_job, in order
+PDF_STAGES = ["downloaded", "transcribed", "chunked", "embedded"]
+CONFIDENCE_LEVELS = ["Low", "Medium", "High"]
+EMBEDDING_COPY_COLUMNS = (
+    "chunk_index, total_chunks, text_content, embedding, content_hash, "
+    "embedding_int8, embedding_int8_scale, embedding_binary"
+)
 
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-supabase_client: Client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+router = APIRouter()
 
 # Set up logging at the top of the file
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def chunk_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 100) -> List[str]:
+def publish_progress(file_id: str, stage: str, **details: Any):
+    """Push a progress event to /analyze-pdf/{file_id}/events subscribers"""
+    get_progress_broker().publish(file_id, stage, **details)
+
+def chunk_spans(text: str, chunk_size: int = 1000, chunk_overlap: int = 100) -> List[Tuple[int, int]]:
     """
-    Split text into chunks using LangChain's RecursiveCharacterTextSplitter
+    (start, end) offsets of each chunk, identical to LangChain's
+    RecursiveCharacterTextSplitter output but without copying the chunks
     """
     try:
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""]
-        )
-        
-        chunks = text_splitter.split_text(text)
-        logger.info(f"Successfully split text into {len(chunks)} chunks")
-        return chunks
+        spans = list(iter_chunk_spans(text, chunk_size, chunk_overlap))
+        logger.info(f"Successfully split text into {len(spans)} chunks")
+        return spans
     except Exception as e:
-        logger.error(f"Error in chunk_text: {e}")
+        logger.error(f"Error in chunk_spans: {e}")
         raise
 
-async def process_pdf(file_url: str, file_id: str, user_id: str):
-    """Background task to process the PDF"""
+def chunk_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 100) -> List[str]:
+    """
+    Split text into chunks (same output as LangChain's RecursiveCharacterTextSplitter)
+    """
+    return [text[start:end] for start, end in chunk_spans(text, chunk_size, chunk_overlap)]
+
+def index_chunks(
+    file_id: str,
+    text: str,
+    spans: List[Tuple[int, int]],
+    batch_size: int = 10,
+    on_batch: Optional[Callable[[int, int], None]] = None
+) -> Dict[str, int]:
+    """
+    Bring the embeddings rows for a file in line with its chunks, given as
+    offsets into text. Rows are keyed by a hash of the chunk text, so on a
+    re-upload unchanged chunks are kept, moved chunks are re-numbered, stale
+    rows are deleted and only new text is sent to the embedding API.
+    on_batch(embedded, to_embed) is called after each stored batch.
+    """
+    supabase = get_supabase()
+    chunk_hashes = [content_hash(text[start:end]) for start, end in spans]
+    existing = supabase.table("embeddings").select("id, chunk_index, content_hash") \
+        .eq("file_id", file_id).execute().data
+    plan = plan_reindex(existing, chunk_hashes)
+    logger.info(
+        f"Reindex plan for file_id {file_id}: {len(plan['unchanged'])} unchanged, {len(plan['moved'])} moved, "
+        f"{len(plan['to_embed'])} to embed, {len(plan['stale_ids'])} stale"
+    )
+
+    if plan["stale_ids"]:
+        supabase.table("embeddings").delete().in_("id", plan["stale_ids"]).execute()
+    for row_id, chunk_index in plan["moved"]:
+        supabase.table("embeddings").update({"chunk_index": chunk_index}).eq("id", row_id).execute()
+    if existing:
+        # One statement covers every kept row when the chunk count changed
+        supabase.table("embeddings").update({"total_chunks": len(spans)}) \
+            .eq("file_id", file_id).neq("total_chunks", len(spans)).execute()
+
+    embedded = 0
+    to_embed = plan["to_embed"]
+    for i in range(0, len(to_embed), batch_size):
+        batch = to_embed[i:i + batch_size]
+        logger.info(f"Processing batch {i//batch_size + 1} of {(len(to_embed) + batch_size - 1)//batch_size}")
+        try:
+            batch_texts = [text[spans[chunk_index][0]:spans[chunk_index][1]] for chunk_index in batch]
+            embeddings = generate_embeddings(batch_texts)
+            supabase.table("embeddings").insert([{
+                "file_id": file_id,
+                "chunk_index": chunk_index,
+                "embedding": embedding,
+                "text_content": chunk,
+                "total_chunks": len(spans),
+                "content_hash": chunk_hashes[chunk_index],
+                **quantized_columns(embedding)
+            } for chunk_index, chunk, embedding in zip(batch, batch_texts, embeddings)]).execute()
+            embedded += len(batch)
+            logger.info(f"Stored embeddings for chunks {batch[0] + 1}-{batch[-1] + 1}")
+            if on_batch:
+                on_batch(embedded, len(to_embed))
+        except Exception as e:
+            # Missing chunks have no row, so the next reprocess embeds them
+            logger.error(f"Error processing chunks {batch[0] + 1}-{batch[-1] + 1}: {e}")
+            continue
+
+    return {
+        "unchanged": len(plan["unchanged"]),
+        "moved": len(plan["moved"]),
+        "embedded": embedded,
+        "deleted": len(plan["stale_ids"]),
+    }
+
+def update_transcription_status(file_id: str, status: TranscriptionStatus, error_message: Optional[str] = None):
+    data = {"status": status, "updated_at": "now()"}
+    if error_message is not None:
+        data["error_message"] = error_message
+    get_supabase().table("transcriptions").update(data).match({"file_id": file_id}).execute()
+
+def download_pdf(file_url: str, file_id: str, job_id: str) -> Tuple[str, str]:
+    """
+    Stream the PDF into PDF_WORK_DIR, where it survives until the job completes.
+    Returns (pdf_path, sha256 of the file).
+    """
+    logger.info(f"Downloading PDF from URL for file_id: {file_id}")
+    os.makedirs(PDF_WORK_DIR, exist_ok=True)
+    # Named after the job id we generated, never the client's file_id, so the path stays inside PDF_WORK_DIR
+    pdf_path = os.path.join(PDF_WORK_DIR, f"{job_id}.pdf")
+    try:
+        sha256, size = download_to_file(file_url, pdf_path, PDF_MAX_DOWNLOAD_BYTES, PDF_DOWNLOAD_TIMEOUT)
+    except DownloadTooLarge as e:
+        # Downloading it again will not make it smaller
+        raise PermanentJobError(str(e)) from e
+    logger.info(f"PDF saved to file: {pdf_path} ({size} bytes, sha256 {sha256})")
+    publish_progress(file_id, "downloaded", bytes=size)
+
+    get_supabase().table("transcriptions").update({"content_sha256": sha256}).match({"file_id": file_id}).execute()
+    return pdf_path, sha256
+
+def find_transcribed_duplicate(sha256: str, file_id: str) -> Optional[str]:
+    """file_id of another completed transcription of byte-identical content, if any"""
+    result = get_supabase().table("transcriptions").select("file_id") \
+        .eq("content_sha256", sha256).eq("status", TranscriptionStatus.COMPLETED) \
+        .neq("file_id", file_id).limit(1).execute()
+    return result.data[0]["file_id"] if result.data else None
+
+def reuse_transcription(source_file_id: str, file_id: str, user_id: str, page_size: int = 500) -> Optional[ImageAnalysis]:
+    """
+    Copy the analysis and embeddings of an identical, already transcribed file
+    to file_id/user_id, skipping the Gemini and embedding calls. Returns None
+    if the source has no stored analysis, so the caller transcribes normally.
+    """
+    supabase = get_supabase()
+    rows = supabase.table("image_analysis").select("text_content, confidence_level, languages, ocr_quality") \
+        .eq("file_id", source_file_id).limit(1).execute().data
+    if not rows:
+        return None
+    analysis_result = ImageAnalysis(**rows[0])
+
+    # Chunks already copied by an interrupted earlier attempt are kept; rows from the
+    # file's previous content are removed once the copy is complete
+    existing = supabase.table("embeddings").select("id, chunk_index, content_hash").eq("file_id", file_id).execute().data
+    kept = {}
+    for row in existing:
+        kept.setdefault((row["chunk_index"], row["content_hash"]), row["id"])
+
+    copied, offset = 0, 0
+    source_keys = set()
+    while True:
+        page = supabase.table("embeddings").select(EMBEDDING_COPY_COLUMNS).eq("file_id", source_file_id) \
+            .order("chunk_index").range(offset, offset + page_size - 1).execute().data
+        source_keys.update((row["chunk_index"], row["content_hash"]) for row in page)
+        new_rows = [
+            {**row, "file_id": file_id} for row in page
+            if (row["chunk_index"], row["content_hash"]) not in kept
+        ]
+        if new_rows:
+            supabase.table("embeddings").insert(new_rows).execute()
+            copied += len(new_rows)
+        if len(page) < page_size:
+            break
+        offset += page_size
+
+    keep_ids = {row_id for key, row_id in kept.items() if key in source_keys}
+    stale_ids = [row["id"] for row in existing if row["id"] not in keep_ids]
+    if stale_ids:
+        supabase.table("embeddings").delete().in_("id", stale_ids).execute()
+
+    store_analysis(file_id, user_id, analysis_result)
+    logger.info(
+        f"Reused transcription of file_id {source_file_id} for file_id {file_id}: "
+        f"copied {copied} embeddings, deleted {len(stale_ids)} stale"
+    )
+    return analysis_result
+
+PAGE_RANGE_PROMPT = """
+        This PDF has {page_count} page(s). Transcribe every page and return a JSON object with exactly these fields:
+        {{
+            "pages": [
+                {{
+                    "page_number": page_number_counted_from_1_within_this_pdf,
+                    "text_content": "all text extracted from this page",
+                    "confidence_level": "High/Medium/Low",
+                    "ocr_quality": number_between_1_and_10
+                }}
+            ],
+            "languages": ["list", "of", "detected", "languages"]
+        }}
+
+        Include exactly one entry per page, in page order.
+        Important: Return ONLY the JSON object, no other text or formatting.
+        """
+
+def _generate_from_pdf(pdf_path: str, prompt: str, file_id: str) -> str:
+    """Upload a PDF to Gemini, run one prompt over it and return the raw response text"""
+    genai = configure_genai()
+    pdf_file = genai.upload_file(pdf_path)
+    logger.info(f"PDF uploaded to Gemini for file_id: {file_id}")
+
     try:
-        logger.info(f"Starting PDF processing for file_id: {file_id}")
-        
-        # Update status to processing
-        supabase_client.table("transcriptions").update({
-            "status": TranscriptionStatus.PROCESSING,
-            "updated_at": "now()"
-        }).match({"file_id": file_id}).execute()
-        
-        logger.info(f"Downloading PDF from URL for file_id: {file_id}")
-        response = requests.get(file_url)
-        if response.status_code != 200:
-            raise Exception("Could not download PDF from provided URL")
-
-        # Save the PDF to a temporary file
-        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_pdf:
-            temp_pdf.write(response.content)
-            logger.info(f"PDF saved to temporary file: {temp_pdf.name}")
-
-        # Upload the PDF to Gemini
-        pdf_file = genai.upload_file(temp_pdf.name)
-        logger.info(f"PDF uploaded to Gemini for file_id: {file_id}")
-
-        # Initialize the model and process
         model = genai.GenerativeModel("gemini-1.5-flash")
-        prompt = """
+        logger.info(f"Sending PDF to Gemini for analysis, file_id: {file_id}")
+        response = model.generate_content([prompt, pdf_file])
+        logger.info(f"Received response from Gemini for file_id: {file_id}")
+        return response.text
+    finally:
+        try:
+            genai.delete_file(pdf_file.name)
+        except Exception as e:
+            logger.error(f"Error deleting Gemini file: {e}")
+
+def _clean_json(response_text: str) -> str:
+    """Strip the markdown code fence Gemini sometimes wraps JSON in"""
+    response_text = response_text.strip()
+    if response_text.startswith('```json'):
+        response_text = response_text.split('```json')[1]
+    if response_text.endswith('```'):
+        response_text = response_text.rsplit('```', 1)[0]
+    return response_text.strip()
+
+def transcribe_pdf_file(pdf_path: str, file_id: str) -> ImageAnalysis:
+    """Transcribe a whole PDF with Gemini in one call"""
+    prompt = """
         Analyze this PDF document and return a JSON object with exactly these fields:
         {
             "text_content": "all extracted text here",
@@ -84,142 +274,398 @@ async def process_pdf(file_url: str, file_id: str, user_id: str):
 
         Important: Return ONLY the JSON object, no other text or formatting.
         """
+    response_text = _generate_from_pdf(pdf_path, prompt, file_id)
 
-        logger.info(f"Sending PDF to Gemini for analysis, file_id: {file_id}")
-        response = model.generate_content([prompt, pdf_file])
-        logger.info(f"Received response from Gemini for file_id: {file_id}")
-        
-        # Clean and parse the response
-        try:
-            # Clean the response text to ensure it's valid JSON
-            response_text = response.text.strip()
-            if response_text.startswith('```json'):
-                response_text = response_text.split('```json')[1]
-            if response_text.endswith('```'):
-                response_text = response_text.rsplit('```', 1)[0]
-            response_text = response_text.strip()
-            
-            logger.debug(f"Cleaned response text: {response_text[:500]}...")
-            analysis_result = ImageAnalysis.parse_raw(response_text)
-            logger.info("Successfully parsed Gemini response as JSON")
-        except Exception as parse_error:
-            logger.warning(f"Failed to parse Gemini response as JSON: {parse_error}")
-            # Create a more informative fallback with the actual text
-            analysis_result = ImageAnalysis(
-                text_content=response.text,  # Use the full response as text_content
-                confidence_level="Low",  # Set to Low since parsing failed
-                languages=["en"],
-                ocr_quality=5  # Lower quality score due to parsing failure
+    # Clean and parse the response
+    try:
+        cleaned = _clean_json(response_text)
+        logger.debug(f"Cleaned response text: {cleaned[:500]}...")
+        analysis_result = ImageAnalysis.parse_raw(cleaned)
+        logger.info("Successfully parsed Gemini response as JSON")
+    except Exception as parse_error:
+        logger.warning(f"Failed to parse Gemini response as JSON: {parse_error}")
+        # Create a more informative fallback with the actual text
+        analysis_result = ImageAnalysis(
+            text_content=response_text,  # Use the full response as text_content
+            confidence_level="Low",  # Set to Low since parsing failed
+            languages=["en"],
+            ocr_quality=5  # Lower quality score due to parsing failure
+        )
+        logger.info("Created fallback analysis result")
+    return analysis_result
+
+def transcribe_page_range(pdf_path: str, pages: List[int], file_id: str, allow_fallback: bool = False) -> List[PageTranscription]:
+    """
+    Transcribe consecutive pages of a PDF with one Gemini call, returning one
+    PageTranscription per page. A response that cannot be parsed raises so the
+    range is retried, unless allow_fallback (last attempt) is set, in which case
+    the raw response becomes a single Low confidence transcription of the range.
+    """
+    range_path = f"{os.path.splitext(pdf_path)[0]}.p{pages[0]}-{pages[-1]}.pdf"
+    write_pages(pdf_path, pages, range_path)
+    try:
+        response_text = _generate_from_pdf(range_path, PAGE_RANGE_PROMPT.format(page_count=len(pages)), file_id)
+    finally:
+        os.unlink(range_path)
+
+    try:
+        parsed = json.loads(_clean_json(response_text))
+        entries = parsed["pages"]
+        languages = parsed.get("languages") or None
+        if len(entries) != len(pages):
+            raise ValueError(f"expected {len(pages)} pages, got {len(entries)}")
+        entries = sorted(entries, key=lambda entry: int(entry.get("page_number") or 0))
+        return [
+            PageTranscription(
+                start_page=page,
+                end_page=page,
+                text_content=entry.get("text_content") or "",
+                source="ocr",
+                confidence_level=entry.get("confidence_level"),
+                ocr_quality=entry.get("ocr_quality"),
+                languages=languages
             )
-            logger.info("Created fallback analysis result")
-
-        # Store the analysis result
-        logger.info(f"Storing analysis result for file_id: {file_id}")
-        result = supabase_client.table("image_analysis").insert({
-            "file_id": file_id,
-            "user_id": user_id,
-            "text_content": analysis_result.text_content,
-            "confidence_level": analysis_result.confidence_level,
-            "languages": analysis_result.languages,
-            "ocr_quality": analysis_result.ocr_quality,
-        }).execute()
-        logger.info("Analysis result stored successfully")
+            for page, entry in zip(pages, entries)
+        ]
+    except Exception as parse_error:
+        if not allow_fallback:
+            raise ValueError(f"Unusable Gemini response for pages {pages[0]}-{pages[-1]}: {parse_error}")
+        logger.warning(f"Falling back to raw text for pages {pages[0]}-{pages[-1]} of file_id {file_id}: {parse_error}")
+        return [PageTranscription(
+            start_page=pages[0],
+            end_page=pages[-1],
+            text_content=response_text,
+            source="ocr",
+            confidence_level="Low",
+            ocr_quality=5
+        )]
 
-        # Process chunks and store embeddings with better error handling
-        logger.info(f"Starting text chunking for file_id: {file_id}")
-        try:
-            chunks = chunk_text(analysis_result.text_content)
-            logger.info(f"Created {len(chunks)} chunks from text")
-            if chunks:  # Add check to ensure chunks were created
-                logger.debug(f"First chunk preview: {chunks[0][:200]}...")
-        except Exception as chunk_error:
-            logger.error(f"Failed to chunk text: {chunk_error}")
-            raise
-
-        # Process chunks in smaller batches to avoid memory issues
-        batch_size = 10  # Adjust based on your needs
-        for i in range(0, len(chunks), batch_size):
-            batch = chunks[i:i + batch_size]
-            logger.info(f"Processing batch {i//batch_size + 1} of {(len(chunks) + batch_size - 1)//batch_size}")
-            
-            for j, chunk in enumerate(batch):
-                chunk_index = i + j
-                logger.info(f"Processing chunk {chunk_index + 1}/{len(chunks)}")
+def transcribe_page_ranges(
+    pdf_path: str,
+    ranges: List[List[int]],
+    file_id: str,
+    on_range_done: Optional[Callable[[List[PageTranscription]], None]] = None
+) -> List[PageTranscription]:
+    """
+    Transcribe page ranges concurrently, with at most PDF_OCR_CONCURRENCY Gemini
+    calls at once. Ranges that fail are retried on their own, up to
+    PDF_OCR_RANGE_ATTEMPTS times. on_range_done receives each finished range's
+    pages on the calling thread, so progress can be checkpointed.
+    """
+    results: List[PageTranscription] = []
+    pending = ranges
+    for attempt in range(1, PDF_OCR_RANGE_ATTEMPTS + 1):
+        failed = []
+        last_attempt = attempt == PDF_OCR_RANGE_ATTEMPTS
+        with ThreadPoolExecutor(max_workers=min(PDF_OCR_CONCURRENCY, len(pending))) as executor:
+            futures = {
+                executor.submit(transcribe_page_range, pdf_path, pages, file_id, last_attempt): pages
+                for pages in pending
+            }
+            for future in as_completed(futures):
+                pages = futures[future]
                 try:
-                    embedding = generate_embedding(chunk)
-                    
-                    embedding_result = supabase_client.table("embeddings").insert({
-                        "file_id": file_id,
-                        "chunk_index": chunk_index,
-                        "embedding": embedding,
-                        "text_content": chunk,
-                        "total_chunks": len(chunks)
-                    }).execute()
-                    logger.info(f"Stored embedding for chunk {chunk_index + 1}")
+                    range_pages = future.result()
                 except Exception as e:
-                    logger.error(f"Error processing chunk {chunk_index + 1}: {e}")
-                    continue  # Skip failed chunks instead of stopping the whole process
+                    logger.warning(f"Pages {pages[0]}-{pages[-1]} of file_id {file_id} failed (attempt {attempt}): {e}")
+                    failed.append(pages)
+                    continue
+                results.extend(range_pages)
+                if on_range_done:
+                    on_range_done(range_pages)
+        if not failed:
+            return results
+        pending = failed
+        if not last_attempt:
+            time.sleep(2 ** attempt)
 
-        # Update status to completed
-        logger.info(f"Updating status to completed for file_id: {file_id}")
-        supabase_client.table("transcriptions").update({
-            "status": TranscriptionStatus.COMPLETED,
-            "updated_at": "now()"
-        }).match({"file_id": file_id}).execute()
+    failed_pages = ", ".join(f"{pages[0]}-{pages[-1]}" for pages in pending)
+    raise Exception(f"Transcription failed for pages {failed_pages} after {PDF_OCR_RANGE_ATTEMPTS} attempts")
 
-        # Clean up
-        try:
-            genai.delete_file(pdf_file.name)
-            os.unlink(temp_pdf.name)
-            logger.info("Cleaned up temporary files")
-        except Exception as e:
-            logger.error(f"Error cleaning up files: {e}")
+def merge_page_transcriptions(pages: List[PageTranscription], languages: Optional[List[str]] = None) -> ImageAnalysis:
+    """
+    Join page transcriptions in page order. Confidence is the lowest of the OCR'd
+    pages; quality is averaged over all pages, counting text-layer pages as 10.
+    """
+    pages = sorted(pages, key=lambda page: page.start_page)
+    ocr_pages = [page for page in pages if page.source == "ocr"]
+    confidence_level = "High"
+    if ocr_pages:
+        confidence_level = min(
+            (page.confidence_level if page.confidence_level in CONFIDENCE_LEVELS else "Low" for page in ocr_pages),
+            key=CONFIDENCE_LEVELS.index
+        )
+    weights = [page.end_page - page.start_page + 1 for page in pages]
+    qualities = [10 if page.source == "text_layer" else (page.ocr_quality or 5) for page in pages]
+    ocr_quality = round(sum(w * q for w, q in zip(weights, qualities)) / sum(weights)) if pages else None
+    return ImageAnalysis(
+        text_content="\n\n".join(page.text_content for page in pages if page.text_content),
+        confidence_level=confidence_level,
+        languages=languages or None,
+        ocr_quality=ocr_quality
+    )
+
+def transcribe_pdf_document(
+    pdf_path: str,
+    file_id: str,
+    done_pages: Optional[List[Dict[str, Any]]] = None,
+    on_range_done: Optional[Callable[[List[PageTranscription]], None]] = None
+) -> Tuple[ImageAnalysis, List[PageTranscription]]:
+    """
+    Use the PDF's own text layer where it is usable and send only the remaining
+    (scanned) pages to Gemini, in page ranges transcribed in parallel. Pages in
+    done_pages (from an earlier, interrupted attempt) are not transcribed again.
+    Returns the merged analysis and the per-page transcriptions.
+    """
+    started = time.perf_counter()
+    layer = extract_text_layer(pdf_path)
+    if layer is None:
+        # Unreadable locally, so it cannot be split either
+        return transcribe_pdf_file(pdf_path, file_id), []
+
+    pages = [
+        PageTranscription(start_page=number, end_page=number, text_content=text, source="text_layer")
+        for number, text in layer if text is not None
+    ]
+    previous = [PageTranscription(**page) for page in done_pages or []]
+    covered = {number for page in previous for number in range(page.start_page, page.end_page + 1)}
+    ocr_page_numbers = [number for number, text in layer if text is None and number not in covered]
+    ranges = page_ranges(ocr_page_numbers, PDF_OCR_PAGES_PER_RANGE)
+    logger.info(
+        f"Text layer for file_id {file_id}: {len(pages)} of {len(layer)} pages usable, {len(covered)} already "
+        f"transcribed, {len(ocr_page_numbers)} to OCR in {len(ranges)} ranges "
+        f"({(time.perf_counter() - started) * 1000:.0f} ms)"
+    )
+
+    pages.extend(previous)
+    if ranges:
+        pages.extend(transcribe_page_ranges(pdf_path, ranges, file_id, on_range_done))
+
+    languages: List[str] = []
+    for page in pages:
+        languages.extend(language for language in page.languages or [] if language not in languages)
+    pages.sort(key=lambda page: page.start_page)
+    return merge_page_transcriptions(pages, languages), pages
+
+def store_analysis(file_id: str, user_id: str, analysis_result: ImageAnalysis):
+    """Store the file's analysis; a retry after an interrupted attempt updates the row that attempt wrote"""
+    logger.info(f"Storing analysis result for file_id: {file_id}")
+    supabase = get_supabase()
+    row = {
+        "file_id": file_id,
+        "user_id": user_id,
+        "text_content": analysis_result.text_content,
+        "confidence_level": analysis_result.confidence_level,
+        "languages": analysis_result.languages,
+        "ocr_quality": analysis_result.ocr_quality,
+    }
+    existing = supabase.table("image_analysis").select("file_id").eq("file_id", file_id).limit(1).execute().data
+    if existing:
+        supabase.table("image_analysis").update(row).eq("file_id", file_id).execute()
+    else:
+        supabase.table("image_analysis").insert(row).execute()
+    logger.info("Analysis result stored successfully")
+
+def run_pdf_job(job: Job, save_checkpoint: Callable[[str, Dict[str, Any]], None]):
+    """
+    Process one queued PDF, resuming after the last checkpointed stage:
+    downloaded -> transcribed -> chunked -> embedded. A file whose content was
+    already transcribed under another file_id skips straight to embedded.
+    """
+    file_url, file_id, user_id = job.payload["file_url"], job.payload["file_id"], job.payload["user_id"]
+    state = dict(job.checkpoint)
+    done = PDF_STAGES.index(job.stage) + 1 if job.stage else 0
+    logger.info(f"Starting PDF processing for file_id: {file_id} (resuming after {job.stage or 'nothing'})")
 
+    # Update status to processing
+    update_transcription_status(file_id, TranscriptionStatus.PROCESSING)
+    publish_progress(file_id, "processing", attempt=job.attempts, resumed_after=job.stage)
+
+    if done < 2 and not os.path.exists(state.get("pdf_path", "")):
+        # Also covers a resume on a host whose work dir was cleaned up
+        publish_progress(file_id, "downloading")
+        state["pdf_path"], state["sha256"] = download_pdf(file_url, file_id, job.id)
+        save_checkpoint("downloaded", state)
+
+    if done < 2 and state.get("sha256"):
+        # Byte-identical content was already transcribed for another file: copy its results
+        source_file_id = find_transcribed_duplicate(state["sha256"], file_id)
+        reused = reuse_transcription(source_file_id, file_id, user_id) if source_file_id else None
+        if reused is not None:
+            state["analysis"] = reused.dict()
+            state["reused_from"] = source_file_id
+            save_checkpoint("embedded", state)
+            publish_progress(file_id, "reused", source_file_id=source_file_id)
+            done = len(PDF_STAGES)
+
+    if done < 2:
+        ocr_pages = state.setdefault("ocr_pages", [])
+
+        def save_range(range_pages: List[PageTranscription]):
+            # Finished ranges survive a crash, so a retry only transcribes the rest
+            ocr_pages.extend(page.dict() for page in range_pages)
+            save_checkpoint("downloaded", state)
+            publish_progress(
+                file_id, "transcribing",
+                pages=[range_pages[0].start_page, range_pages[-1].end_page], ocr_pages_done=len(ocr_pages)
+            )
+
+        publish_progress(file_id, "transcribing", ocr_pages_done=len(ocr_pages))
+        analysis_result, pages = transcribe_pdf_document(state["pdf_path"], file_id, ocr_pages, save_range)
+        store_analysis(file_id, user_id, analysis_result)
+        state["analysis"] = analysis_result.dict()
+        state["pages"] = [page.dict(exclude={"text_content"}) for page in pages]
+        state.pop("ocr_pages", None)
+        save_checkpoint("transcribed", state)
+        publish_progress(file_id, "transcribed", pages=len(pages), characters=len(analysis_result.text_content))
+    analysis_result = ImageAnalysis(**state["analysis"])
+    text = analysis_result.text_content
+
+    if done < 3:
+        logger.info(f"Starting text chunking for file_id: {file_id}")
+        state["spans"] = chunk_spans(text)
+        logger.info(f"Created {len(state['spans'])} chunks from text")
+        save_checkpoint("chunked", state)
+        publish_progress(file_id, "chunked", chunks=len(state["spans"]))
+
+    if done < 4:
+        spans = [tuple(span) for span in state["spans"]]
+        # Embed and store only the chunks that are not already indexed, so a
+        # retry after a partial embedding run picks up where it stopped
+        state["index_stats"] = index_chunks(
+            file_id, text, spans,
+            on_batch=lambda embedded, to_embed: publish_progress(
+                file_id, "embedding", chunks_embedded=embedded, chunks_to_embed=to_embed, total_chunks=len(spans)
+            )
+        )
+        save_checkpoint("embedded", state)
+        publish_progress(file_id, "inserted", **state["index_stats"])
+
+    # Update status to completed
+    logger.info(f"Updating status to completed for file_id: {file_id}")
+    update_transcription_status(file_id, TranscriptionStatus.COMPLETED)
+    publish_progress(file_id, "completed")
+
+    # Clean up
+    try:
+        if os.path.exists(state.get("pdf_path", "")):
+            os.unlink(state["pdf_path"])
+        logger.info("Cleaned up temporary files")
     except Exception as e:
-        logger.error(f"Error processing PDF: {e}", exc_info=True)
-        # Update status to failed
-        supabase_client.table("transcriptions").update({
-            "status": TranscriptionStatus.FAILED,
-            "error_message": str(e),
-            "updated_at": "now()"
-        }).match({"file_id": file_id}).execute()
+        logger.error(f"Error cleaning up files: {e}")
+
+def on_pdf_job_failure(job: Job, error: Exception, will_retry: bool):
+    """Mirror job failures onto the transcriptions row"""
+    file_id = job.payload["file_id"]
+    if will_retry:
+        update_transcription_status(file_id, TranscriptionStatus.PENDING, f"Attempt {job.attempts} failed, retrying: {error}")
+        publish_progress(file_id, "retrying", attempt=job.attempts, error=str(error))
+    else:
+        update_transcription_status(file_id, TranscriptionStatus.FAILED, str(error))
+        publish_progress(file_id, "failed", error=str(error))
+
+def create_pdf_worker_pool(concurrency: int = PDF_WORKER_CONCURRENCY) -> WorkerPool:
+    return WorkerPool(get_job_queue(), PDF_JOB_KIND, run_pdf_job, concurrency, on_failure=on_pdf_job_failure)
 
 @router.post("/analyze-pdf")
-async def analyze_pdf_endpoint(
-    request: PDFAnalysisRequest,
-    background_tasks: BackgroundTasks
-):
+async def analyze_pdf_endpoint(request: PDFAnalysisRequest):
     """
     Endpoint to initiate PDF analysis. Returns immediately with a tracking ID
-    while processing continues in the background.
+    while the job is processed by the PDF worker pool.
     """
     if not request.file_url or not request.file_id or not request.user_id:
         raise HTTPException(status_code=400, detail="file_url, file_id and user_id are required")
 
     try:
         # Create initial transcription record
-        transcription = supabase_client.table("transcriptions").insert({
+        transcription = get_supabase().table("transcriptions").insert({
             "file_id": request.file_id,
             "user_id": request.user_id,
             "status": TranscriptionStatus.PENDING,
             "file_url": request.file_url,
         }).execute()
 
-        # Start processing in background
-        background_tasks.add_task(
-            process_pdf,
-            request.file_url,
+        # Queue the job; it is durable, so it survives restarts
+        job_id = get_job_queue().enqueue(
+            PDF_JOB_KIND,
             request.file_id,
-            request.user_id
+            {"file_url": request.file_url, "file_id": request.file_id, "user_id": request.user_id},
+            max_attempts=PDF_JOB_MAX_ATTEMPTS
         )
+        publish_progress(request.file_id, "queued", job_id=job_id)
 
         return {
             "message": "PDF processing started",
             "file_id": request.file_id,
+            "job_id": job_id,
             "status": TranscriptionStatus.PENDING,
             "analysis": "to be done"
         }
 
     except Exception as e:
         print(f"Error initiating PDF analysis: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/analyze-pdf/{file_id}/job")
+async def get_pdf_job(file_id: str):
+    """Queue state of the latest processing job for a file: status, stage reached, attempts"""
+    job = get_job_queue().get(PDF_JOB_KIND, file_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No job found for this file")
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "stage": job.stage,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "last_error": job.last_error,
+        # Per-page source and confidence, once transcription has finished
+        "pages": job.checkpoint.get("pages")
+    }
+
+def _sse(event: Dict[str, Any]) -> str:
+    return f"data: {json.dumps(event)}\n\n"
+
+@router.get("/analyze-pdf/{file_id}/events")
+async def pdf_progress_events(file_id: str, request: Request):
+    """
+    Server-sent events with the processing progress of a file: queued,
+    downloading/downloaded, transcribing (per page range), transcribed, chunked,
+    embedding (chunk N of M), inserted, then completed or failed, which ends
+    the stream. Events come from the in-process worker pool, so with
+    PDF_WORKER_MODE=external only the job state at connect time is sent.
+    """
+    broker = get_progress_broker()
+    job = get_job_queue().get(PDF_JOB_KIND, file_id)
+    if job is None and not broker.history(file_id):
+        raise HTTPException(status_code=404, detail="No job found for this file")
+
+    async def event_stream():
+        with broker.subscribe(file_id) as (history, queue):
+            if not history:
+                # Nothing published in this process yet: start from the queue's view of the job
+                snapshot = {"topic": file_id, "stage": job.status, "checkpoint": job.stage, "attempts": job.attempts}
+                if job.status == FAILED:
+                    snapshot["error"] = job.last_error
+                history = [snapshot]
+            for event in history:
+                yield _sse(event)
+            if is_terminal(history[-1]):
+                return
+
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse(event)
+                if is_terminal(event):
+                    return
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
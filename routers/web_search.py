@@ -1,16 +1,12 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional
-from tavily import TavilyClient
-from config import TAVILY_API_KEY, OPENAI_API_KEY, OPENAI_MODEL
+from config import OPENAI_MODEL
 from langchain.adapters.openai import convert_openai_messages
-from langchain_community.chat_models import ChatOpenAI
+from utils.clients import get_tavily, get_chat_model
 
 router = APIRouter()
 
-# Initialize Tavily client
-tavily_client = TavilyClient(api_key=TAVILY_API_KEY)
-
 class MedicalSearchRequest(BaseModel):
     query: str
 
@@ -29,7 +25,7 @@ class MedicalSearchResponse(BaseModel):
 async def medical_search(request: MedicalSearchRequest):
     try:
         # Perform web search using Tavily API
-        search_response = tavily_client.search(
+        search_response = get_tavily().search(
             query=request.query,
             search_depth="advanced",
             include_images=True,
@@ -64,7 +60,7 @@ async def medical_search(request: MedicalSearchRequest):
         }]
 
         lc_messages = convert_openai_messages(prompt)
-        chat_model = ChatOpenAI(model=OPENAI_MODEL, openai_api_key=OPENAI_API_KEY)
+        chat_model = get_chat_model("openai", OPENAI_MODEL, temperature=0.7)
         report = chat_model.invoke(lc_messages).content
 
         return MedicalSearchResponse(
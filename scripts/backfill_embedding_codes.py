@@ -0,0 +1,29 @@
+"""
+Fill embedding_int8/embedding_binary for rows stored before quantized codes existed.
+
+    python -m scripts.backfill_embedding_codes
+"""
+from utils.quantization import quantized_columns, parse_embedding
+from utils.clients import get_supabase
+
+BATCH_SIZE = 200
+
+
+def backfill():
+    supabase = get_supabase()
+    updated = 0
+    while True:
+        rows = supabase.table("embeddings").select("id, embedding") \
+            .is_("embedding_int8", "null").limit(BATCH_SIZE).execute().data
+        if not rows:
+            break
+        for row in rows:
+            columns = quantized_columns(parse_embedding(row['embedding']))
+            supabase.table("embeddings").update(columns).eq("id", row['id']).execute()
+        updated += len(rows)
+        print(f"Backfilled {updated} rows")
+    return updated
+
+
+if __name__ == "__main__":
+    backfill()
@@ -0,0 +1,90 @@
+"""
+Queue tonight's health reports: one job per user whose data changed in the last
+SCHEDULED_REPORT_ACTIVE_DAYS days, run by the report worker pool (worker.py, or
+this script with --run). Jobs are keyed by run date and user, so running the
+script again for the same date resumes the batch: finished users are left alone,
+unfinished jobs are not queued twice, and failed jobs are retried from their
+checkpoint.
+
+    python -m scripts.schedule_health_reports [--date 2024-05-01] [--run] [--concurrency 4]
+"""
+import argparse
+import logging
+import time
+from datetime import date
+from typing import List
+
+from database import execute_sql_query
+from utils.database_utils import get_db_credentials
+from utils.job_queue import COMPLETED, FAILED, get_job_queue
+from routers.health_report import REPORT_JOB_KIND, create_report_worker_pool
+from config import (
+    SCHEDULED_REPORT_ACTIVE_DAYS, SCHEDULED_REPORT_LLM, REPORT_JOB_MAX_ATTEMPTS, REPORT_WORKER_CONCURRENCY
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def get_active_users(days: int = SCHEDULED_REPORT_ACTIVE_DAYS) -> List[str]:
+    """Users with nutrition or sensor data added or changed in the last `days` days"""
+    query = """
+    SELECT DISTINCT user_id
+    FROM daily_health_rollups
+    WHERE updated_at >= CURRENT_TIMESTAMP - INTERVAL :days_interval
+    """
+    rows = execute_sql_query(query, get_db_credentials(), {"days_interval": f"{days} days"})
+    return [str(row["user_id"]) for row in rows]
+
+
+def schedule(run_date: str, llm_choice: str = SCHEDULED_REPORT_LLM) -> int:
+    """Queue a report job for every active user without a finished one for run_date; returns the number queued"""
+    queue = get_job_queue()
+    queued = 0
+    for user_id in get_active_users():
+        job_key = f"{run_date}:{user_id}"
+        existing = queue.get(REPORT_JOB_KIND, job_key)
+        if existing and existing.status == COMPLETED:
+            continue
+        if existing and existing.status == FAILED:
+            # Retry in place: the checkpoint keeps the report record the failed run created
+            queue.requeue(existing.id, REPORT_JOB_MAX_ATTEMPTS)
+        else:
+            queue.enqueue(
+                REPORT_JOB_KIND, job_key, {"user_id": user_id, "llm_choice": llm_choice}, max_attempts=REPORT_JOB_MAX_ATTEMPTS
+            )
+        queued += 1
+    return queued
+
+
+def wait_for_batch(run_date: str, poll_seconds: float = 5.0):
+    """Block until every job for run_date has completed or run out of attempts"""
+    queue = get_job_queue()
+    while True:
+        counts = queue.counts(REPORT_JOB_KIND, f"{run_date}:")
+        finished = counts.get(COMPLETED, 0) + counts.get(FAILED, 0)
+        logger.info(f"Scheduled reports for {run_date}: {finished}/{sum(counts.values())} finished ({counts})")
+        if finished == sum(counts.values()):
+            return counts
+        time.sleep(poll_seconds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--date", default=date.today().isoformat(), help="Run date the jobs are keyed by")
+    parser.add_argument("--llm", default=SCHEDULED_REPORT_LLM, choices=["openai", "gemini"])
+    parser.add_argument("--run", action="store_true", help="Process the batch here and exit when it is done")
+    parser.add_argument("--concurrency", type=int, default=REPORT_WORKER_CONCURRENCY)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    queued = schedule(args.date, args.llm)
+    logger.info(f"Queued {queued} scheduled reports for {args.date}")
+    if args.run:
+        pool = create_report_worker_pool(args.concurrency)
+        pool.start()
+        try:
+            counts = wait_for_batch(args.date)
+        finally:
+            pool.stop()
+        logger.info(f"Scheduled reports for {args.date} done in {time.perf_counter() - started:.0f} s: {counts}")
@@ -0,0 +1,8 @@
+-- Compact embedding codes used by EMBEDDING_SEARCH_MODE=binary|int8.
+-- Codes are base64 so they travel through PostgREST as short strings:
+-- int8 is 1 byte per dimension, binary is 1 bit per dimension.
+ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS embedding_int8 text;
+ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS embedding_int8_scale real;
+ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS embedding_binary text;
+
+CREATE INDEX IF NOT EXISTS embeddings_file_id_idx ON embeddings (file_id);
@@ -0,0 +1,5 @@
+-- sha256 of each chunk's text, used to skip unchanged chunks when a file is reprocessed.
+-- Rows without a hash are treated as stale and replaced on the next reprocess.
+ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS content_hash text;
+
+CREATE INDEX IF NOT EXISTS embeddings_file_id_content_hash_idx ON embeddings (file_id, content_hash);
@@ -0,0 +1,5 @@
+-- sha256 of the downloaded file. A completed transcription with the same hash is
+-- reused (analysis and embeddings copied) instead of transcribing the file again.
+ALTER TABLE transcriptions ADD COLUMN IF NOT EXISTS content_sha256 text;
+
+CREATE INDEX IF NOT EXISTS transcriptions_content_sha256_idx ON transcriptions (content_sha256) WHERE status = 'completed';
@@ -0,0 +1,2 @@
+-- Milliseconds spent in each stage of report generation (RAG retrieval, each SQL aggregate, LLM call, total).
+ALTER TABLE health_reports ADD COLUMN IF NOT EXISTS stage_timings jsonb;
@@ -0,0 +1,297 @@
+-- Per-user daily health aggregates, kept current by triggers on the raw tables so
+-- reports read O(days) rollup rows instead of re-aggregating every raw row.
+--
+-- Sensor aggregates are stored as count/sum/min/max so new readings merge in
+-- without rereading the day; means are sum / count at query time. Nutrition and
+-- per-food rows are small and are recomputed for the touched (user, day).
+--
+-- Sensor readings are attributed by sensor_data.user_id; readings without one
+-- are not rolled up.
+
+ALTER TABLE sensor_data ADD COLUMN IF NOT EXISTS user_id uuid;
+CREATE INDEX IF NOT EXISTS sensor_data_user_created_idx ON sensor_data (user_id, created_at);
+
+CREATE TABLE IF NOT EXISTS daily_health_rollups (
+    user_id uuid NOT NULL,
+    day date NOT NULL,
+    -- Nutrition (from daily_nutrition / consumed_foods)
+    nutrition_logged boolean NOT NULL DEFAULT false,
+    calories numeric,
+    protein numeric,
+    carbs numeric,
+    fat numeric,
+    foods_logged integer NOT NULL DEFAULT 0,
+    -- Sensors (from sensor_data)
+    hr_count bigint NOT NULL DEFAULT 0,
+    hr_sum double precision NOT NULL DEFAULT 0,
+    hr_min double precision,
+    hr_max double precision,
+    temp_count bigint NOT NULL DEFAULT 0,
+    temp_sum double precision NOT NULL DEFAULT 0,
+    temp_min double precision,
+    temp_max double precision,
+    humidity_count bigint NOT NULL DEFAULT 0,
+    humidity_sum double precision NOT NULL DEFAULT 0,
+    humidity_min double precision,
+    humidity_max double precision,
+    updated_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (user_id, day)
+);
+
+CREATE TABLE IF NOT EXISTS daily_food_rollups (
+    user_id uuid NOT NULL,
+    day date NOT NULL,
+    food_name text NOT NULL,
+    servings integer NOT NULL,
+    calories numeric,
+    protein numeric,
+    carbs numeric,
+    fat numeric,
+    PRIMARY KEY (user_id, day, food_name)
+);
+
+-- Recompute the nutrition columns and per-food rows of one (user, day)
+CREATE OR REPLACE FUNCTION refresh_nutrition_rollup(p_user_id uuid, p_day date) RETURNS void AS $$
+BEGIN
+    INSERT INTO daily_health_rollups AS r (user_id, day, nutrition_logged, calories, protein, carbs, fat, foods_logged, updated_at)
+    SELECT p_user_id, p_day,
+           EXISTS (SELECT 1 FROM daily_nutrition WHERE user_id = p_user_id AND date = p_day),
+           (SELECT SUM(total_calories) FROM daily_nutrition WHERE user_id = p_user_id AND date = p_day),
+           SUM(cf.protein), SUM(cf.carbs), SUM(cf.fat), COUNT(cf.daily_nutrition_id)
+    FROM daily_nutrition dn
+    LEFT JOIN consumed_foods cf ON cf.daily_nutrition_id = dn.id
+    WHERE dn.user_id = p_user_id AND dn.date = p_day
+    ON CONFLICT (user_id, day) DO UPDATE SET
+        nutrition_logged = EXCLUDED.nutrition_logged,
+        calories = EXCLUDED.calories,
+        protein = EXCLUDED.protein,
+        carbs = EXCLUDED.carbs,
+        fat = EXCLUDED.fat,
+        foods_logged = EXCLUDED.foods_logged,
+        updated_at = now();
+
+    DELETE FROM daily_food_rollups WHERE user_id = p_user_id AND day = p_day;
+    INSERT INTO daily_food_rollups (user_id, day, food_name, servings, calories, protein, carbs, fat)
+    SELECT p_user_id, p_day, cf.food_name, COUNT(*), SUM(cf.calories), SUM(cf.protein), SUM(cf.carbs), SUM(cf.fat)
+    FROM consumed_foods cf
+    JOIN daily_nutrition dn ON cf.daily_nutrition_id = dn.id
+    WHERE dn.user_id = p_user_id AND dn.date = p_day
+    GROUP BY cf.food_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Recompute the sensor columns of one (user, day) from raw readings
+CREATE OR REPLACE FUNCTION refresh_sensor_rollup(p_user_id uuid, p_day date) RETURNS void AS $$
+BEGIN
+    INSERT INTO daily_health_rollups AS r (
+        user_id, day,
+        hr_count, hr_sum, hr_min, hr_max,
+        temp_count, temp_sum, temp_min, temp_max,
+        humidity_count, humidity_sum, humidity_min, humidity_max,
+        updated_at
+    )
+    SELECT p_user_id, p_day,
+           COUNT(beat_avg), COALESCE(SUM(beat_avg), 0), MIN(beat_avg), MAX(beat_avg),
+           COUNT(temperature_c), COALESCE(SUM(temperature_c), 0), MIN(temperature_c), MAX(temperature_c),
+           COUNT(humidity), COALESCE(SUM(humidity), 0), MIN(humidity), MAX(humidity),
+           now()
+    FROM sensor_data
+    WHERE user_id = p_user_id AND created_at >= p_day AND created_at < p_day + 1
+    ON CONFLICT (user_id, day) DO UPDATE SET
+        hr_count = EXCLUDED.hr_count, hr_sum = EXCLUDED.hr_sum, hr_min = EXCLUDED.hr_min, hr_max = EXCLUDED.hr_max,
+        temp_count = EXCLUDED.temp_count, temp_sum = EXCLUDED.temp_sum, temp_min = EXCLUDED.temp_min, temp_max = EXCLUDED.temp_max,
+        humidity_count = EXCLUDED.humidity_count, humidity_sum = EXCLUDED.humidity_sum,
+        humidity_min = EXCLUDED.humidity_min, humidity_max = EXCLUDED.humidity_max,
+        updated_at = now();
+END;
+$$ LANGUAGE plpgsql;
+
+-- New readings: aggregate the statement's rows per (user, day) and merge them in.
+-- One statement-level trigger run per INSERT/COPY, not one per row.
+CREATE OR REPLACE FUNCTION sensor_data_rollup_insert() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO daily_health_rollups AS r (
+        user_id, day,
+        hr_count, hr_sum, hr_min, hr_max,
+        temp_count, temp_sum, temp_min, temp_max,
+        humidity_count, humidity_sum, humidity_min, humidity_max,
+        updated_at
+    )
+    SELECT user_id, created_at::date,
+           COUNT(beat_avg), COALESCE(SUM(beat_avg), 0), MIN(beat_avg), MAX(beat_avg),
+           COUNT(temperature_c), COALESCE(SUM(temperature_c), 0), MIN(temperature_c), MAX(temperature_c),
+           COUNT(humidity), COALESCE(SUM(humidity), 0), MIN(humidity), MAX(humidity),
+           now()
+    FROM new_rows
+    WHERE user_id IS NOT NULL
+    GROUP BY user_id, created_at::date
+    ON CONFLICT (user_id, day) DO UPDATE SET
+        hr_count = r.hr_count + EXCLUDED.hr_count,
+        hr_sum = r.hr_sum + EXCLUDED.hr_sum,
+        hr_min = LEAST(r.hr_min, EXCLUDED.hr_min),
+        hr_max = GREATEST(r.hr_max, EXCLUDED.hr_max),
+        temp_count = r.temp_count + EXCLUDED.temp_count,
+        temp_sum = r.temp_sum + EXCLUDED.temp_sum,
+        temp_min = LEAST(r.temp_min, EXCLUDED.temp_min),
+        temp_max = GREATEST(r.temp_max, EXCLUDED.temp_max),
+        humidity_count = r.humidity_count + EXCLUDED.humidity_count,
+        humidity_sum = r.humidity_sum + EXCLUDED.humidity_sum,
+        humidity_min = LEAST(r.humidity_min, EXCLUDED.humidity_min),
+        humidity_max = GREATEST(r.humidity_max, EXCLUDED.humidity_max),
+        updated_at = now();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Changed or deleted readings cannot be merged out of a min/max: recompute the days they touched
+CREATE OR REPLACE FUNCTION sensor_data_rollup_change() RETURNS trigger AS $$
+DECLARE
+    touched record;
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        FOR touched IN
+            SELECT DISTINCT user_id, created_at::date AS day FROM old_rows WHERE user_id IS NOT NULL
+            UNION
+            SELECT DISTINCT user_id, created_at::date FROM new_rows WHERE user_id IS NOT NULL
+        LOOP
+            PERFORM refresh_sensor_rollup(touched.user_id, touched.day);
+        END LOOP;
+    ELSE
+        FOR touched IN SELECT DISTINCT user_id, created_at::date AS day FROM old_rows WHERE user_id IS NOT NULL LOOP
+            PERFORM refresh_sensor_rollup(touched.user_id, touched.day);
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION consumed_foods_rollup() RETURNS trigger AS $$
+DECLARE
+    touched record;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        FOR touched IN
+            SELECT DISTINCT dn.user_id, dn.date FROM new_rows r JOIN daily_nutrition dn ON dn.id = r.daily_nutrition_id
+        LOOP
+            PERFORM refresh_nutrition_rollup(touched.user_id, touched.date);
+        END LOOP;
+    ELSIF TG_OP = 'UPDATE' THEN
+        FOR touched IN
+            SELECT DISTINCT dn.user_id, dn.date FROM old_rows r JOIN daily_nutrition dn ON dn.id = r.daily_nutrition_id
+            UNION
+            SELECT DISTINCT dn.user_id, dn.date FROM new_rows r JOIN daily_nutrition dn ON dn.id = r.daily_nutrition_id
+        LOOP
+            PERFORM refresh_nutrition_rollup(touched.user_id, touched.date);
+        END LOOP;
+    ELSE
+        FOR touched IN
+            SELECT DISTINCT dn.user_id, dn.date FROM old_rows r JOIN daily_nutrition dn ON dn.id = r.daily_nutrition_id
+        LOOP
+            PERFORM refresh_nutrition_rollup(touched.user_id, touched.date);
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION daily_nutrition_rollup() RETURNS trigger AS $$
+DECLARE
+    touched record;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        FOR touched IN SELECT DISTINCT user_id, date FROM new_rows LOOP
+            PERFORM refresh_nutrition_rollup(touched.user_id, touched.date);
+        END LOOP;
+    ELSIF TG_OP = 'UPDATE' THEN
+        FOR touched IN SELECT DISTINCT user_id, date FROM old_rows UNION SELECT DISTINCT user_id, date FROM new_rows LOOP
+            PERFORM refresh_nutrition_rollup(touched.user_id, touched.date);
+        END LOOP;
+    ELSE
+        FOR touched IN SELECT DISTINCT user_id, date FROM old_rows LOOP
+            PERFORM refresh_nutrition_rollup(touched.user_id, touched.date);
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables need one trigger per event
+DROP TRIGGER IF EXISTS sensor_data_rollup_insert ON sensor_data;
+CREATE TRIGGER sensor_data_rollup_insert AFTER INSERT ON sensor_data
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION sensor_data_rollup_insert();
+DROP TRIGGER IF EXISTS sensor_data_rollup_update ON sensor_data;
+CREATE TRIGGER sensor_data_rollup_update AFTER UPDATE ON sensor_data
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION sensor_data_rollup_change();
+DROP TRIGGER IF EXISTS sensor_data_rollup_delete ON sensor_data;
+CREATE TRIGGER sensor_data_rollup_delete AFTER DELETE ON sensor_data
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION sensor_data_rollup_change();
+
+DROP TRIGGER IF EXISTS consumed_foods_rollup_insert ON consumed_foods;
+CREATE TRIGGER consumed_foods_rollup_insert AFTER INSERT ON consumed_foods
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION consumed_foods_rollup();
+DROP TRIGGER IF EXISTS consumed_foods_rollup_update ON consumed_foods;
+CREATE TRIGGER consumed_foods_rollup_update AFTER UPDATE ON consumed_foods
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION consumed_foods_rollup();
+DROP TRIGGER IF EXISTS consumed_foods_rollup_delete ON consumed_foods;
+CREATE TRIGGER consumed_foods_rollup_delete AFTER DELETE ON consumed_foods
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION consumed_foods_rollup();
+
+DROP TRIGGER IF EXISTS daily_nutrition_rollup_insert ON daily_nutrition;
+CREATE TRIGGER daily_nutrition_rollup_insert AFTER INSERT ON daily_nutrition
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION daily_nutrition_rollup();
+DROP TRIGGER IF EXISTS daily_nutrition_rollup_update ON daily_nutrition;
+CREATE TRIGGER daily_nutrition_rollup_update AFTER UPDATE ON daily_nutrition
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION daily_nutrition_rollup();
+DROP TRIGGER IF EXISTS daily_nutrition_rollup_delete ON daily_nutrition;
+CREATE TRIGGER daily_nutrition_rollup_delete AFTER DELETE ON daily_nutrition
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION daily_nutrition_rollup();
+
+-- Rebuild every rollup from raw data since p_since (initial backfill, or repair)
+CREATE OR REPLACE FUNCTION rebuild_daily_health_rollups(p_since date) RETURNS void AS $$
+BEGIN
+    DELETE FROM daily_health_rollups WHERE day >= p_since;
+    DELETE FROM daily_food_rollups WHERE day >= p_since;
+
+    INSERT INTO daily_health_rollups (
+        user_id, day,
+        hr_count, hr_sum, hr_min, hr_max,
+        temp_count, temp_sum, temp_min, temp_max,
+        humidity_count, humidity_sum, humidity_min, humidity_max
+    )
+    SELECT user_id, created_at::date,
+           COUNT(beat_avg), COALESCE(SUM(beat_avg), 0), MIN(beat_avg), MAX(beat_avg),
+           COUNT(temperature_c), COALESCE(SUM(temperature_c), 0), MIN(temperature_c), MAX(temperature_c),
+           COUNT(humidity), COALESCE(SUM(humidity), 0), MIN(humidity), MAX(humidity)
+    FROM sensor_data
+    WHERE user_id IS NOT NULL AND created_at >= p_since
+    GROUP BY user_id, created_at::date;
+
+    INSERT INTO daily_health_rollups AS r (user_id, day, nutrition_logged, calories, protein, carbs, fat, foods_logged)
+    SELECT dn.user_id, dn.date, true, calories.total, SUM(cf.protein), SUM(cf.carbs), SUM(cf.fat), COUNT(cf.daily_nutrition_id)
+    FROM daily_nutrition dn
+    JOIN (
+        SELECT user_id, date, SUM(total_calories) AS total FROM daily_nutrition WHERE date >= p_since GROUP BY user_id, date
+    ) calories ON calories.user_id = dn.user_id AND calories.date = dn.date
+    LEFT JOIN consumed_foods cf ON cf.daily_nutrition_id = dn.id
+    WHERE dn.date >= p_since
+    GROUP BY dn.user_id, dn.date, calories.total
+    ON CONFLICT (user_id, day) DO UPDATE SET
+        nutrition_logged = true,
+        calories = EXCLUDED.calories,
+        protein = EXCLUDED.protein,
+        carbs = EXCLUDED.carbs,
+        fat = EXCLUDED.fat,
+        foods_logged = EXCLUDED.foods_logged,
+        updated_at = now();
+
+    INSERT INTO daily_food_rollups (user_id, day, food_name, servings, calories, protein, carbs, fat)
+    SELECT dn.user_id, dn.date, cf.food_name, COUNT(*), SUM(cf.calories), SUM(cf.protein), SUM(cf.carbs), SUM(cf.fat)
+    FROM consumed_foods cf
+    JOIN daily_nutrition dn ON cf.daily_nutrition_id = dn.id
+    WHERE dn.date >= p_since
+    GROUP BY dn.user_id, dn.date, cf.food_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Initial backfill; rerun with a later date to repair recent days
+SELECT rebuild_daily_health_rollups('-infinity'::date);
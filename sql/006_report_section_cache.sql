@@ -0,0 +1,20 @@
+-- Generated health report sections, keyed by a hash of the section's inputs
+-- (prompt version, model and the report data it is written from). A report
+-- reuses a section whose inputs are unchanged instead of calling the LLM again.
+CREATE TABLE IF NOT EXISTS report_section_cache (
+    user_id uuid NOT NULL,
+    section text NOT NULL,
+    input_hash text NOT NULL,
+    content text NOT NULL,
+    -- What generating the section cost, i.e. what each reuse saves
+    prompt_tokens integer NOT NULL DEFAULT 0,
+    completion_tokens integer NOT NULL DEFAULT 0,
+    hits integer NOT NULL DEFAULT 0,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    last_used_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (user_id, section, input_hash)
+);
+CREATE INDEX IF NOT EXISTS report_section_cache_user_hash_idx ON report_section_cache (user_id, input_hash);
+
+-- LLM tokens spent and saved (via cached sections) per report
+ALTER TABLE health_reports ADD COLUMN IF NOT EXISTS token_usage jsonb;
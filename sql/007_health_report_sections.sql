@@ -0,0 +1,3 @@
+-- Per-section progress of a report (pending, cached, generated, failed). report_content
+-- is rewritten as each section finishes, so a report in progress can be read partially.
+ALTER TABLE health_reports ADD COLUMN IF NOT EXISTS sections jsonb;
@@ -0,0 +1,15 @@
+-- Batches written by POST /sensor-data/{user_id}/ingest under a client batch id. Each row
+-- commits in the same transaction as its COPY, so a retried upload skips batches already stored.
+-- Batch ids are chosen by clients, so they are only unique per user.
+CREATE TABLE IF NOT EXISTS sensor_ingest_batches (
+    batch_id text NOT NULL,
+    seq integer NOT NULL,
+    user_id uuid NOT NULL,
+    row_count integer NOT NULL,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (user_id, batch_id, seq)
+);
+
+-- Tables created before the key included user_id
+ALTER TABLE sensor_ingest_batches DROP CONSTRAINT IF EXISTS sensor_ingest_batches_pkey;
+ALTER TABLE sensor_ingest_batches ADD PRIMARY KEY (user_id, batch_id, seq);
@@ -0,0 +1,13 @@
+-- Hash of the data a report was written from, so scheduled generation can skip users whose data
+-- has not changed, and what created the report ('on_demand' or 'scheduled').
+ALTER TABLE health_reports ADD COLUMN IF NOT EXISTS data_fingerprint text;
+ALTER TABLE health_reports ADD COLUMN IF NOT EXISTS trigger text NOT NULL DEFAULT 'on_demand';
+CREATE INDEX IF NOT EXISTS health_reports_user_completed_idx
+    ON health_reports (user_id, created_at DESC) WHERE status = 'completed';
+CREATE INDEX IF NOT EXISTS daily_health_rollups_updated_idx ON daily_health_rollups (updated_at);
+
+-- When a completed report was last confirmed to match its user's data: set when it is written and
+-- again each time a scheduled run finds the data unchanged. POST /health-report reuses a report
+-- verified recently enough, as long as none of the user's daily rollups changed after it was created.
+ALTER TABLE health_reports ADD COLUMN IF NOT EXISTS verified_at timestamptz;
+UPDATE health_reports SET verified_at = updated_at WHERE status = 'completed' AND verified_at IS NULL;
@@ -0,0 +1,16 @@
+-- Store a batch of image analyses and their embeddings in one transaction, for POST /analyze-images:
+-- either every row of the batch is written or none is, so a client can retry a failed batch
+-- without duplicating rows. Called through PostgREST as rpc('store_image_analyses').
+CREATE OR REPLACE FUNCTION store_image_analyses(analyses jsonb, embedding_rows jsonb) RETURNS void AS $$
+BEGIN
+    INSERT INTO image_analysis (file_id, user_id, text_content, confidence_level, text_locations, languages, ocr_quality)
+    SELECT file_id, user_id, text_content, confidence_level, text_locations, languages, ocr_quality
+    FROM jsonb_populate_recordset(NULL::image_analysis, analyses);
+
+    INSERT INTO embeddings (
+        file_id, embedding, text_content, content_hash, embedding_int8, embedding_int8_scale, embedding_binary
+    )
+    SELECT file_id, embedding, text_content, content_hash, embedding_int8, embedding_int8_scale, embedding_binary
+    FROM jsonb_populate_recordset(NULL::embeddings, embedding_rows);
+END;
+$$ LANGUAGE plpgsql;
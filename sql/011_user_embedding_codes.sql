@@ -0,0 +1,15 @@
+-- Compact codes of every chunk a user owns, for the first stage of EMBEDDING_SEARCH_MODE=binary|int8.
+-- The join to image_analysis runs in the database, so the client no longer sends the user's file ids
+-- in the URL. Rows are ordered by id so callers can page with .range() under PostgREST's max-rows cap.
+CREATE OR REPLACE FUNCTION user_embedding_codes(p_user_id text, p_mode text)
+RETURNS TABLE (id text, code text, scale real) AS $$
+    SELECT e.id::text,
+           CASE WHEN p_mode = 'binary' THEN e.embedding_binary ELSE e.embedding_int8 END,
+           e.embedding_int8_scale
+    FROM embeddings e
+    WHERE e.embedding_int8 IS NOT NULL
+      AND e.file_id IN (SELECT a.file_id FROM image_analysis a WHERE a.user_id::text = p_user_id)
+    ORDER BY e.id
+$$ LANGUAGE sql STABLE;
+
+CREATE INDEX IF NOT EXISTS image_analysis_user_id_idx ON image_analysis (user_id);
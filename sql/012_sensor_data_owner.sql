@@ -0,0 +1,41 @@
+-- Attribution of sensor readings that arrive without a user_id.
+--
+-- Before sql/005, sensor_data had no user column: the table held one device's readings and
+-- every report read all of them. Rows written before the migration, and rows from devices that
+-- still insert without user_id, are not rolled up (get_sensor_stats reads them only with
+-- SENSOR_UNATTRIBUTED_READINGS=shared). Until every device sends user_id, name the owner of the
+-- unattributed readings once:
+--
+--     SELECT assign_sensor_owner('<user uuid>');
+--
+-- This backfills existing rows, which rebuilds their rollup days through the UPDATE trigger.
+-- New rows without a user_id are then attributed to that owner on insert.
+
+CREATE TABLE IF NOT EXISTS sensor_data_default_owner (
+    singleton boolean PRIMARY KEY DEFAULT true CHECK (singleton),
+    user_id uuid NOT NULL
+);
+
+CREATE OR REPLACE FUNCTION sensor_data_default_user() RETURNS trigger AS $$
+BEGIN
+    NEW.user_id := (SELECT user_id FROM sensor_data_default_owner);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Row-level, but only for rows without a user_id: bulk ingest always sets it and skips the trigger
+DROP TRIGGER IF EXISTS sensor_data_default_user ON sensor_data;
+CREATE TRIGGER sensor_data_default_user BEFORE INSERT ON sensor_data
+    FOR EACH ROW WHEN (NEW.user_id IS NULL) EXECUTE FUNCTION sensor_data_default_user();
+
+CREATE OR REPLACE FUNCTION assign_sensor_owner(p_user_id uuid) RETURNS bigint AS $$
+DECLARE
+    assigned bigint;
+BEGIN
+    INSERT INTO sensor_data_default_owner (user_id) VALUES (p_user_id)
+    ON CONFLICT (singleton) DO UPDATE SET user_id = EXCLUDED.user_id;
+    UPDATE sensor_data SET user_id = p_user_id WHERE user_id IS NULL;
+    GET DIAGNOSTICS assigned = ROW_COUNT;
+    RETURN assigned;
+END;
+$$ LANGUAGE plpgsql;
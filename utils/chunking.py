@@ -0,0 +1,117 @@
+"""
+Streaming text chunker that produces the same chunks as LangChain's
+RecursiveCharacterTextSplitter (keep_separator=True, strip_whitespace=True,
+length_function=len) without building the chunk list.
+
+Chunks are yielded lazily as (start, end) offsets into the original text, so
+a caller can hash, store or slice one chunk at a time.
+"""
+from collections import deque
+from itertools import groupby
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_SEPARATORS = ["\n\n", "\n", " ", ""]
+
+Span = Tuple[int, int]
+
+
+def _strip(text: str, start: int, end: int) -> Optional[Span]:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return (start, end) if start < end else None
+
+
+def _pieces(text: str, start: int, end: int, separator: str) -> Iterator[Span]:
+    """Split text[start:end] on separator, keeping each separator at the start of the following piece"""
+    if not separator:
+        for position in range(start, end):
+            yield position, position + 1
+        return
+
+    piece_start = start
+    search_from = start
+    while True:
+        match = text.find(separator, search_from, end)
+        if match == -1:
+            break
+        if match > piece_start:
+            yield piece_start, match
+        piece_start = match
+        search_from = match + len(separator)
+    if end > piece_start:
+        yield piece_start, end
+
+
+def _merge(text: str, pieces: Iterable[Span], chunk_size: int, chunk_overlap: int) -> Iterator[Span]:
+    """Combine consecutive small pieces into chunks of up to chunk_size, carrying chunk_overlap forward"""
+    current: deque = deque()
+    total = 0
+    for start, end in pieces:
+        length = end - start
+        if total + length > chunk_size:
+            if current:
+                span = _strip(text, current[0][0], current[-1][1])
+                if span:
+                    yield span
+                while total > chunk_overlap or (total + length > chunk_size and total > 0):
+                    first_start, first_end = current.popleft()
+                    total -= first_end - first_start
+        current.append((start, end))
+        total += length
+    if current:
+        span = _strip(text, current[0][0], current[-1][1])
+        if span:
+            yield span
+
+
+def _split(text: str, start: int, end: int, separators: List[str], chunk_size: int, chunk_overlap: int) -> Iterator[Span]:
+    # Use the first separator present in this range; finer ones are kept for oversized pieces
+    separator = separators[-1]
+    finer_separators: List[str] = []
+    for i, candidate in enumerate(separators):
+        if candidate == "":
+            separator = candidate
+            break
+        if text.find(candidate, start, end) != -1:
+            separator = candidate
+            finer_separators = separators[i + 1:]
+            break
+
+    pieces = _pieces(text, start, end, separator)
+    for fits, group in groupby(pieces, key=lambda piece: piece[1] - piece[0] < chunk_size):
+        if fits:
+            yield from _merge(text, group, chunk_size, chunk_overlap)
+        elif finer_separators:
+            for piece_start, piece_end in group:
+                yield from _split(text, piece_start, piece_end, finer_separators, chunk_size, chunk_overlap)
+        else:
+            # Nothing finer to split on: emit the oversized piece as is
+            yield from group
+
+
+def iter_chunk_spans(
+    text: str,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 100,
+    separators: Optional[List[str]] = None,
+) -> Iterator[Span]:
+    """Lazily yield (start, end) offsets of each chunk of text"""
+    if chunk_overlap > chunk_size:
+        raise ValueError(f"Got a larger chunk overlap ({chunk_overlap}) than chunk size ({chunk_size}), should be smaller.")
+    return _split(text, 0, len(text), separators or DEFAULT_SEPARATORS, chunk_size, chunk_overlap)
+
+
+def iter_chunks(
+    text: str,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 100,
+    separators: Optional[List[str]] = None,
+) -> Iterator[Tuple[int, int, str]]:
+    """
+    Lazily yield (start, end, chunk) for each chunk. Python strings cannot be
+    viewed without copying, so each chunk is sliced only when it is reached.
+    """
+    for start, end in iter_chunk_spans(text, chunk_size, chunk_overlap, separators):
+        yield start, end, text[start:end]
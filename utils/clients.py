@@ -0,0 +1,124 @@
+"""
+Process-wide registry of API clients.
+
+Clients are created on first use instead of at import time, and shared: one
+instance per process per (service, key). SDK imports happen inside the
+factories so importing a router does not pay for SDKs it has not used yet.
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from config import (
+    SUPABASE_URL, SUPABASE_KEY, SUPABASE_ADMIN, COHERE_API_KEY,
+    OPENAI_API_KEY, GOOGLE_API_KEY, TAVILY_API_KEY,
+)
+
+logger = logging.getLogger(__name__)
+
+_clients: Dict[Tuple[str, Hashable], Any] = {}
+# Re-entrant: a factory may build its parts through get_client (e.g. the image analyzer's chat model)
+_lock = threading.RLock()
+
+
+def get_client(service: str, key: Hashable, factory: Callable[[], Any]) -> Any:
+    """Return the shared client for (service, key), building it with `factory` on first use"""
+    cache_key = (service, key)
+    client = _clients.get(cache_key)
+    if client is None:
+        with _lock:
+            client = _clients.get(cache_key)
+            if client is None:
+                start = time.perf_counter()
+                client = factory()
+                _clients[cache_key] = client
+                logger.info(f"Created {service} client in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return client
+
+
+def get_supabase(url: Optional[str] = None, key: Optional[str] = None):
+    url = url or SUPABASE_URL
+    key = key or SUPABASE_KEY
+
+    def factory():
+        from supabase import create_client
+        return create_client(url, key)
+
+    return get_client("supabase", (url, key), factory)
+
+
+def get_supabase_admin():
+    return get_supabase(SUPABASE_URL, SUPABASE_ADMIN)
+
+
+def get_cohere(api_key: Optional[str] = None):
+    api_key = api_key or COHERE_API_KEY
+
+    def factory():
+        import cohere
+        return cohere.Client(api_key)
+
+    return get_client("cohere", api_key, factory)
+
+
+def get_cohere_v2(api_key: Optional[str] = None):
+    api_key = api_key or COHERE_API_KEY
+
+    def factory():
+        import cohere
+        return cohere.ClientV2(api_key=api_key)
+
+    return get_client("cohere_v2", api_key, factory)
+
+
+def get_openai(api_key: Optional[str] = None):
+    api_key = api_key or OPENAI_API_KEY
+
+    def factory():
+        from openai import OpenAI
+        return OpenAI(api_key=api_key)
+
+    return get_client("openai", api_key, factory)
+
+
+def get_tavily(api_key: Optional[str] = None):
+    api_key = api_key or TAVILY_API_KEY
+
+    def factory():
+        from tavily import TavilyClient
+        return TavilyClient(api_key=api_key)
+
+    return get_client("tavily", api_key, factory)
+
+
+def configure_genai(api_key: Optional[str] = None):
+    """Configure the google.generativeai module once per key and return it"""
+    api_key = api_key or GOOGLE_API_KEY
+
+    def factory():
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        return genai
+
+    return get_client("genai", api_key, factory)
+
+
+def get_chat_model(provider: str, model: str, temperature: float, streaming: bool = False, api_key: Optional[str] = None):
+    """Shared LangChain chat model so HTTP connections are reused across requests"""
+    if provider == "openai":
+        api_key = api_key or OPENAI_API_KEY
+
+        def factory():
+            from langchain_openai import ChatOpenAI
+            return ChatOpenAI(model=model, temperature=temperature, streaming=streaming, api_key=api_key)
+    elif provider == "gemini":
+        api_key = api_key or GOOGLE_API_KEY
+
+        def factory():
+            from langchain_google_genai import ChatGoogleGenerativeAI
+            return ChatGoogleGenerativeAI(model=model, temperature=temperature, google_api_key=api_key)
+    else:
+        raise ValueError(f"Invalid LLM provider: {provider}")
+
+    return get_client(f"chat_{provider}", (api_key, model, temperature, streaming), factory)
@@ -0,0 +1,164 @@
+import math
+from typing import List, Dict, Any, Optional, Tuple
+
+from config import RAG_CONTEXT_TOKEN_BUDGET, RAG_MMR_LAMBDA, RAG_DUPLICATE_THRESHOLD
+
+# chunk_overlap used by chunk_text when documents are indexed
+CHUNK_OVERLAP = 100
+# Shortest suffix/prefix match treated as splitter overlap rather than coincidence
+MIN_OVERLAP = 10
+SHINGLE_SIZE = 5
+# Between merged blocks in the context
+CONTEXT_SEPARATOR = "\n\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)"""
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def _shingles(text: str) -> set:
+    words = text.lower().split()
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def _redundancy(a: Dict[str, Any], b: Dict[str, Any]) -> float:
+    """Similarity between two hits, using stored embeddings when the search returned them"""
+    if a.get("embedding") and b.get("embedding"):
+        return _cosine(a["embedding"], b["embedding"])
+    return _jaccard(a["_shingles"], b["_shingles"])
+
+
+def _overlap_length(previous: str, following: str, max_overlap: int) -> int:
+    """Length of the longest suffix of `previous` that is also a prefix of `following`"""
+    for size in range(min(max_overlap, len(previous), len(following)), MIN_OVERLAP - 1, -1):
+        if previous.endswith(following[:size]):
+            return size
+    return 0
+
+
+def merge_adjacent(hits: List[Dict[str, Any]], max_overlap: int = CHUNK_OVERLAP) -> List[Dict[str, Any]]:
+    """
+    Merge hits that are consecutive chunks of the same file into single blocks,
+    dropping the text the splitter repeated between them.
+    """
+    blocks: List[Dict[str, Any]] = []
+    ordered = sorted(hits, key=lambda h: (str(h.get("file_id")), h.get("chunk_index") is None, h.get("chunk_index") or 0))
+    for hit in ordered:
+        previous = blocks[-1] if blocks else None
+        if (
+            previous is not None
+            and hit.get("chunk_index") is not None
+            and previous["chunk_indexes"]
+            and previous["file_id"] == hit.get("file_id")
+            and previous["chunk_indexes"][-1] + 1 == hit["chunk_index"]
+        ):
+            overlap = _overlap_length(previous["text_content"], hit["text_content"], max_overlap)
+            joiner = "" if overlap else "\n"
+            previous["text_content"] += joiner + hit["text_content"][overlap:]
+            previous["chunk_indexes"].append(hit["chunk_index"])
+            previous["similarity"] = max(previous["similarity"], hit.get("similarity") or 0.0)
+            continue
+        blocks.append({
+            "file_id": hit.get("file_id"),
+            "chunk_indexes": [hit["chunk_index"]] if hit.get("chunk_index") is not None else [],
+            "text_content": hit["text_content"],
+            "similarity": hit.get("similarity") or 0.0,
+        })
+    # Highest scoring block first so the most relevant text leads the prompt
+    blocks.sort(key=lambda b: b["similarity"], reverse=True)
+    return blocks
+
+
+def mmr_order(
+    hits: List[Dict[str, Any]],
+    mmr_lambda: float = RAG_MMR_LAMBDA,
+    duplicate_threshold: float = RAG_DUPLICATE_THRESHOLD,
+) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Order hits by maximal marginal relevance and drop near-duplicates.
+    Returns the ordered hits and the number of duplicates removed.
+    """
+    remaining = [dict(hit, _shingles=_shingles(hit.get("text_content") or "")) for hit in hits]
+    remaining.sort(key=lambda h: h.get("similarity") or 0.0, reverse=True)
+    selected: List[Dict[str, Any]] = []
+    duplicates = 0
+
+    while remaining:
+        best_index, best_score = None, None
+        for index, candidate in enumerate(remaining):
+            redundancy = max((_redundancy(candidate, chosen) for chosen in selected), default=0.0)
+            if redundancy >= duplicate_threshold:
+                continue
+            score = mmr_lambda * (candidate.get("similarity") or 0.0) - (1 - mmr_lambda) * redundancy
+            if best_score is None or score > best_score:
+                best_index, best_score = index, score
+        if best_index is None:
+            # Everything left is a near-duplicate of something already selected
+            duplicates += len(remaining)
+            break
+        selected.append(remaining.pop(best_index))
+
+    for hit in selected:
+        hit.pop("_shingles", None)
+    return selected, duplicates
+
+
+def pack_context(
+    search_results: List[Dict[str, Any]],
+    token_budget: Optional[int] = None,
+    max_overlap: int = CHUNK_OVERLAP,
+) -> Tuple[str, List[Dict[str, Any]], Dict[str, int]]:
+    """
+    Build the prompt context from similarity search results.
+
+    Hits are diversified with MMR, then added in that order while the merged
+    context (adjacent chunks stitched, overlap removed) fits in the token budget.
+    Returns the context string, the sources that made it in and token stats.
+    """
+    token_budget = token_budget or RAG_CONTEXT_TOKEN_BUDGET
+    hits = [r for r in search_results if r.get("text_content")]
+    # Same separator as the packed context, so tokens_saved only counts what packing removed
+    naive_tokens = estimate_tokens(CONTEXT_SEPARATOR.join(r["text_content"] for r in hits))
+
+    ordered, duplicates = mmr_order(hits)
+    packed: List[Dict[str, Any]] = []
+    blocks: List[Dict[str, Any]] = []
+    over_budget = 0
+    for hit in ordered:
+        candidate_blocks = merge_adjacent(packed + [hit], max_overlap)
+        tokens = estimate_tokens(CONTEXT_SEPARATOR.join(b["text_content"] for b in candidate_blocks))
+        if tokens > token_budget:
+            over_budget += 1
+            continue
+        packed.append(hit)
+        blocks = candidate_blocks
+
+    context = CONTEXT_SEPARATOR.join(b["text_content"] for b in blocks)
+    context_tokens = estimate_tokens(context)
+    stats = {
+        "candidate_chunks": len(hits),
+        "packed_chunks": len(packed),
+        "merged_blocks": len(blocks),
+        "duplicates_dropped": duplicates,
+        "over_budget_dropped": over_budget,
+        "naive_tokens": naive_tokens,
+        "context_tokens": context_tokens,
+        "tokens_saved": naive_tokens - context_tokens,
+        "token_budget": token_budget,
+    }
+    return context, packed, stats
@@ -38,6 +38,19 @@ class ImageAnalysisRequest(BaseModel):
     file_name: str
     file_id: str
     user_id: str
+
+
+class BatchImageItem(BaseModel):
+    file: str
+    file_name: str
+    file_id: str
+
+
+class BatchImageAnalysisRequest(BaseModel):
+    user_id: str
+    images: List[BatchImageItem]
+
+
 class PDFAnalysisRequest(BaseModel):
     file_url: str
     file_id: str
@@ -55,3 +68,13 @@ class ImageAnalysis(BaseModel):
         description="Quality of OCR results on a scale of 1-10"
 )
 
+
+class PageTranscription(BaseModel):
+    """Text of a page, or a run of consecutive pages, of a PDF and where it came from."""
+    start_page: int = Field(description="1-based first page")
+    end_page: int = Field(description="1-based last page, inclusive")
+    text_content: str
+    source: Literal["text_layer", "ocr"]
+    confidence_level: Optional[str] = None
+    ocr_quality: Optional[int] = None
+    languages: Optional[List[str]] = None
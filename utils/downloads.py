@@ -0,0 +1,49 @@
+import hashlib
+import os
+import time
+from typing import Tuple
+
+import requests
+
+CHUNK_SIZE = 64 * 1024
+
+
+class DownloadTooLarge(Exception):
+    pass
+
+
+def download_to_file(url: str, dest_path: str, max_bytes: int, timeout: float) -> Tuple[str, int]:
+    """
+    Stream url to dest_path without holding the body in memory, enforcing a size
+    cap and an overall deadline. Returns (sha256 hex digest, size in bytes).
+    The file only appears at dest_path once the download is complete.
+    """
+    deadline = time.monotonic() + timeout
+    partial_path = f"{dest_path}.part"
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        # (connect, read) timeouts guard each socket operation; the deadline guards the whole transfer
+        with requests.get(url, stream=True, timeout=(10, timeout)) as response:
+            if response.status_code != 200:
+                raise Exception(f"Could not download file from provided URL (HTTP {response.status_code})")
+            declared = response.headers.get("Content-Length")
+            if declared and declared.isdigit() and int(declared) > max_bytes:
+                raise DownloadTooLarge(f"File is {int(declared)} bytes, larger than the {max_bytes} byte limit")
+
+            with open(partial_path, "wb") as out:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise DownloadTooLarge(f"File is larger than the {max_bytes} byte limit")
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"Download did not finish within {timeout} seconds")
+                    digest.update(chunk)
+                    out.write(chunk)
+        os.replace(partial_path, dest_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.unlink(partial_path)
+
+    return digest.hexdigest(), size
@@ -0,0 +1,95 @@
+"""
+Streaming downsampling of a time series for charts. Input arrives as
+time-ordered (timestamps, values) batches, e.g. straight from a database
+cursor; points are grouped into equal-width time buckets and reduced one
+bucket at a time, so memory is bounded by a batch plus a bucket or two, never
+the whole series.
+
+- lttb: Largest-Triangle-Three-Buckets, one representative point per bucket
+  that preserves the visual shape of the line
+- minmax: the lowest and highest point of each bucket, in time order, so
+  spikes are never dropped
+"""
+from typing import Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+Batch = Tuple[np.ndarray, np.ndarray]
+
+
+def iter_buckets(batches: Iterable[Batch], start: float, width: float) -> Iterator[Batch]:
+    """Regroup time-ordered batches into the points of each non-empty bucket, in order"""
+    carry_t, carry_v = np.empty(0), np.empty(0)
+    carry_bucket = None
+    for timestamps, values in batches:
+        if timestamps.size == 0:
+            continue
+        buckets = ((timestamps - start) / width).astype(np.int64)
+        splits = np.flatnonzero(np.diff(buckets)) + 1
+        groups_t, groups_v = np.split(timestamps, splits), np.split(values, splits)
+        group_buckets = buckets[np.concatenate(([0], splits))]
+        for bucket, group_t, group_v in zip(group_buckets, groups_t, groups_v):
+            if carry_bucket is not None and bucket == carry_bucket:
+                # The bucket was cut by the batch boundary
+                carry_t, carry_v = np.concatenate((carry_t, group_t)), np.concatenate((carry_v, group_v))
+                continue
+            if carry_bucket is not None:
+                yield carry_t, carry_v
+            carry_bucket, carry_t, carry_v = bucket, group_t, group_v
+    if carry_bucket is not None:
+        yield carry_t, carry_v
+
+
+def minmax(batches: Iterable[Batch], start: float, end: float, points: int) -> List[Tuple[float, float]]:
+    """Up to `points` points: the min and max of each of points // 2 buckets"""
+    width = max((end - start) / max(points // 2, 1), 1e-9)
+    output = []
+    for timestamps, values in iter_buckets(batches, start, width):
+        low, high = int(np.argmin(values)), int(np.argmax(values))
+        for i in sorted({low, high}):
+            output.append((float(timestamps[i]), float(values[i])))
+    return output
+
+
+def lttb(batches: Iterable[Batch], start: float, end: float, points: int) -> List[Tuple[float, float]]:
+    """
+    Up to `points` points: the first and last readings plus one per bucket,
+    chosen to form the largest triangle with the previously chosen point and
+    the average of the next bucket. Only the current and next bucket are held.
+    """
+    width = max((end - start) / max(points - 2, 1), 1e-9)
+    buckets = iter_buckets(batches, start, width)
+    current = next(buckets, None)
+    if current is None:
+        return []
+
+    first_t, first_v = float(current[0][0]), float(current[1][0])
+    output = [(first_t, first_v)]
+    current = (current[0][1:], current[1][1:])
+    selected_t, selected_v = first_t, first_v
+    last = None
+    for following in buckets:
+        if current[0].size:
+            # Times relative to the series start keep the area products well within float precision
+            selected_t, selected_v = _largest_triangle(
+                current, selected_t, selected_v, float(following[0].mean()), float(following[1].mean()), first_t
+            )
+            output.append((selected_t, selected_v))
+        current = following
+
+    # The final bucket is bounded by the last reading, which is always kept
+    if current[0].size:
+        last = (float(current[0][-1]), float(current[1][-1]))
+        middle = (current[0][:-1], current[1][:-1])
+        if middle[0].size:
+            output.append(_largest_triangle(middle, selected_t, selected_v, last[0], last[1], first_t))
+        output.append(last)
+    return output
+
+
+def _largest_triangle(bucket: Batch, a_t: float, a_v: float, c_t: float, c_v: float, origin: float) -> Tuple[float, float]:
+    timestamps, values = bucket
+    a_t, c_t = a_t - origin, c_t - origin
+    areas = np.abs((a_t - c_t) * (values - a_v) - (a_t - (timestamps - origin)) * (c_v - a_v))
+    i = int(np.argmax(areas))
+    return float(timestamps[i]), float(values[i])
@@ -1,9 +1,18 @@
-import cohere
 from typing import List
-import os
 
-co = cohere.ClientV2(api_key=os.getenv("COHERE_API_KEY"))
+from utils.clients import get_cohere_v2
+
+# Cohere accepts at most 96 texts per embed call
+EMBED_BATCH_SIZE = 96
 
 def generate_embedding(text: str) -> List[float]:
-    response = co.embed(texts=[text], model="embed-english-v3.0", input_type="search_document", embedding_types=['float'])
-    return response.embeddings.float[0]
\ No newline at end of file
+    response = get_cohere_v2().embed(texts=[text], model="embed-english-v3.0", input_type="search_document", embedding_types=['float'])
+    return response.embeddings.float[0]
+
+def generate_embeddings(texts: List[str]) -> List[List[float]]:
+    """Embed many texts with as few API calls as possible, preserving order"""
+    embeddings = []
+    for i in range(0, len(texts), EMBED_BATCH_SIZE):
+        response = get_cohere_v2().embed(texts=texts[i:i + EMBED_BATCH_SIZE], model="embed-english-v3.0", input_type="search_document", embedding_types=['float'])
+        embeddings.extend(response.embeddings.float)
+    return embeddings
@@ -3,9 +3,8 @@ from llm import open_ai, gemini, local
 from fastapi import HTTPException
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
-from config import OPENAI_API_KEY, GOOGLE_API_KEY, OPENAI_MODEL, GEMINI_MODEL
+from config import OPENAI_MODEL, GEMINI_MODEL
+from utils.clients import get_chat_model
 
 
 def format_response_with_llm(sql_query: str, query_results: str, llm_choice: str) -> str:
@@ -59,17 +58,9 @@ def format_rag_response(query: str, context: str, llm_choice: Literal["openai",
     """
 
     if llm_choice == "openai":
-        model = ChatOpenAI(
-            temperature=0.7,
-            model=OPENAI_MODEL,
-            api_key=OPENAI_API_KEY,
-        )
+        model = get_chat_model("openai", OPENAI_MODEL, temperature=0.7)
     elif llm_choice == "gemini":
-        model = ChatGoogleGenerativeAI(
-            model=GEMINI_MODEL,
-            temperature=0.7,
-            google_api_key=GOOGLE_API_KEY,
-        )
+        model = get_chat_model("gemini", GEMINI_MODEL, temperature=0.7)
     elif llm_choice == "local":
         raise NotImplementedError("Local LLM not implemented yet")
     else:
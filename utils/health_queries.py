@@ -1,23 +1,31 @@
+"""
+Report data, read from the per-user daily rollups (sql/005_daily_health_rollups.sql)
+rather than the raw consumed_foods and sensor_data rows, so each query touches
+one row per day (per food) in the window.
+"""
+import logging
 from typing import Dict, Any
 from datetime import datetime, timedelta
 from database import execute_sql_query
 from utils.custom_types import DBCredentials
+from config import SENSOR_UNATTRIBUTED_READINGS
+
+logger = logging.getLogger(__name__)
 
 def get_nutrition_summary(user_id: str, db_credentials: DBCredentials, days: int = 30) -> Dict[str, Any]:
     """Get nutrition summary for the last N days"""
     query = """
     SELECT 
-        dn.date,
-        dn.total_calories,
-        SUM(cf.protein) as total_protein,
-        SUM(cf.carbs) as total_carbs,
-        SUM(cf.fat) as total_fat
-    FROM daily_nutrition dn
-    LEFT JOIN consumed_foods cf ON cf.daily_nutrition_id = dn.id
-    WHERE dn.user_id = :user_id 
-    AND dn.date >= CURRENT_DATE - INTERVAL :days_interval
-    GROUP BY dn.date, dn.total_calories
-    ORDER BY dn.date DESC
+        day as date,
+        calories as total_calories,
+        protein as total_protein,
+        carbs as total_carbs,
+        fat as total_fat
+    FROM daily_health_rollups
+    WHERE user_id = :user_id 
+    AND nutrition_logged
+    AND day >= CURRENT_DATE - INTERVAL :days_interval
+    ORDER BY day DESC
     """
     
     params = {"user_id": user_id, "days_interval": f"{days} days"}
@@ -25,7 +33,29 @@ def get_nutrition_summary(user_id: str, db_credentials: DBCredentials, days: int
 
 def get_sensor_stats(user_id: str, db_credentials: DBCredentials, days: int = 30) -> Dict[str, Any]:
     """Get average sensor readings for the last N days"""
+    # Means are recombined from per-day sums and counts, so days with more readings weigh more
     query = """
+    SELECT 
+        SUM(hr_sum) / NULLIF(SUM(hr_count), 0) as avg_heart_rate,
+        SUM(temp_sum) / NULLIF(SUM(temp_count), 0) as avg_temperature,
+        SUM(humidity_sum) / NULLIF(SUM(humidity_count), 0) as avg_humidity,
+        MIN(hr_min) as min_heart_rate,
+        MAX(hr_max) as max_heart_rate,
+        MIN(temp_min) as min_temperature,
+        MAX(temp_max) as max_temperature
+    FROM daily_health_rollups
+    WHERE user_id = :user_id 
+    AND day >= CURRENT_DATE - INTERVAL :days_interval
+    """
+    
+    params = {"user_id": user_id, "days_interval": f"{days} days"}
+    stats = execute_sql_query(query, db_credentials, params)
+    if SENSOR_UNATTRIBUTED_READINGS != "shared" or (stats and any(value is not None for value in stats[0].values())):
+        return stats
+
+    # Single-device deployment with no rolled-up readings for this user: fall back to readings not yet
+    # attributed to anyone, which is what every report read before sensor_data had a user_id
+    legacy_query = """
     SELECT 
         AVG(beat_avg) as avg_heart_rate,
         AVG(temperature_c) as avg_temperature,
@@ -35,27 +65,32 @@ def get_sensor_stats(user_id: str, db_credentials: DBCredentials, days: int = 30
         MIN(temperature_c) as min_temperature,
         MAX(temperature_c) as max_temperature
     FROM sensor_data
-    WHERE created_at >= CURRENT_TIMESTAMP - INTERVAL :days_interval
+    WHERE user_id IS NULL
+    AND created_at >= CURRENT_DATE - INTERVAL :days_interval
     """
-    
-    params = {"days_interval": f"{days} days"}
-    return execute_sql_query(query, db_credentials, params)
+    legacy = execute_sql_query(legacy_query, db_credentials, {"days_interval": f"{days} days"})
+    if legacy and any(value is not None for value in legacy[0].values()):
+        logger.warning(
+            f"No rolled-up sensor data for user {user_id}; using unattributed readings. "
+            f"Run assign_sensor_owner() or send user_id with readings"
+        )
+        return legacy
+    return stats
 
 def get_food_consumption(user_id: str, db_credentials: DBCredentials, days: int = 30, limit: int = 10) -> Dict[str, Any]:
     """Get top consumed foods for the last N days"""
     query = """
     SELECT 
-        cf.food_name,
-        COUNT(*) as consumption_count,
-        AVG(cf.calories) as avg_calories,
-        AVG(cf.protein) as avg_protein,
-        AVG(cf.carbs) as avg_carbs,
-        AVG(cf.fat) as avg_fat
-    FROM consumed_foods cf
-    JOIN daily_nutrition dn ON cf.daily_nutrition_id = dn.id
-    WHERE dn.user_id = :user_id 
-    AND cf.consumed_at >= CURRENT_TIMESTAMP - INTERVAL :days_interval
-    GROUP BY cf.food_name
+        food_name,
+        SUM(servings) as consumption_count,
+        SUM(calories) / SUM(servings) as avg_calories,
+        SUM(protein) / SUM(servings) as avg_protein,
+        SUM(carbs) / SUM(servings) as avg_carbs,
+        SUM(fat) / SUM(servings) as avg_fat
+    FROM daily_food_rollups
+    WHERE user_id = :user_id 
+    AND day >= CURRENT_DATE - INTERVAL :days_interval
+    GROUP BY food_name
     ORDER BY consumption_count DESC
     LIMIT :limit
     """
@@ -66,29 +101,19 @@ def get_food_consumption(user_id: str, db_credentials: DBCredentials, days: int
 def get_nutrition_trends(user_id: str, db_credentials: DBCredentials, days: int = 30) -> Dict[str, Any]:
     """Get daily nutrition trends including averages and totals"""
     query = """
-    WITH daily_macros AS (
-        SELECT 
-            dn.date,
-            dn.total_calories,
-            SUM(cf.protein) as total_protein,
-            SUM(cf.carbs) as total_carbs,
-            SUM(cf.fat) as total_fat
-        FROM daily_nutrition dn
-        LEFT JOIN consumed_foods cf ON cf.daily_nutrition_id = dn.id
-        WHERE dn.user_id = :user_id 
-        AND dn.date >= CURRENT_DATE - INTERVAL :days_interval
-        GROUP BY dn.date, dn.total_calories
-    )
     SELECT 
-        AVG(total_calories) as avg_daily_calories,
-        AVG(total_protein) as avg_daily_protein,
-        AVG(total_carbs) as avg_daily_carbs,
-        AVG(total_fat) as avg_daily_fat,
-        MAX(total_calories) as max_daily_calories,
-        MIN(total_calories) as min_daily_calories,
+        AVG(calories) as avg_daily_calories,
+        AVG(protein) as avg_daily_protein,
+        AVG(carbs) as avg_daily_carbs,
+        AVG(fat) as avg_daily_fat,
+        MAX(calories) as max_daily_calories,
+        MIN(calories) as min_daily_calories,
         COUNT(*) as days_tracked
-    FROM daily_macros
+    FROM daily_health_rollups
+    WHERE user_id = :user_id 
+    AND nutrition_logged
+    AND day >= CURRENT_DATE - INTERVAL :days_interval
     """
     
     params = {"user_id": user_id, "days_interval": f"{days} days"}
-    return execute_sql_query(query, db_credentials, params) 
\ No newline at end of file
+    return execute_sql_query(query, db_credentials, params)
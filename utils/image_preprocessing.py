@@ -0,0 +1,129 @@
+"""
+Prepare uploaded images for OCR: decode once, apply the EXIF orientation,
+downscale to IMAGE_MAX_SIDE and re-encode as JPEG. Images that are already
+small, upright JPEGs are passed through untouched, reusing the caller's
+base64 so the bytes are never encoded twice.
+"""
+import base64
+import hashlib
+import io
+import logging
+import time
+from typing import BinaryIO, Optional, Union
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+from pydantic import BaseModel
+
+from config import IMAGE_MAX_SIDE, IMAGE_JPEG_QUALITY
+
+logger = logging.getLogger(__name__)
+
+EXIF_ORIENTATION = 0x0112
+
+
+class PreparedImage(BaseModel):
+    base64_data: str
+    mime_type: str
+    # sha256 of the bytes sent to the model; identical uploads prepare to identical bytes
+    sha256: str
+    width: int
+    height: int
+    original_bytes: int
+    prepared_bytes: int
+    original_width: int
+    original_height: int
+    reencoded: bool
+    elapsed_ms: float
+
+    @property
+    def data_url(self) -> str:
+        return f"data:{self.mime_type};base64,{self.base64_data}"
+
+    def stats(self) -> dict:
+        """Sizes and timing for logs and API responses (everything but the image itself)"""
+        return self.dict(exclude={"base64_data"})
+
+
+def prepare_image(
+    image: Union[bytes, BinaryIO],
+    original_base64: Optional[str] = None,
+    max_side: int = IMAGE_MAX_SIDE,
+    quality: int = IMAGE_JPEG_QUALITY,
+) -> PreparedImage:
+    """
+    Normalize an image for the OCR model. Accepts bytes or a seekable binary
+    file (e.g. a spooled upload), which is decoded without copying it into
+    memory first. Raises ValueError if it is not an image Pillow can decode.
+    """
+    started = time.perf_counter()
+    source = io.BytesIO(image) if isinstance(image, bytes) else image
+    source.seek(0, io.SEEK_END)
+    original_length = source.tell()
+    source.seek(0)
+    try:
+        image = Image.open(source)
+        original_size = image.size
+        original_format = image.format
+        orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+    except UnidentifiedImageError:
+        raise ValueError("Could not decode image: unsupported or corrupt image data")
+    except Image.DecompressionBombError as e:
+        # Neither an OSError nor a ValueError; too many pixels is a bad request like any other bad image
+        raise ValueError(f"Image is too large to decode: {e}")
+    except OSError as e:
+        raise ValueError(f"Could not decode image: {e}")
+
+    upright = orientation == 1
+    if original_format == "JPEG" and upright and max(original_size) <= max_side:
+        source.seek(0)
+        image_bytes = source.read()
+        prepared = PreparedImage(
+            base64_data=original_base64 or base64.b64encode(image_bytes).decode("utf-8"),
+            mime_type="image/jpeg",
+            sha256=hashlib.sha256(image_bytes).hexdigest(),
+            width=original_size[0],
+            height=original_size[1],
+            original_bytes=original_length,
+            prepared_bytes=original_length,
+            original_width=original_size[0],
+            original_height=original_size[1],
+            reencoded=False,
+            elapsed_ms=(time.perf_counter() - started) * 1000,
+        )
+        logger.info(f"Image passed through unchanged: {prepared.stats()}")
+        return prepared
+
+    try:
+        # Shrink before rotating so the rotation touches fewer pixels. On JPEGs, thumbnail
+        # also decodes straight to a reduced scale when the image is 2x+ too large.
+        image.thumbnail((max_side, max_side), Image.BICUBIC)
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "L"):
+            # Flatten transparency onto white, which is what a scanned page looks like
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.split()[-1])
+
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=quality, optimize=True)
+    except Image.DecompressionBombError as e:
+        raise ValueError(f"Image is too large to decode: {e}")
+    except OSError as e:
+        raise ValueError(f"Could not decode image: {e}")
+    encoded = output.getvalue()
+
+    prepared = PreparedImage(
+        base64_data=base64.b64encode(encoded).decode("utf-8"),
+        mime_type="image/jpeg",
+        sha256=hashlib.sha256(encoded).hexdigest(),
+        width=image.width,
+        height=image.height,
+        original_bytes=original_length,
+        prepared_bytes=len(encoded),
+        original_width=original_size[0],
+        original_height=original_size[1],
+        reencoded=True,
+        elapsed_ms=(time.perf_counter() - started) * 1000,
+    )
+    logger.info(f"Image prepared for OCR: {prepared.stats()}")
+    return prepared
@@ -0,0 +1,54 @@
+import hashlib
+from typing import List, Dict, Any
+
+
+def content_hash(text: str) -> str:
+    """Stable hash of a chunk's text, stored as embeddings.content_hash"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def plan_reindex(existing_rows: List[Dict[str, Any]], chunk_hashes: List[str]) -> Dict[str, Any]:
+    """
+    Work out what a re-upload has to write, given the file's current embeddings
+    rows (id, chunk_index, content_hash) and the hashes of the new chunks in order.
+
+    Returns:
+        unchanged: row ids already stored with the right text at the right index
+        moved: (row id, new chunk_index) for text that is stored under another index
+        to_embed: chunk indexes with no stored row, which need an embedding call
+        stale_ids: row ids whose text is no longer part of the file
+    """
+    remaining = {row["id"]: row for row in existing_rows if row.get("content_hash")}
+    stale_ids = [row["id"] for row in existing_rows if not row.get("content_hash")]
+
+    by_position = {(row["content_hash"], row["chunk_index"]): row_id for row_id, row in remaining.items()}
+    unchanged, unmatched = [], []
+    for index, chunk_hash in enumerate(chunk_hashes):
+        row_id = by_position.pop((chunk_hash, index), None)
+        if row_id is not None and row_id in remaining:
+            unchanged.append(row_id)
+            del remaining[row_id]
+        else:
+            unmatched.append(index)
+
+    # Text that moved: same hash, different position (e.g. a page inserted earlier in the file)
+    by_hash: Dict[str, List[Any]] = {}
+    for row_id, row in remaining.items():
+        by_hash.setdefault(row["content_hash"], []).append(row_id)
+    moved, to_embed = [], []
+    for index in unmatched:
+        candidates = by_hash.get(chunk_hashes[index])
+        if candidates:
+            row_id = candidates.pop()
+            moved.append((row_id, index))
+            del remaining[row_id]
+        else:
+            to_embed.append(index)
+
+    stale_ids.extend(remaining.keys())
+    return {
+        "unchanged": unchanged,
+        "moved": moved,
+        "to_embed": to_embed,
+        "stale_ids": stale_ids,
+    }
@@ -0,0 +1,384 @@
+"""
+Durable job queue backed by SQLite, and a thread pool that drains it.
+
+Jobs survive restarts: a worker holds a lease on the job it is running, renewed
+by a heartbeat while the job runs, and a job whose lease expires (the worker
+died) is handed to the next worker, which resumes from the last checkpoint the
+job saved. Every state write is fenced on the lease, so a worker that lost its
+job cannot overwrite the new owner's progress.
+"""
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from pydantic import BaseModel
+
+from config import JOB_QUEUE_PATH, JOB_LEASE_SECONDS, JOB_RETRY_BASE_SECONDS, JOB_RETRY_MAX_SECONDS
+from utils.clients import get_client
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+LEASE_EXPIRED_ERROR = "Lease expired on the final attempt"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    job_key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    checkpoint TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,
+    lease_expires_at REAL,
+    worker_id TEXT,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim_idx ON jobs (kind, status, available_at);
+CREATE INDEX IF NOT EXISTS jobs_key_idx ON jobs (kind, job_key);
+"""
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler for failures a retry cannot fix; the job is failed straight away"""
+
+
+class LeaseLostError(Exception):
+    """The job's lease expired and it was handed to another worker; the current run must stop"""
+
+
+class Job(BaseModel):
+    id: str
+    kind: str
+    job_key: str
+    payload: Dict[str, Any]
+    status: str
+    stage: Optional[str] = None
+    checkpoint: Dict[str, Any] = {}
+    attempts: int
+    max_attempts: int
+    last_error: Optional[str] = None
+    worker_id: Optional[str] = None
+
+
+def _row_to_job(row: sqlite3.Row) -> Job:
+    return Job(
+        id=row["id"],
+        kind=row["kind"],
+        job_key=row["job_key"],
+        payload=json.loads(row["payload"]),
+        status=row["status"],
+        stage=row["stage"],
+        checkpoint=json.loads(row["checkpoint"]) if row["checkpoint"] else {},
+        attempts=row["attempts"],
+        max_attempts=row["max_attempts"],
+        last_error=row["last_error"],
+        worker_id=row["worker_id"],
+    )
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter: base, 2*base, 4*base ... capped"""
+    delay = min(JOB_RETRY_MAX_SECONDS, JOB_RETRY_BASE_SECONDS * (2 ** max(0, attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+class JobQueue:
+    def __init__(self, path: str = JOB_QUEUE_PATH, lease_seconds: int = JOB_LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # One short-lived connection per call keeps the queue safe to use from any thread
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        try:
+            yield connection
+        finally:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            connection.close()
+
+    def enqueue(self, kind: str, job_key: str, payload: Dict[str, Any], max_attempts: int = 3) -> str:
+        """Queue a job, or return the id of the unfinished job already queued for this key"""
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            existing = connection.execute(
+                "SELECT id FROM jobs WHERE kind = ? AND job_key = ? AND status IN (?, ?)",
+                (kind, job_key, QUEUED, RUNNING),
+            ).fetchone()
+            if existing:
+                connection.execute("COMMIT")
+                return existing["id"]
+            job_id = str(uuid.uuid4())
+            connection.execute(
+                "INSERT INTO jobs (id, kind, job_key, payload, status, attempts, max_attempts, available_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?, ?)",
+                (job_id, kind, job_key, json.dumps(payload), QUEUED, max_attempts, now, now, now),
+            )
+            connection.execute("COMMIT")
+        return job_id
+
+    def requeue(self, job_id: str, max_attempts: Optional[int] = None) -> bool:
+        """Give a failed job a fresh set of attempts, keeping its checkpoint so it resumes where it stopped"""
+        now = time.time()
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET status = ?, attempts = 0, max_attempts = COALESCE(?, max_attempts), available_at = ?, "
+                "lease_expires_at = NULL, worker_id = NULL, updated_at = ? WHERE id = ? AND status = ?",
+                (QUEUED, max_attempts, now, now, job_id, FAILED),
+            )
+        return cursor.rowcount > 0
+
+    def expire_leases(self, kind: str) -> List[Job]:
+        """
+        Fail jobs whose lease expired on their final attempt: a job that keeps
+        taking its worker down with it must not be retried forever. Returns
+        them so the caller can report the failure.
+        """
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            rows = connection.execute(
+                "SELECT * FROM jobs WHERE kind = ? AND status = ? AND lease_expires_at < ? AND attempts >= max_attempts",
+                (kind, RUNNING, now),
+            ).fetchall()
+            for row in rows:
+                connection.execute(
+                    "UPDATE jobs SET status = ?, lease_expires_at = NULL, last_error = ?, updated_at = ? WHERE id = ?",
+                    (FAILED, LEASE_EXPIRED_ERROR, now, row["id"]),
+                )
+            connection.execute("COMMIT")
+        jobs = [_row_to_job(row) for row in rows]
+        for job in jobs:
+            job.status, job.last_error = FAILED, LEASE_EXPIRED_ERROR
+        return jobs
+
+    def claim(self, kind: str, worker_id: str) -> Optional[Job]:
+        """Lease the next runnable job: queued and due, or running with an expired lease"""
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            # Expired jobs on their final attempt are left to expire_leases()
+            row = connection.execute(
+                "SELECT * FROM jobs WHERE kind = ? AND ("
+                "(status = ? AND available_at <= ?) OR (status = ? AND lease_expires_at < ? AND attempts < max_attempts)"
+                ") ORDER BY available_at LIMIT 1",
+                (kind, QUEUED, now, RUNNING, now),
+            ).fetchone()
+            if row is None:
+                connection.execute("COMMIT")
+                return None
+            connection.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, worker_id = ?, lease_expires_at = ?, updated_at = ? "
+                "WHERE id = ?",
+                (RUNNING, worker_id, now + self.lease_seconds, now, row["id"]),
+            )
+            connection.execute("COMMIT")
+        job = _row_to_job(row)
+        job.status = RUNNING
+        job.attempts += 1
+        job.worker_id = worker_id
+        return job
+
+    def _update_leased(self, job: Job, assignments: str, params: tuple):
+        """Update a job only while `job.worker_id` still holds its lease; raises LeaseLostError otherwise"""
+        with self._connect() as connection:
+            cursor = connection.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ? AND worker_id = ? AND status = ?",
+                (*params, job.id, job.worker_id, RUNNING),
+            )
+        if cursor.rowcount == 0:
+            raise LeaseLostError(f"Job {job.id} is no longer leased to worker {job.worker_id}")
+
+    def heartbeat(self, job: Job):
+        """Extend the lease of a running job"""
+        now = time.time()
+        self._update_leased(job, "lease_expires_at = ?, updated_at = ?", (now + self.lease_seconds, now))
+
+    def checkpoint(self, job: Job, stage: str, state: Dict[str, Any]):
+        """Record a completed stage and the state needed to resume after it; also renews the lease"""
+        now = time.time()
+        self._update_leased(
+            job, "stage = ?, checkpoint = ?, lease_expires_at = ?, updated_at = ?",
+            (stage, json.dumps(state), now + self.lease_seconds, now),
+        )
+
+    def complete(self, job: Job):
+        now = time.time()
+        self._update_leased(
+            job, "status = ?, lease_expires_at = NULL, last_error = NULL, updated_at = ?", (COMPLETED, now)
+        )
+
+    def fail(self, job: Job, error: str, retry: bool = True) -> bool:
+        """Requeue the job with backoff, or mark it failed once attempts run out. Returns True if it will retry."""
+        now = time.time()
+        will_retry = retry and job.attempts < job.max_attempts
+        if will_retry:
+            self._update_leased(
+                job, "status = ?, available_at = ?, lease_expires_at = NULL, last_error = ?, updated_at = ?",
+                (QUEUED, now + retry_delay(job.attempts), error, now),
+            )
+        else:
+            self._update_leased(
+                job, "status = ?, lease_expires_at = NULL, last_error = ?, updated_at = ?", (FAILED, error, now)
+            )
+        return will_retry
+
+    def get(self, kind: str, job_key: str) -> Optional[Job]:
+        """Most recent job for a key"""
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT * FROM jobs WHERE kind = ? AND job_key = ? ORDER BY created_at DESC LIMIT 1",
+                (kind, job_key),
+            ).fetchone()
+        return _row_to_job(row) if row else None
+
+    def counts(self, kind: str, key_prefix: str = "") -> Dict[str, int]:
+        """Number of jobs per status for keys starting with key_prefix"""
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT status, COUNT(*) AS jobs FROM jobs WHERE kind = ? AND substr(job_key, 1, ?) = ? GROUP BY status",
+                (kind, len(key_prefix), key_prefix),
+            ).fetchall()
+        return {row["status"]: row["jobs"] for row in rows}
+
+
+def get_job_queue(path: str = JOB_QUEUE_PATH) -> JobQueue:
+    return get_client("job_queue", path, lambda: JobQueue(path))
+
+
+class WorkerPool:
+    """
+    Runs `handler(job, save_checkpoint)` for jobs of one kind on `concurrency`
+    threads. A handler that raises gets the job retried with backoff (unless it
+    raised PermanentJobError); `on_failure(job, error, will_retry)` lets the
+    caller mirror that elsewhere.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        kind: str,
+        handler: Callable[[Job, Callable[[str, Dict[str, Any]], None]], None],
+        concurrency: int = 2,
+        on_failure: Optional[Callable[[Job, Exception, bool], None]] = None,
+        poll_interval: float = 1.0,
+    ):
+        self.queue = queue
+        self.kind = kind
+        self.handler = handler
+        self.concurrency = concurrency
+        self.on_failure = on_failure
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.concurrency):
+            worker_id = f"{os.getpid()}-{self.kind}-{i}"
+            thread = threading.Thread(target=self._run, args=(worker_id,), name=worker_id, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {self.concurrency} {self.kind} workers")
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop claiming new jobs and wait for running ones; unfinished jobs resume after their lease expires"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _report_failure(self, job: Job, error: Exception, will_retry: bool):
+        if self.on_failure:
+            try:
+                self.on_failure(job, error, will_retry)
+            except Exception as callback_error:
+                logger.error(f"Failure callback for job {job.id} raised: {callback_error}")
+
+    def _run(self, worker_id: str):
+        while not self._stop.is_set():
+            try:
+                for expired in self.queue.expire_leases(self.kind):
+                    logger.error(f"{self.kind} job {expired.id} failed: {LEASE_EXPIRED_ERROR}")
+                    self._report_failure(expired, Exception(LEASE_EXPIRED_ERROR), False)
+            except Exception as e:
+                logger.error(f"Worker {worker_id} could not expire leases: {e}")
+            try:
+                job = self.queue.claim(self.kind, worker_id)
+            except Exception as e:
+                logger.error(f"Worker {worker_id} could not claim a job: {e}")
+                job = None
+            if job is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            self._execute(job)
+
+    def _heartbeat(self, job: Job, done: threading.Event):
+        # Renew well before expiry, so a long stage never loses its lease to another worker
+        while not done.wait(self.queue.lease_seconds / 3):
+            try:
+                self.queue.heartbeat(job)
+            except LeaseLostError:
+                logger.warning(f"{job.kind} job {job.id} lost its lease; its next checkpoint will stop it")
+                return
+            except Exception as e:
+                logger.warning(f"Heartbeat for {job.kind} job {job.id} failed: {e}")
+
+    def _execute(self, job: Job):
+        logger.info(f"Running {job.kind} job {job.id} (attempt {job.attempts}/{job.max_attempts}, stage {job.stage})")
+
+        def save_checkpoint(stage: str, state: Dict[str, Any]):
+            self.queue.checkpoint(job, stage, state)
+            job.stage, job.checkpoint = stage, state
+
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job, done), name=f"{job.id}-heartbeat", daemon=True)
+        heartbeat.start()
+        try:
+            try:
+                self.handler(job, save_checkpoint)
+            except LeaseLostError as e:
+                logger.warning(f"Abandoning {job.kind} job {job.id}: {e}")
+                return
+            except Exception as e:
+                logger.error(f"{job.kind} job {job.id} failed: {e}", exc_info=True)
+                try:
+                    will_retry = self.queue.fail(job, str(e), retry=not isinstance(e, PermanentJobError))
+                except LeaseLostError as lost:
+                    logger.warning(f"Not recording failure of {job.kind} job {job.id}: {lost}")
+                    return
+                self._report_failure(job, e, will_retry)
+                return
+            try:
+                self.queue.complete(job)
+            except LeaseLostError as e:
+                logger.warning(f"Not recording completion of {job.kind} job {job.id}: {e}")
+                return
+            logger.info(f"{job.kind} job {job.id} completed")
+        finally:
+            done.set()
+            heartbeat.join()
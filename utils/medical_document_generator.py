@@ -4,17 +4,14 @@ from typing import Dict, Any
 from datetime import datetime
 import random
 from faker import Faker
-from openai import OpenAI
 import traceback
-from config import OPENAI_MODEL, OPENAI_API_KEY
+from config import OPENAI_MODEL
+from utils.clients import get_openai
 from utils.medical_document_gen_prompts import INDIAN_HOSPITALS
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-# Configure OpenAI
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
-
 def generate_indian_name():
     """Generate a random Indian name"""
     first_names = [
@@ -59,7 +56,7 @@ async def generate_indian_details() -> Dict[str, Any]:
             }}
         }}"""
 
-        response = openai_client.chat.completions.create(
+        response = get_openai().chat.completions.create(
             model=OPENAI_MODEL,
             messages=[
                 {
@@ -136,7 +133,7 @@ async def generate_medical_content(doc_type: str, llm_choice: str = "openai") ->
         if not prompt:
             raise ValueError(f"Invalid document type: {doc_type}")
 
-        response = openai_client.chat.completions.create(
+        response = get_openai().chat.completions.create(
             model=OPENAI_MODEL,
             messages=[
                 {"role": "system", "content": """You are an experienced Indian medical professional. 
@@ -0,0 +1,133 @@
+"""
+Content-addressed cache of image OCR results. Entries are keyed by the sha256
+of the prepared image and hold the ImageAnalysis and the embedding of its
+text, so a repeated upload skips both the vision call and the embedding call.
+Storage is a local SQLite file capped at OCR_CACHE_MAX_BYTES, evicting the
+least recently used entries.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from config import OCR_CACHE_PATH, OCR_CACHE_MAX_BYTES
+from utils.clients import get_client
+from utils.custom_types import ImageAnalysis
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ocr_cache (
+    image_hash TEXT PRIMARY KEY,
+    analysis TEXT NOT NULL,
+    embedding BLOB NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ocr_cache_last_used_idx ON ocr_cache (last_used_at);
+"""
+
+
+class OCRCache:
+    def __init__(self, path: str = OCR_CACHE_PATH, max_bytes: int = OCR_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._metrics_lock = threading.Lock()
+        self._metrics = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        try:
+            yield connection
+        finally:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            connection.close()
+
+    def _count(self, metric: str, amount: int = 1):
+        with self._metrics_lock:
+            self._metrics[metric] += amount
+
+    def get(self, image_hash: str) -> Optional[Tuple[ImageAnalysis, List[float]]]:
+        """Cached (analysis, embedding) for an image hash, or None"""
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT analysis, embedding FROM ocr_cache WHERE image_hash = ?", (image_hash,)
+            ).fetchone()
+            if row is None:
+                self._count("misses")
+                return None
+            connection.execute(
+                "UPDATE ocr_cache SET hits = hits + 1, last_used_at = ? WHERE image_hash = ?",
+                (time.time(), image_hash),
+            )
+        self._count("hits")
+        embedding = np.frombuffer(row["embedding"], dtype=np.float32).tolist()
+        return ImageAnalysis.parse_raw(row["analysis"]), embedding
+
+    def put(self, image_hash: str, analysis: ImageAnalysis, embedding: List[float]):
+        analysis_json = analysis.json()
+        embedding_blob = np.asarray(embedding, dtype=np.float32).tobytes()
+        size = len(analysis_json.encode("utf-8")) + len(embedding_blob)
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "INSERT OR REPLACE INTO ocr_cache (image_hash, analysis, embedding, size_bytes, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (image_hash, analysis_json, embedding_blob, size, now, now),
+            )
+            evicted = self._evict(connection)
+            connection.execute("COMMIT")
+        self._count("stores")
+        if evicted:
+            self._count("evictions", evicted)
+            logger.info(f"Evicted {evicted} OCR cache entries to stay under {self.max_bytes} bytes")
+
+    def _evict(self, connection: sqlite3.Connection) -> int:
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        total = connection.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM ocr_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        evict = []
+        for row in connection.execute("SELECT image_hash, size_bytes FROM ocr_cache ORDER BY last_used_at"):
+            if total <= self.max_bytes:
+                break
+            evict.append(row["image_hash"])
+            total -= row["size_bytes"]
+        connection.executemany("DELETE FROM ocr_cache WHERE image_hash = ?", [(image_hash,) for image_hash in evict])
+        return len(evict)
+
+    def stats(self) -> Dict[str, float]:
+        """Hit metrics since process start, plus the current size of the cache"""
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT COUNT(*) AS entries, COALESCE(SUM(size_bytes), 0) AS size_bytes FROM ocr_cache"
+            ).fetchone()
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        lookups = metrics["hits"] + metrics["misses"]
+        return {
+            **metrics,
+            "hit_rate": metrics["hits"] / lookups if lookups else 0.0,
+            "entries": row["entries"],
+            "size_bytes": row["size_bytes"],
+            "max_bytes": self.max_bytes,
+        }
+
+
+def get_ocr_cache(path: str = OCR_CACHE_PATH) -> OCRCache:
+    return get_client("ocr_cache", path, lambda: OCRCache(path))
@@ -0,0 +1,78 @@
+"""
+Local text-layer extraction for PDFs. Digitally generated PDFs (including the
+ones /generate renders with pdfkit) carry their text, so only pages without a
+usable text layer need to go to OCR.
+"""
+import logging
+from itertools import groupby
+from typing import List, Optional, Tuple
+
+from pypdf import PdfReader, PdfWriter
+
+from config import PDF_TEXT_LAYER_MIN_CHARS
+
+logger = logging.getLogger(__name__)
+
+READABLE_PUNCTUATION = set(".,;:!?'\"()[]{}%/-+*=<>&@#$°µ")
+MIN_READABLE_RATIO = 0.8
+
+
+def text_layer_is_usable(text: str, min_chars: int = PDF_TEXT_LAYER_MIN_CHARS) -> bool:
+    """
+    A page's text layer is usable if it has enough characters and they are
+    mostly readable; broken font encodings come out as symbols or U+FFFD.
+    """
+    characters = "".join(text.split())
+    if len(characters) < min_chars:
+        return False
+    readable = sum(1 for c in characters if c.isalnum() or c in READABLE_PUNCTUATION)
+    return readable / len(characters) >= MIN_READABLE_RATIO
+
+
+def extract_text_layer(pdf_path: str) -> Optional[List[Tuple[int, Optional[str]]]]:
+    """
+    (page_number, text) for each page, with text None where the page needs OCR.
+    Returns None if the file cannot be read locally (encrypted, malformed).
+    """
+    try:
+        reader = PdfReader(pdf_path)
+        if reader.is_encrypted:
+            reader.decrypt("")
+        pages = []
+        for number, page in enumerate(reader.pages, start=1):
+            try:
+                text = page.extract_text() or ""
+            except Exception as e:
+                logger.warning(f"Could not extract text from page {number} of {pdf_path}: {e}")
+                text = ""
+            pages.append((number, text.strip() if text_layer_is_usable(text) else None))
+        return pages
+    except Exception as e:
+        logger.warning(f"Could not read text layer of {pdf_path}: {e}")
+        return None
+
+
+def page_runs(page_numbers: List[int]) -> List[List[int]]:
+    """Group page numbers into runs of consecutive pages: [1, 2, 5] -> [[1, 2], [5]]"""
+    runs = []
+    for _, group in groupby(enumerate(sorted(page_numbers)), key=lambda item: item[1] - item[0]):
+        runs.append([page for _, page in group])
+    return runs
+
+
+def page_ranges(page_numbers: List[int], max_pages: int) -> List[List[int]]:
+    """Runs of consecutive pages, each cut into ranges of at most max_pages"""
+    return [run[i:i + max_pages] for run in page_runs(page_numbers) for i in range(0, len(run), max_pages)]
+
+
+def write_pages(pdf_path: str, page_numbers: List[int], out_path: str) -> str:
+    """Write the given 1-based pages of pdf_path to a new PDF"""
+    reader = PdfReader(pdf_path)
+    if reader.is_encrypted:
+        reader.decrypt("")
+    writer = PdfWriter()
+    for number in page_numbers:
+        writer.add_page(reader.pages[number - 1])
+    with open(out_path, "wb") as out:
+        writer.write(out)
+    return out_path
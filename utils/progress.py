@@ -0,0 +1,95 @@
+"""
+In-process pub/sub for job progress. Worker threads publish events for a
+topic (e.g. a file_id); async subscribers, such as an SSE endpoint, receive
+them on their own event loop. Each topic keeps a short history so a client
+that connects mid-job, or just after it finished, still sees where it stands.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from utils.clients import get_client
+
+HISTORY_SIZE = 50
+SUBSCRIBER_QUEUE_SIZE = 200
+# How long a finished topic's history is kept for late subscribers
+RETENTION_SECONDS = 300
+TERMINAL_STAGES = {"completed", "failed"}
+
+
+def _deliver(queue: asyncio.Queue, event: Dict[str, Any]):
+    # Runs on the subscriber's loop; a subscriber that falls behind loses its oldest events, not the newest
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+class ProgressBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._history: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._finished_at: Dict[str, float] = {}
+        self._subscribers: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+
+    def publish(self, topic: str, stage: str, **details: Any):
+        """Publish an event from any thread"""
+        event = {"topic": topic, "stage": stage, "timestamp": time.time(), **details}
+        with self._lock:
+            self._expire()
+            self._history.setdefault(topic, deque(maxlen=HISTORY_SIZE)).append(event)
+            if stage in TERMINAL_STAGES:
+                self._finished_at[topic] = time.time()
+            else:
+                self._finished_at.pop(topic, None)
+            subscribers = list(self._subscribers.get(topic, []))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_deliver, queue, event)
+            except RuntimeError:
+                # The subscriber's loop has closed; it unsubscribes when its generator is cleaned up
+                pass
+
+    def history(self, topic: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._history.get(topic, []))
+
+    @contextmanager
+    def subscribe(self, topic: str) -> Iterator[Tuple[List[Dict[str, Any]], asyncio.Queue]]:
+        """
+        Register the calling event loop for a topic. Yields (history, queue):
+        the events so far, then a queue receiving every later one.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        subscriber = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._expire()
+            history = list(self._history.get(topic, []))
+            self._subscribers.setdefault(topic, []).append(subscriber)
+        try:
+            yield history, queue
+        finally:
+            with self._lock:
+                remaining = [s for s in self._subscribers.get(topic, []) if s is not subscriber]
+                if remaining:
+                    self._subscribers[topic] = remaining
+                else:
+                    self._subscribers.pop(topic, None)
+
+    def _expire(self):
+        """Forget finished topics nobody has looked at for RETENTION_SECONDS; caller holds the lock"""
+        cutoff = time.time() - RETENTION_SECONDS
+        for topic in [topic for topic, finished in self._finished_at.items() if finished < cutoff]:
+            if topic not in self._subscribers:
+                del self._finished_at[topic]
+                self._history.pop(topic, None)
+
+
+def get_progress_broker(name: str = "default") -> ProgressBroker:
+    return get_client("progress_broker", name, ProgressBroker)
+
+
+def is_terminal(event: Optional[Dict[str, Any]]) -> bool:
+    return bool(event) and event["stage"] in TERMINAL_STAGES
@@ -0,0 +1,96 @@
+import base64
+import json
+from typing import List, Dict, Any, Sequence, Union
+
+import numpy as np
+
+
+def quantize_int8(embedding: Sequence[float]):
+    """Symmetric per-vector int8 quantization. Returns (codes, scale)."""
+    vector = np.asarray(embedding, dtype=np.float32)
+    max_abs = float(np.abs(vector).max()) if vector.size else 0.0
+    scale = max_abs / 127.0 if max_abs else 1.0
+    codes = np.clip(np.rint(vector / scale), -127, 127).astype(np.int8)
+    return codes, scale
+
+
+def quantize_binary(embedding: Sequence[float]) -> np.ndarray:
+    """One sign bit per dimension, packed into bytes (1024 dims -> 128 bytes)"""
+    return np.packbits(np.asarray(embedding, dtype=np.float32) > 0)
+
+
+def encode_codes(codes: np.ndarray) -> str:
+    return base64.b64encode(codes.tobytes()).decode("ascii")
+
+
+def decode_int8(encoded: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(encoded), dtype=np.int8)
+
+
+def decode_binary(encoded: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(encoded), dtype=np.uint8)
+
+
+def quantized_columns(embedding: Sequence[float]) -> Dict[str, Any]:
+    """Compact representations stored alongside the float embedding in the embeddings table"""
+    int8_codes, scale = quantize_int8(embedding)
+    return {
+        "embedding_int8": encode_codes(int8_codes),
+        "embedding_int8_scale": scale,
+        "embedding_binary": encode_codes(quantize_binary(embedding)),
+    }
+
+
+def parse_embedding(value: Union[str, List[float]]) -> np.ndarray:
+    """pgvector columns come back from PostgREST as '[0.1,0.2,...]' strings"""
+    if isinstance(value, str):
+        value = json.loads(value)
+    return np.asarray(value, dtype=np.float32)
+
+
+# Popcount lookup for uint8 values, used for Hamming distance on packed bits
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def hamming_distances(query_bits: np.ndarray, code_matrix: np.ndarray) -> np.ndarray:
+    """Hamming distance between one packed query and a (n, bytes) matrix of packed codes"""
+    return _POPCOUNT[np.bitwise_xor(code_matrix, query_bits)].sum(axis=1, dtype=np.int32)
+
+
+def int8_scores(query_codes: np.ndarray, code_matrix: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    """Approximate dot products from int8 codes (query scale is constant, so omitted)"""
+    # float32 represents every int8 x int8 x 1024 partial sum exactly and goes through BLAS
+    return (code_matrix.astype(np.float32) @ query_codes.astype(np.float32)) * scales
+
+
+def top_candidates(
+    query_embedding: Sequence[float],
+    code_matrix: np.ndarray,
+    count: int,
+    mode: str = "binary",
+    scales: np.ndarray = None,
+) -> np.ndarray:
+    """Row indexes of the `count` best candidates according to the compact codes"""
+    count = min(count, len(code_matrix))
+    if count <= 0:
+        return np.array([], dtype=np.int64)
+
+    if mode == "binary":
+        # Lower distance is better
+        keys = hamming_distances(quantize_binary(query_embedding), code_matrix)
+    elif mode == "int8":
+        query_codes, _ = quantize_int8(query_embedding)
+        keys = -int8_scores(query_codes, code_matrix, scales)
+    else:
+        raise ValueError(f"Invalid quantization mode: {mode}")
+
+    candidates = np.argpartition(keys, count - 1)[:count]
+    return candidates[np.argsort(keys[candidates], kind="stable")]
+
+
+def rescore(query_embedding: Sequence[float], vectors: np.ndarray) -> np.ndarray:
+    """Full precision cosine similarity between the query and each candidate vector"""
+    query = np.asarray(query_embedding, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+    norms[norms == 0] = 1.0
+    return (vectors @ query) / norms
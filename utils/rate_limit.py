@@ -0,0 +1,39 @@
+"""
+Token-bucket rate limiting for outbound API calls, shared by every thread in
+the process. Limits are per process: with several worker processes, give
+each its share of the provider's limit.
+"""
+import threading
+import time
+
+from utils.clients import get_client
+
+
+class RateLimiter:
+    """At most `per_minute` calls per minute, allowing bursts of up to `burst` calls"""
+
+    def __init__(self, per_minute: float, burst: int = 0):
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst or max(1, int(per_minute // 6)))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Block until a call is allowed; returns the seconds spent waiting"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def get_rate_limiter(name: str, per_minute: float) -> RateLimiter:
+    return get_client("rate_limiter", (name, per_minute), lambda: RateLimiter(per_minute))
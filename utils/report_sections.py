@@ -0,0 +1,213 @@
+"""
+Health report sections. Each section is written by its own LLM call from only
+the report data it needs, and the result is cached in report_section_cache
+under a hash of those inputs, so a report regenerates just the sections whose
+data changed since the last one.
+"""
+import hashlib
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from config import OPENAI_MODEL, GEMINI_MODEL
+from utils.clients import get_supabase
+
+logger = logging.getLogger(__name__)
+
+# Bump when section prompts change, so cached sections written by the old prompts are not reused
+SECTION_PROMPT_VERSION = 2
+
+INPUT_LABELS = {
+    "medications": "Current Medications and Prescriptions",
+    "conditions": "Chronic Conditions and Health Issues",
+    "medical_history": "Recent Medical History",
+    "physical_activity": "Physical Activity and Fitness (from uploaded documents)",
+    "sensor_stats": "Sensor Data Statistics (Last 30 Days)",
+    "sensor_analytics": "Sensor Analytics (percentiles, 7-day means and weekly trend, resting heart rate, day/night split, anomalous heart rate episodes)",
+    "nutrition_summary": "Daily Nutrition Summary",
+    "food_consumption": "Food Consumption Patterns",
+    "nutrition_trends": "Overall Nutrition Trends",
+}
+
+
+class ReportSection(BaseModel):
+    key: str
+    title: str
+    # Report data the section is written from; its cache key covers exactly these
+    inputs: List[str]
+    outline: List[str]
+
+
+REPORT_SECTIONS = [
+    ReportSection(
+        key="executive_summary",
+        title="Executive Summary",
+        inputs=list(INPUT_LABELS),
+        outline=[
+            "Brief overview of overall health status",
+            "Key metrics and important findings",
+            "Any immediate concerns or improvements",
+        ],
+    ),
+    ReportSection(
+        key="medical_overview",
+        title="Medical Overview",
+        inputs=["medications", "conditions", "medical_history"],
+        outline=[
+            "Current Medications and Treatments",
+            "Recent Medical History",
+            "Important Health Records",
+            "Ongoing Medical Conditions (if any)",
+        ],
+    ),
+    ReportSection(
+        key="vital_signs",
+        title="Vital Signs Analysis",
+        inputs=["sensor_stats", "sensor_analytics"],
+        outline=[
+            "Heart Rate Trends (min, max, average, percentiles, weekly trend)",
+            "Resting Heart Rate",
+            "Day vs Night Patterns",
+            "Anomalous Heart Rate Episodes (if any)",
+            "Temperature Patterns",
+            "Other Sensor Measurements",
+            "Comparison with Normal Ranges",
+        ],
+    ),
+    ReportSection(
+        key="nutrition",
+        title="Nutrition and Diet Assessment",
+        inputs=["nutrition_summary", "food_consumption", "nutrition_trends"],
+        outline=[
+            "Caloric Intake Analysis",
+            "Macronutrient Distribution (proteins, carbs, fats)",
+            "Most Frequent Food Choices",
+            "Dietary Patterns and Trends",
+            "Areas for Nutritional Improvement",
+        ],
+    ),
+    ReportSection(
+        key="physical_activity",
+        title="Physical Activity and Fitness",
+        inputs=["physical_activity"],
+        outline=[
+            "Activity Level Assessment",
+            "Exercise Patterns",
+            "Progress and Trends",
+            "Movement and Activity Recommendations",
+        ],
+    ),
+    ReportSection(
+        key="recommendations",
+        title="Recommendations and Action Items",
+        inputs=list(INPUT_LABELS),
+        outline=[
+            "Medical Follow-ups (if needed)",
+            "Dietary Adjustments",
+            "Fitness Goals",
+            "Lifestyle Modifications",
+            "Preventive Health Measures",
+        ],
+    ),
+]
+
+PENDING_SECTION_TEXT = "_This section is still being generated._"
+
+SECTION_PROMPT = """
+You are writing one section of a comprehensive markdown health report: "{title}".
+Medical information and physical activity are raw excerpts from the user's uploaded medical documents; extract the relevant facts from them.
+
+Data:
+{data}
+
+Cover:
+{outline}
+
+Guidelines:
+1. Make it professional but easy to understand
+2. Use markdown formatting (lists, bold for important points, ### subheadings)
+3. Include specific numbers and trends where relevant
+4. Highlight any concerning patterns or notable improvements
+5. Provide actionable recommendations based on the data
+6. Use tables or bullet points for better readability
+7. Add context to numbers (e.g., "heart rate of 75 bpm is within normal range")
+
+The other sections of the report are: {other_sections}. Stay within this section's scope to avoid redundancy.
+Write only the body of this section: do not add a "{title}" heading or any text before or after the section.
+"""
+
+
+def section_hash(section: ReportSection, report_data: Dict[str, Any], llm_choice: str) -> str:
+    """Hash of everything that determines a section's text: its inputs, the prompt version and the model"""
+    model = OPENAI_MODEL if llm_choice == "openai" else GEMINI_MODEL
+    payload = {
+        "version": SECTION_PROMPT_VERSION,
+        "section": section.key,
+        "llm_choice": llm_choice,
+        "model": model,
+        "inputs": {name: report_data[name] for name in section.inputs},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def report_fingerprint(report_data: Dict[str, Any], llm_choice: str) -> str:
+    """Hash of every section hash: equal fingerprints mean a new report would have the same text"""
+    hashes = [section_hash(section, report_data, llm_choice) for section in REPORT_SECTIONS]
+    return hashlib.sha256("".join(hashes).encode("utf-8")).hexdigest()
+
+
+def build_section_prompt(section: ReportSection, report_data: Dict[str, Any]) -> str:
+    data = "\n".join(f"- {INPUT_LABELS[name]}: {report_data[name]}" for name in section.inputs)
+    outline = "\n".join(f"- {item}" for item in section.outline)
+    other_sections = ", ".join(other.title for other in REPORT_SECTIONS if other.key != section.key)
+    return SECTION_PROMPT.format(title=section.title, data=data, outline=outline, other_sections=other_sections)
+
+
+def stitch_report(contents: Dict[str, str], placeholder: Optional[str] = None) -> str:
+    """
+    Assemble section bodies into the report, in REPORT_SECTIONS order. Missing
+    sections are left out, or shown as placeholder if one is given.
+    """
+    parts = ["# Health Report"]
+    for number, section in enumerate(REPORT_SECTIONS, start=1):
+        body = contents.get(section.key, placeholder)
+        if body is not None:
+            parts.append(f"## {number}. {section.title}\n\n{body.strip()}")
+    return "\n\n".join(parts) + "\n"
+
+
+def get_cached_sections(user_id: str, hashes: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+    """Cached rows for the given {section key: input hash}, by section key, in one query"""
+    rows = get_supabase().table("report_section_cache") \
+        .select("section, input_hash, content, prompt_tokens, completion_tokens, hits") \
+        .eq("user_id", user_id).in_("input_hash", list(hashes.values())).execute().data
+    cached = {row["section"]: row for row in rows if hashes.get(row["section"]) == row["input_hash"]}
+    if cached:
+        now = datetime.utcnow().isoformat()
+        for row in cached.values():
+            get_supabase().table("report_section_cache") \
+                .update({"hits": row["hits"] + 1, "last_used_at": now}) \
+                .eq("user_id", user_id).eq("section", row["section"]).eq("input_hash", row["input_hash"]).execute()
+    return cached
+
+
+def cache_section(user_id: str, section_key: str, input_hash: str, content: str, usage: Dict[str, int]):
+    """Store a generated section; older versions of the section for this user are dropped"""
+    now = datetime.utcnow().isoformat()
+    supabase = get_supabase()
+    supabase.table("report_section_cache").upsert({
+        "user_id": user_id,
+        "section": section_key,
+        "input_hash": input_hash,
+        "content": content,
+        "prompt_tokens": usage.get("prompt_tokens", 0),
+        "completion_tokens": usage.get("completion_tokens", 0),
+        "hits": 0,
+        "created_at": now,
+        "last_used_at": now,
+    }).execute()
+    supabase.table("report_section_cache").delete() \
+        .eq("user_id", user_id).eq("section", section_key).neq("input_hash", input_hash).execute()
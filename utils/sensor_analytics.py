@@ -0,0 +1,271 @@
+"""
+Vectorized analytics over a user's raw sensor readings for the health report:
+distribution percentiles, rolling and daily means with a weekly trend, a
+resting heart rate estimate, a day/night split and windows of anomalous heart
+rate. The series is fetched once into NumPy arrays and every feature is
+computed with array operations, so months of readings take milliseconds.
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import text
+
+from config import (
+    SENSOR_ANALYTICS_DAYS, SENSOR_UTC_OFFSET_HOURS, SENSOR_NIGHT_START_HOUR, SENSOR_NIGHT_END_HOUR, SENSOR_ANOMALY_Z
+)
+from database import get_engine
+from utils.custom_types import DBCredentials
+
+logger = logging.getLogger(__name__)
+
+METRICS = {"heart_rate": "beat_avg", "temperature": "temperature_c", "humidity": "humidity"}
+FETCH_BATCH_ROWS = 50_000
+DAY_SECONDS = 86_400
+MINUTES_PER_DAY = 1440
+# Resting HR: a low percentile of each day's 10-minute rolling mean, so single low readings don't count
+RESTING_WINDOW_MINUTES = 10
+RESTING_QUANTILE = 0.05
+RESTING_MIN_MINUTES = 60
+# Anomalies are judged on a 5-minute rolling mean; flagged minutes closer than this form one window
+ANOMALY_WINDOW_MINUTES = 5
+ANOMALY_MAX_GAP_SECONDS = 900
+MAX_ANOMALY_WINDOWS = 5
+
+
+def fetch_sensor_series(user_id: str, db_credentials: DBCredentials, days: int = SENSOR_ANALYTICS_DAYS) -> Dict[str, np.ndarray]:
+    """
+    A user's readings for the last N days as float64 arrays ordered by time:
+    timestamps (epoch seconds) and one array per metric, NaN where missing.
+    Rows are streamed from the server in batches rather than loaded as a whole.
+    The window starts at midnight, like the daily rollups, so the result only
+    changes when readings do and the report section cache stays valid all day.
+    """
+    query = """
+    SELECT
+        EXTRACT(EPOCH FROM created_at)::float8,
+        COALESCE(beat_avg::float8, 'NaN'),
+        COALESCE(temperature_c::float8, 'NaN'),
+        COALESCE(humidity::float8, 'NaN')
+    FROM sensor_data
+    WHERE user_id = :user_id
+    AND created_at >= CURRENT_DATE - INTERVAL :days_interval
+    ORDER BY created_at
+    """
+    params = {"user_id": user_id, "days_interval": f"{days} days"}
+    chunks = []
+    with get_engine(db_credentials).connect() as connection:
+        result = connection.execution_options(stream_results=True).execute(text(query), params)
+        for partition in result.partitions(FETCH_BATCH_ROWS):
+            chunks.append(np.array(partition, dtype=np.float64))
+    data = np.concatenate(chunks) if chunks else np.empty((0, 4))
+    return {"timestamps": data[:, 0], **{name: data[:, i + 1] for i, name in enumerate(METRICS)}}
+
+
+def stream_sensor_series(
+    user_id: str,
+    db_credentials: DBCredentials,
+    metric: str,
+    start: datetime,
+    end: datetime,
+    batch_rows: int = FETCH_BATCH_ROWS
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    One metric of a user's readings between start and end, as time-ordered
+    (timestamps, values) batches of at most batch_rows from a server-side
+    cursor. Readings without a value for the metric are skipped.
+    """
+    column = METRICS[metric]
+    query = f"""
+    SELECT EXTRACT(EPOCH FROM created_at)::float8, {column}::float8
+    FROM sensor_data
+    WHERE user_id = :user_id
+    AND created_at >= :start AND created_at < :end
+    AND {column} IS NOT NULL
+    ORDER BY created_at
+    """
+    params = {"user_id": user_id, "start": start, "end": end}
+    with get_engine(db_credentials).connect() as connection:
+        result = connection.execution_options(stream_results=True).execute(text(query), params)
+        for partition in result.partitions(batch_rows):
+            data = np.array(partition, dtype=np.float64)
+            yield data[:, 0], data[:, 1]
+
+
+def minute_totals(minute_index: np.ndarray, values: np.ndarray, minutes: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Sum and count of the valid readings in each minute"""
+    valid = ~np.isnan(values)
+    sums = np.bincount(minute_index[valid], weights=values[valid], minlength=minutes)
+    counts = np.bincount(minute_index[valid], minlength=minutes).astype(np.float64)
+    return sums, counts
+
+
+def rolling_mean(sums: np.ndarray, counts: np.ndarray, window_minutes: int) -> np.ndarray:
+    """Mean of the readings in the trailing window ending at each minute, NaN where it has none"""
+    summed = np.concatenate(([0.0], np.cumsum(sums)))
+    counted = np.concatenate(([0.0], np.cumsum(counts)))
+    end = np.arange(1, sums.size + 1)
+    start = np.maximum(end - window_minutes, 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (summed[end] - summed[start]) / (counted[end] - counted[start])
+
+
+def anomaly_windows(minute_times: np.ndarray, smoothed: np.ndarray, threshold: float) -> Tuple[list, int]:
+    """
+    Windows where the rolling mean is more than `threshold` robust z-scores
+    (median / MAD) from the user's own baseline. Returns the longest windows
+    and the total number found.
+    """
+    valid = ~np.isnan(smoothed)
+    if valid.sum() < 2:
+        return [], 0
+    median = np.median(smoothed[valid])
+    mad = np.median(np.abs(smoothed[valid] - median)) * 1.4826
+    if mad == 0:
+        return [], 0
+    z = (smoothed - median) / mad
+    flagged = np.flatnonzero(np.abs(np.nan_to_num(z)) >= threshold)
+    if flagged.size == 0:
+        return [], 0
+
+    # A new window starts wherever flagged minutes are further apart than the gap
+    breaks = np.flatnonzero(np.diff(minute_times[flagged]) > ANOMALY_MAX_GAP_SECONDS) + 1
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks, [flagged.size])) - 1
+    durations = minute_times[flagged[ends]] - minute_times[flagged[starts]] + 60
+
+    windows = []
+    for w in np.argsort(-durations, kind="stable")[:MAX_ANOMALY_WINDOWS]:
+        members = flagged[starts[w]:ends[w] + 1]
+        peak = members[np.argmax(np.abs(z[members]))]
+        windows.append({
+            "start": _iso(minute_times[members[0]]),
+            "end": _iso(minute_times[members[-1]] + 60),
+            "minutes": int(durations[w] // 60),
+            "direction": "high" if z[peak] > 0 else "low",
+            "peak_value": _round(smoothed[peak]),
+            "peak_z": _round(z[peak]),
+        })
+    return windows, int(starts.size)
+
+
+def compute_sensor_analytics(
+    series: Dict[str, np.ndarray],
+    utc_offset_hours: float = SENSOR_UTC_OFFSET_HOURS,
+    night_start_hour: int = SENSOR_NIGHT_START_HOUR,
+    night_end_hour: int = SENSOR_NIGHT_END_HOUR,
+    anomaly_z: float = SENSOR_ANOMALY_Z,
+) -> Dict[str, Any]:
+    """
+    Report features from the arrays returned by fetch_sensor_series;
+    JSON-serializable, None where undefined. Distribution statistics use every
+    reading. Windowed features (rolling, daily, resting, day/night, anomalies)
+    run on per-minute sums and counts laid out as a days x 1440 grid of local
+    time, so their cost does not grow with the sampling rate.
+    """
+    timestamps = series["timestamps"]
+    if timestamps.size == 0:
+        return {"readings": 0}
+
+    offset = utc_offset_hours * 3600
+    first_minute = int((timestamps[0] + offset) // DAY_SECONDS) * MINUTES_PER_DAY
+    # Truncating a non-negative offset is much cheaper than a float floor division over every reading
+    minute_index = ((timestamps - (first_minute * 60 - offset)) * (1 / 60)).astype(np.int64)
+    days = int(minute_index[-1] // MINUTES_PER_DAY) + 1
+    minutes = days * MINUTES_PER_DAY
+    # UTC epoch seconds at the start of each minute of the grid
+    minute_times = (first_minute + np.arange(minutes)) * 60.0 - offset
+    hour = np.tile(np.arange(MINUTES_PER_DAY) // 60, days)
+    if night_start_hour > night_end_hour:
+        night = (hour >= night_start_hour) | (hour < night_end_hour)
+    else:
+        night = (hour >= night_start_hour) & (hour < night_end_hour)
+
+    totals = {name: minute_totals(minute_index, series[name], minutes) for name in METRICS}
+    readings_per_minute = np.bincount(minute_index, minlength=minutes)
+    analytics: Dict[str, Any] = {
+        "readings": int(timestamps.size),
+        "period_start": _iso(timestamps[0]),
+        "period_end": _iso(timestamps[-1]),
+        "days_with_data": int((readings_per_minute.reshape(days, MINUTES_PER_DAY).sum(axis=1) > 0).sum()),
+    }
+
+    for name in METRICS:
+        values = series[name]
+        values = values[~np.isnan(values)]
+        if not values.size:
+            analytics[name] = None
+            continue
+        sums, counts = totals[name]
+        p5, p25, p50, p75, p95 = np.percentile(values, [5, 25, 50, 75, 95])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            per_day = sums.reshape(days, MINUTES_PER_DAY).sum(axis=1) / counts.reshape(days, MINUTES_PER_DAY).sum(axis=1)
+        tracked = ~np.isnan(per_day)
+        stats = {
+            "count": int(values.size),
+            "mean": _round(values.mean()),
+            "std": _round(values.std()),
+            "min": _round(values.min()),
+            "p5": _round(p5), "p25": _round(p25), "median": _round(p50), "p75": _round(p75), "p95": _round(p95),
+            "max": _round(values.max()),
+            # Rolling 7-day means at the start and end of the period, and the least-squares trend of daily means
+            "first_7d_mean": _mean(per_day[:7]),
+            "last_7d_mean": _mean(per_day[-7:]),
+            "trend_per_week": None,
+            "peak_hourly_mean": _round(np.nanmax(rolling_mean(sums, counts, 60))),
+        }
+        if tracked.sum() >= 3:
+            slope = np.polyfit(np.flatnonzero(tracked), per_day[tracked], 1)[0]
+            stats["trend_per_week"] = _round(slope * 7)
+        analytics[name] = stats
+
+    # Resting HR: per day, a low quantile of the minutes' rolling means, for days with enough data
+    resting_means = rolling_mean(*totals["heart_rate"], RESTING_WINDOW_MINUTES).reshape(days, MINUTES_PER_DAY)
+    minutes_with_data = (~np.isnan(resting_means)).sum(axis=1)
+    enough = minutes_with_data >= RESTING_MIN_MINUTES
+    # Sorting each day puts NaNs last, so the quantile's rank only counts minutes with data
+    ranks = np.floor(RESTING_QUANTILE * (minutes_with_data[enough] - 1)).astype(np.int64)
+    resting = np.sort(resting_means[enough], axis=1)[np.arange(ranks.size), ranks]
+    analytics["resting_heart_rate"] = {
+        "estimate": _round(np.median(resting)) if resting.size else None,
+        "latest_day": _round(resting[-1]) if resting.size else None,
+        "days": int(resting.size),
+    }
+
+    analytics["day_night"] = {
+        label: {
+            "readings": int(readings_per_minute[mask].sum()),
+            **{f"{name}_mean": _ratio(totals[name][0][mask].sum(), totals[name][1][mask].sum()) for name in METRICS},
+        }
+        for label, mask in (("day", ~night), ("night", night))
+    }
+    analytics["day_night"]["hours"] = f"night is {night_start_hour:02d}:00-{night_end_hour:02d}:00, UTC{utc_offset_hours:+g}"
+
+    smoothed = rolling_mean(*totals["heart_rate"], ANOMALY_WINDOW_MINUTES)
+    windows, total = anomaly_windows(minute_times, smoothed, anomaly_z)
+    analytics["heart_rate_anomalies"] = {"threshold_z": anomaly_z, "total_windows": total, "longest_windows": windows}
+    return analytics
+
+
+def get_sensor_analytics(user_id: str, db_credentials: DBCredentials, days: int = SENSOR_ANALYTICS_DAYS) -> Dict[str, Any]:
+    series = fetch_sensor_series(user_id, db_credentials, days)
+    return compute_sensor_analytics(series)
+
+
+def _round(value: float, digits: int = 2) -> Optional[float]:
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
+
+def _mean(values: np.ndarray) -> Optional[float]:
+    valid = values[~np.isnan(values)]
+    return _round(valid.mean()) if valid.size else None
+
+
+def _ratio(total: float, count: float) -> Optional[float]:
+    return _round(total / count) if count else None
+
+
+def _iso(timestamp: float) -> str:
+    return datetime.fromtimestamp(float(timestamp), tz=timezone.utc).isoformat(timespec="minutes")
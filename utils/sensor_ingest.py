@@ -0,0 +1,196 @@
+"""
+Bulk ingestion of device readings into sensor_data. Readings arrive as NDJSON
+lines or as one columnar JSON object, are validated a batch at a time with
+column-wise (pandas/NumPy) checks, and each batch is written with a single
+COPY on a pooled connection. A batch commits together with a row in
+sensor_ingest_batches, so a client retrying an upload under the same batch id
+never writes a batch twice.
+"""
+import io
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from database import get_engine
+from utils.custom_types import DBCredentials
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ["created_at", "beat_avg", "temperature_c", "humidity"]
+VALUE_RANGES = {"beat_avg": (20, 250), "temperature_c": (25, 45), "humidity": (0, 100)}
+# Device clocks drift; readings further in the future than this are rejected
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+# Anything earlier is a bad value (a boolean, a small number, an unset device clock), not a reading
+MIN_CREATED_AT = pd.Timestamp("2000-01-01", tz="UTC")
+MAX_EPOCH_SECONDS = 1e11
+MAX_REPORTED_ERRORS = 20
+
+
+def frame_from_ndjson(lines: List[bytes]) -> Tuple[pd.DataFrame, List[Dict[str, Any]]]:
+    """Readings from NDJSON lines (blank lines skipped); lines that are not JSON objects are returned as errors"""
+    lines = [line for line in lines if line.strip()]
+    try:
+        # One parse for the whole batch; fall back to line by line only to locate bad lines
+        records = json.loads(b"[" + b",".join(lines) + b"]")
+        errors = []
+    except ValueError:
+        records, errors = [], []
+        for index, line in enumerate(lines):
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                records.append(None)
+                errors.append({"index": index, "error": "invalid JSON"})
+    for index, record in enumerate(records):
+        if record is not None and not isinstance(record, dict):
+            records[index] = None
+            errors.append({"index": index, "error": "not a JSON object"})
+    frame = pd.DataFrame.from_records([record or {} for record in records], columns=COLUMNS)
+    frame["_parsed"] = [record is not None for record in records]
+    return frame, errors
+
+
+def frame_from_columns(payload: Dict[str, Any]) -> pd.DataFrame:
+    """Readings from {"created_at": [...], "beat_avg": [...], ...}; missing metric columns are null"""
+    if not isinstance(payload, dict) or not isinstance(payload.get("created_at"), list):
+        raise ValueError("Columnar payload needs a created_at list")
+    length = len(payload["created_at"])
+    columns = {}
+    for column in COLUMNS:
+        values = payload.get(column)
+        if values is None:
+            values = [None] * length
+        if not isinstance(values, list) or len(values) != length:
+            raise ValueError(f"{column} must be a list as long as created_at ({length})")
+        columns[column] = values
+    frame = pd.DataFrame(columns, columns=COLUMNS)
+    frame["_parsed"] = True
+    return frame
+
+
+def parse_timestamps(values: pd.Series) -> pd.Series:
+    """ISO 8601 strings or epoch seconds to UTC timestamps; NaT where neither"""
+    numeric = pd.to_numeric(values, errors="coerce")
+    # Huge epochs overflow to_datetime instead of coercing; anything past year 5138 is not a reading anyway
+    from_epoch = pd.to_datetime(numeric.where(numeric.abs() < MAX_EPOCH_SECONDS), unit="s", utc=True, errors="coerce")
+    text = values.where(numeric.isna() & values.notna())
+    from_text = pd.to_datetime(text, utc=True, errors="coerce", format="ISO8601")
+    return from_epoch.fillna(from_text)
+
+
+def validate_readings(frame: pd.DataFrame, now: Optional[datetime] = None) -> Tuple[pd.DataFrame, int, List[Dict[str, Any]]]:
+    """
+    Check every reading with column-wise masks. Returns the valid readings
+    (created_at as UTC timestamps, metrics as floats), the number rejected and
+    the first rejections with their index in the batch and a reason.
+    """
+    now = now or datetime.now(timezone.utc)
+    created_at = parse_timestamps(frame["created_at"])
+    metrics = {column: pd.to_numeric(frame[column], errors="coerce") for column in VALUE_RANGES}
+
+    # Checked in order; a reading is reported with the first reason that applies
+    checks = [("invalid JSON", ~frame["_parsed"].to_numpy(dtype=bool))]
+    checks.append(("created_at missing or not ISO 8601 / epoch seconds", created_at.isna().to_numpy()))
+    checks.append(("created_at is in the future", (created_at > pd.Timestamp(now + MAX_CLOCK_SKEW)).to_numpy()))
+    checks.append((f"created_at is before {MIN_CREATED_AT.date()}", (created_at < MIN_CREATED_AT).to_numpy()))
+    for column, (low, high) in VALUE_RANGES.items():
+        values = metrics[column]
+        checks.append((f"{column} is not a number", (values.isna() & frame[column].notna()).to_numpy()))
+        checks.append((f"{column} outside {low}-{high}", ((values < low) | (values > high)).to_numpy()))
+    checks.append(("no readings", np.all([metrics[column].isna().to_numpy() for column in VALUE_RANGES], axis=0)))
+
+    masks = np.array([mask for _, mask in checks])
+    rejected = masks.any(axis=0)
+    errors = []
+    for index in np.flatnonzero(rejected)[:MAX_REPORTED_ERRORS]:
+        errors.append({"index": int(index), "error": checks[int(np.argmax(masks[:, index]))][0]})
+
+    valid = pd.DataFrame({"created_at": created_at, **metrics})[~rejected]
+    return valid, int(rejected.sum()), errors
+
+
+def encode_copy_rows(user_id: str, readings: pd.DataFrame) -> io.StringIO:
+    """Validated readings as the CSV body of COPY sensor_data (user_id, created_at, beat_avg, temperature_c, humidity)"""
+    buffer = io.StringIO()
+    # Format timestamps in one vectorized call; to_csv's date_format runs strftime per value
+    created_at = np.datetime_as_string(readings["created_at"].dt.tz_convert(None).to_numpy(), unit="us", timezone="UTC")
+    out = readings.assign(user_id=user_id, created_at=created_at)[
+        ["user_id", "created_at", "beat_avg", "temperature_c", "humidity"]
+    ]
+    # Empty unquoted CSV fields are NULL for COPY
+    out.to_csv(buffer, index=False, header=False, na_rep="")
+    buffer.seek(0)
+    return buffer
+
+
+def copy_readings(
+    db_credentials: DBCredentials,
+    user_id: str,
+    readings: pd.DataFrame,
+    batch_id: Optional[str] = None,
+    seq: int = 0
+) -> str:
+    """
+    Write validated readings with one COPY on a pooled connection, in one
+    transaction. With a batch_id, (user_id, batch_id, seq) is recorded in the
+    same transaction and a batch already recorded is skipped. Returns "stored" or
+    "duplicate".
+    """
+    buffer = encode_copy_rows(user_id, readings)
+    connection = get_engine(db_credentials).raw_connection()
+    try:
+        cursor = connection.cursor()
+        if batch_id is not None:
+            cursor.execute(
+                "INSERT INTO sensor_ingest_batches (batch_id, seq, user_id, row_count) VALUES (%s, %s, %s, %s) "
+                "ON CONFLICT (user_id, batch_id, seq) DO NOTHING",
+                (batch_id, seq, user_id, len(readings)),
+            )
+            if cursor.rowcount == 0:
+                connection.rollback()
+                return "duplicate"
+        cursor.copy_expert(
+            "COPY sensor_data (user_id, created_at, beat_avg, temperature_c, humidity) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+        connection.commit()
+        return "stored"
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        # Returns the connection to the pool
+        connection.close()
+
+
+def ingest_batch(
+    db_credentials: DBCredentials,
+    user_id: str,
+    frame: pd.DataFrame,
+    batch_id: Optional[str],
+    seq: int,
+    first_index: int,
+    parse_errors: Optional[List[Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """Validate and store one batch; the acknowledgement for it, with row indexes relative to the whole upload"""
+    valid, rejected, errors = validate_readings(frame)
+    # The parser's reason is the more specific one for lines it rejected
+    errors = errors + (parse_errors or [])
+    errors = sorted({error["index"]: error for error in errors}.values(), key=lambda error: error["index"])
+    status = copy_readings(db_credentials, user_id, valid, batch_id, seq) if len(valid) else "empty"
+    return {
+        "seq": seq,
+        "status": status,
+        "first_index": first_index,
+        "rows": len(frame),
+        "accepted": len(valid) if status == "stored" else 0,
+        "rejected": rejected,
+        "errors": [
+            {"index": first_index + error["index"], "error": error["error"]}
+            for error in errors[:MAX_REPORTED_ERRORS]
+        ],
+    }
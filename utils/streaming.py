@@ -1,11 +1,13 @@
-from typing import Literal
+from typing import Literal, Optional, Dict, Any
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from fastapi.responses import StreamingResponse
-from langchain_openai import ChatOpenAI
 import json
-from config import OPENAI_API_KEY, GOOGLE_API_KEY, OPENAI_MODEL, GEMINI_MODEL
+from config import OPENAI_MODEL, GEMINI_MODEL
+from utils.clients import get_chat_model
 
+# LLMs stream_rag_response can stream from; endpoints reject stream=true for any other choice
+STREAMING_LLMS = ("openai", "gemini")
 
 
 async def stream_formatted_response(sql_query: str, query_results: str, tabular_data: list, llm_choice: str):
@@ -25,12 +27,7 @@ async def stream_formatted_response(sql_query: str, query_results: str, tabular_
     """
 
     if llm_choice == "openai":
-        model = ChatOpenAI(
-            temperature=0.7,
-            model=OPENAI_MODEL,
-            streaming=True,
-            api_key=OPENAI_API_KEY,
-        )
+        model = get_chat_model("openai", OPENAI_MODEL, temperature=0.7, streaming=True)
     elif llm_choice == "gemini":
         raise NotImplementedError("Gemini streaming not implemented yet")
     elif llm_choice == "local":
@@ -58,7 +55,23 @@ async def stream_formatted_response(sql_query: str, query_results: str, tabular_
 
     return StreamingResponse(generate_formatted_response(), media_type="text/event-stream")
 
-async def stream_rag_response(query: str, context: str, llm_choice: Literal["openai", "gemini", "local"]):
+def _sources_event(metadata: Optional[Dict[str, Any]]) -> str:
+    return f"[SOURCES]{json.dumps(metadata or {}, default=str)}[/SOURCES]"
+
+async def stream_static_response(text: str, metadata: Optional[Dict[str, Any]] = None):
+    """Stream a fixed answer using the same framing as stream_rag_response"""
+    async def generate_static_response():
+        yield _sources_event(metadata)
+        yield text
+        yield "[DONE]"
+
+    return StreamingResponse(generate_static_response(), media_type="text/event-stream")
+
+async def stream_rag_response(query: str, context: str, llm_choice: Literal["openai", "gemini"], metadata: Optional[Dict[str, Any]] = None):
+    """
+    Stream a RAG answer. The first event carries the sources and similarity
+    metadata so clients can render citations before the first token arrives.
+    """
     prompt = f"""
     Given the following context and query, provide a comprehensive and insightful response:
 
@@ -80,18 +93,11 @@ async def stream_rag_response(query: str, context: str, llm_choice: Literal["ope
     """
 
     if llm_choice == "openai":
-        model = ChatOpenAI(
-            temperature=0.7,
-            model=OPENAI_MODEL,
-            streaming=True,
-            api_key=OPENAI_API_KEY,
-        )
+        model = get_chat_model("openai", OPENAI_MODEL, temperature=0.7, streaming=True)
     elif llm_choice == "gemini":
-        raise NotImplementedError("Gemini streaming not implemented yet")
-    elif llm_choice == "local":
-        raise NotImplementedError("Local LLM streaming not implemented yet")
+        model = get_chat_model("gemini", GEMINI_MODEL, temperature=0.7)
     else:
-        raise ValueError("Invalid LLM choice")
+        raise ValueError(f"Streaming is not supported for llm_choice '{llm_choice}'")
 
     chat_prompt = ChatPromptTemplate.from_messages([
         ("system", "You are an AI assistant providing information based on given context. Use markdown formatting in your responses."),
@@ -101,6 +107,7 @@ async def stream_rag_response(query: str, context: str, llm_choice: Literal["ope
     chain = chat_prompt | model | StrOutputParser()
 
     async def generate_rag_response():
+        yield _sources_event(metadata)
         try:
             async for chunk in chain.astream({"input": prompt}):
                 yield f"{chunk}"
@@ -1,30 +1,23 @@
 import uvicorn
-import cohere
-from supabase import create_client, Client
 import os
 from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
 from langchain.schema import HumanMessage, SystemMessage
 from langchain.output_parsers import PydanticOutputParser
-import base64
+import logging
+import time
+from typing import Optional, Tuple, Union
 from utils.custom_types import ImageAnalysis
+from utils.clients import get_chat_model, get_client
+from utils.image_preprocessing import PreparedImage, prepare_image
 
 load_dotenv()
+logger = logging.getLogger(__name__)
 IMAGES_FOLDER = "images"
 
 
 os.makedirs(IMAGES_FOLDER, exist_ok=True)
 
-# Initialize Supabase client
-supabase_client: Client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
-
-co = cohere.ClientV2(api_key=os.getenv("COHERE_API_KEY"))
-
-
-openai_model = ChatOpenAI(model_name="gpt-4o-mini", temperature=0.5)
-gemini_model = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0.5)
 
 def generate_llm_response(prompt: str, context: str, model: str = "openai") -> str:
     chat_prompt = ChatPromptTemplate.from_messages([
@@ -34,9 +27,9 @@ def generate_llm_response(prompt: str, context: str, model: str = "openai") -> s
 
     try:
         if model == "openai":
-            response = openai_model.invoke(chat_prompt.format_messages())
+            response = get_chat_model("openai", "gpt-4o-mini", temperature=0.5).invoke(chat_prompt.format_messages())
         elif model == "gemini":
-            response = gemini_model.invoke(chat_prompt.format_messages())
+            response = get_chat_model("gemini", "gemini-1.5-flash", temperature=0.5).invoke(chat_prompt.format_messages())
         else:
             return "Invalid model specified. Please use 'openai' or 'gemini'."
 
@@ -48,26 +41,7 @@ def generate_llm_response(prompt: str, context: str, model: str = "openai") -> s
 
 
 
-def create_image_analyzer(api_key: str):
-    # Initialize the model
-    model = ChatGoogleGenerativeAI(
-        model="gemini-1.5-flash",
-        google_api_key=api_key,
-        temperature=0
-    )
-
-    # Create parser
-    parser = PydanticOutputParser(pydantic_object=ImageAnalysis)
-
-    format_instructions = parser.get_format_instructions()
-
-    def analyze_image(image_bytes: bytes) -> ImageAnalysis:
-        try:
-            # Encode image to base64
-            image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-
-            # Create the analysis prompt
-            prompt = f"""
+IMAGE_ANALYSIS_PROMPT = """
             Analyze this image and provide the following information:
             1. All visible text in the image
             2. Your confidence level in the transcription (High, Medium, or Low)
@@ -78,27 +52,66 @@ def create_image_analyzer(api_key: str):
             {format_instructions}
             """
 
-            # Create a message with the image
-            message = HumanMessage(
-                content=[
-                    {"type": "text", "text": prompt},
-                    {
-                        "type": "image_url",
-                        "image_url": {"url": f"data:image/jpeg;base64,{image_base64}"}
-                    },
-                ]
-            )
-
-            # Get response from model
-            response = model.invoke([message])
-            print(response.content)
-
-            # Parse the response into our structured format
-            result = parser.parse(response.content)
-            return result
 
+class ImageAnalyzer:
+    """
+    Long-lived image analyzer. The model, output parser and prompt are built
+    once; none of them hold per-call state, so one instance is shared by all
+    requests and threads.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, model_name: str = "gemini-1.5-flash"):
+        self.model = get_chat_model("gemini", model_name, temperature=0, api_key=api_key)
+        self.parser = PydanticOutputParser(pydantic_object=ImageAnalysis)
+        self.prompt = IMAGE_ANALYSIS_PROMPT.format(format_instructions=self.parser.get_format_instructions())
+
+    def _message(self, image: Union[bytes, PreparedImage]) -> Tuple[HumanMessage, PreparedImage]:
+        # Raw bytes still work; the endpoints prepare the image themselves so the base64 is built once
+        if not isinstance(image, PreparedImage):
+            image = prepare_image(image)
+        message = HumanMessage(
+            content=[
+                {"type": "text", "text": self.prompt},
+                {"type": "image_url", "image_url": {"url": image.data_url}},
+            ]
+        )
+        return message, image
+
+    def _parse(self, content: str, image: PreparedImage, started: float) -> ImageAnalysis:
+        logger.info(
+            f"Image analyzed in {(time.perf_counter() - started) * 1000:.0f} ms "
+            f"({image.prepared_bytes} byte {image.width}x{image.height} payload)"
+        )
+        return self.parser.parse(content)
+
+    async def analyze(self, image: Union[bytes, PreparedImage]) -> ImageAnalysis:
+        """Transcribe an image without blocking the event loop"""
+        try:
+            message, image = self._message(image)
+            started = time.perf_counter()
+            response = await self.model.ainvoke([message])
+            return self._parse(response.content, image, started)
+        except Exception as e:
+            logger.error(f"Error analyzing image: {e}")
+            raise Exception(f"Error analyzing image: {str(e)}")
+
+    def analyze_sync(self, image: Union[bytes, PreparedImage]) -> ImageAnalysis:
+        """Blocking variant of analyze, for worker threads"""
+        try:
+            message, image = self._message(image)
+            started = time.perf_counter()
+            response = self.model.invoke([message])
+            return self._parse(response.content, image, started)
         except Exception as e:
-            print(e)
+            logger.error(f"Error analyzing image: {e}")
             raise Exception(f"Error analyzing image: {str(e)}")
 
-    return analyze_image
\ No newline at end of file
+
+def get_image_analyzer(api_key: Optional[str] = None) -> ImageAnalyzer:
+    """The shared analyzer for this API key"""
+    return get_client("image_analyzer", api_key, lambda: ImageAnalyzer(api_key))
+
+
+def create_image_analyzer(api_key: str):
+    """Kept for callers that want a plain function; returns the shared analyzer's blocking analyze"""
+    return get_image_analyzer(api_key).analyze_sync
@@ -0,0 +1,26 @@
+import logging
+import signal
+import threading
+
+from routers.transcribe_pdf import create_pdf_worker_pool
+from routers.health_report import create_report_worker_pool
+from config import PDF_WORKER_CONCURRENCY, REPORT_WORKER_CONCURRENCY
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    # Standalone PDF and scheduled report worker pools; run the API with
+    # PDF_WORKER_MODE=external (report workers are external by default)
+    # and point both at the same JOB_QUEUE_PATH
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    pools = [create_pdf_worker_pool(PDF_WORKER_CONCURRENCY), create_report_worker_pool(REPORT_WORKER_CONCURRENCY)]
+    for pool in pools:
+        pool.start()
+    stop.wait()
+    logger.info("Stopping workers, waiting for running jobs")
+    for pool in pools:
+        pool.stop()